@@ -0,0 +1,150 @@
+"""Closed-loop HTTP load generator for comparing API builds.
+
+Drives a fixed mix of endpoints against one or more running servers at a
+fixed concurrency and reports throughput and latency percentiles, e.g. to
+compare the sync request path against the async one:
+
+    uv run python -m benchmarks.concurrency \
+        --target sync=http://localhost:8001 \
+        --target async=http://localhost:8000 \
+        --concurrency 64 --duration 20
+
+``--mix write`` exercises the attach/assign routes instead; every request
+there is one link write, so ``rps`` reads as writes per second.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+
+import httpx
+
+# (weight, path template) — ids are drawn from the fake dataset ranges
+MIX = [
+    (4, "/problems/{problem_id}/full"),
+    (3, "/resources/{resource_id}"),
+    (2, "/problems?keyword={keyword}&limit=20"),
+    (1, "/dashboard/{user_id}"),
+]
+KEYWORDS = ["python", "async", "error", "react", "database", "memory"]
+
+# (weight, method, path template, body) — body maps each field to the
+# generated value it takes
+WRITE_MIX = [
+    (3, "POST", "/problems/{problem_id}/resources", {"resource_id": "resource_id", "relevance_score": "score"}),
+    (2, "POST", "/solutions/{solution_id}/resources", {"resource_id": "resource_id"}),
+    (2, "POST", "/problems/{problem_id}/tags", {"tag_id": "tag_id"}),
+    (2, "POST", "/resources/{resource_id}/tags", {"tag_id": "tag_id", "confidence": "score"}),
+    (1, "POST", "/problems/{problem_id}/relations", {"to_problem_id": "other_problem_id", "strength": "score"}),
+]
+
+
+def _next_request(rng: random.Random, mix: str) -> tuple[str, str, dict | None]:
+    values = {
+        "problem_id": rng.randint(1, 150),
+        "other_problem_id": rng.randint(1, 150),
+        "resource_id": rng.randint(1, 250),
+        "solution_id": rng.randint(1, 1900),
+        "tag_id": rng.randint(1, 50),
+        "user_id": rng.randint(1, 12),
+        "keyword": rng.choice(KEYWORDS),
+        "score": round(rng.random(), 2),
+    }
+    if mix == "read":
+        template = rng.choices([t for _, t in MIX], weights=[w for w, _ in MIX])[0]
+        return "GET", template.format(**values), None
+
+    _, method, template, body = rng.choices(WRITE_MIX, weights=[entry[0] for entry in WRITE_MIX])[0]
+    return method, template.format(**values), {field: values[name] for field, name in body.items()}
+
+
+def _percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(latencies: list[float], errors: int, elapsed: float) -> dict:
+    """Throughput and latency percentiles of one measured run."""
+    if not latencies:
+        return {"requests": 0, "errors": errors}
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(_percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(_percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(_percentile(latencies, 99) * 1000, 2),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2),
+    }
+
+
+async def _worker(
+    client: httpx.AsyncClient, deadline: float, seed: int, latencies: list, errors: list, mix: str
+):
+    rng = random.Random(seed)
+    while time.perf_counter() < deadline:
+        method, path, body = _next_request(rng, mix)
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, path, json=body)
+            ok = response.status_code < 500
+        except httpx.HTTPError:
+            ok = False
+        if ok:
+            latencies.append(time.perf_counter() - start)
+        else:
+            errors.append(path)
+
+
+async def run_target(base_url: str, concurrency: int, duration: float, warmup: float, mix: str = "read") -> dict:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        if warmup:
+            await asyncio.gather(*(
+                _worker(client, time.perf_counter() + warmup, -i, [], [], mix)
+                for i in range(concurrency)
+            ))
+
+        latencies: list[float] = []
+        errors: list[str] = []
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*(
+            _worker(client, deadline, i, latencies, errors, mix) for i in range(concurrency)
+        ))
+        elapsed = time.perf_counter() - started
+
+    return summarize(latencies, len(errors), elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--target",
+        action="append",
+        required=True,
+        help="name=base_url; repeat to compare several servers",
+    )
+    parser.add_argument("--mix", choices=["read", "write"], default="read")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per target")
+    parser.add_argument("--warmup", type=float, default=3.0, help="seconds per target")
+    args = parser.parse_args()
+
+    results = {}
+    for target in args.target:
+        name, _, url = target.partition("=")
+        results[name] = asyncio.run(
+            run_target(url, args.concurrency, args.duration, args.warmup, args.mix)
+        )
+        print(f"{name}: {results[name]}", flush=True)
+
+    print(json.dumps({"mix": args.mix, "concurrency": args.concurrency, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Micro-benchmark of list response serialization over the loaded dataset.
+
+Times, per list shape, the CPU spent turning fetched rows into a JSON body:
+
+- ``per_row_validate``: the old handler path — ``model_validate`` on every
+  row, then FastAPI re-validating the list against ``response_model`` and
+  encoding the dumped dicts with ``json.dumps``.
+- ``model_construct``: unvalidated models dumped by a cached adapter.
+- ``validate_once``: ``serialization.dump_rows``, one validation pass by a
+  cached ``TypeAdapter`` straight to JSON bytes.
+
+No server is involved; rows are fetched once up front:
+
+    uv run python -m benchmarks.serialization --rows 500 --repeat 200
+"""
+
+import argparse
+import json
+import statistics
+import time
+
+import psycopg
+from psycopg.rows import dict_row
+
+from src.api import schemas
+from src.api.serialization import dump_rows, list_adapter
+from src.config import settings
+
+SHAPES = [
+    ("solutions", schemas.SolutionRead, "SELECT * FROM solutions ORDER BY solution_id LIMIT %s"),
+    ("resources", schemas.ResourceRead, "SELECT * FROM resources ORDER BY resource_id LIMIT %s"),
+    ("problems", schemas.ProblemListItem, "SELECT * FROM problems ORDER BY problem_id LIMIT %s"),
+    ("tags", schemas.TagRead, "SELECT * FROM tags ORDER BY tag_id LIMIT %s"),
+]
+
+
+def per_row_validate(model, rows) -> bytes:
+    adapter = list_adapter(model)
+    items = adapter.validate_python([model.model_validate(row) for row in rows])
+    return json.dumps(
+        adapter.dump_python(items, mode="json"), ensure_ascii=False, separators=(",", ":")
+    ).encode()
+
+
+def model_construct(model, rows) -> bytes:
+    return list_adapter(model).dump_json([model.model_construct(**row) for row in rows])
+
+
+def validate_once(model, rows) -> bytes:
+    return dump_rows(model, rows)
+
+
+STRATEGIES = [per_row_validate, model_construct, validate_once]
+
+
+def _time(strategy, model, rows, repeat: int) -> float:
+    strategy(model, rows)
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        strategy(model, rows)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=500, help="rows per list")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    results = {}
+    with psycopg.connect(settings.database_url, row_factory=dict_row) as conn:
+        for name, model, query in SHAPES:
+            rows = conn.execute(query, (args.rows,)).fetchall()
+            reference = json.loads(per_row_validate(model, rows))
+            if any(json.loads(strategy(model, rows)) != reference for strategy in STRATEGIES):
+                raise SystemExit(f"{name}: strategies disagree on the response body")
+
+            timings = {s.__name__: round(_time(s, model, rows, args.repeat), 3) for s in STRATEGIES}
+            timings["speedup"] = round(timings["per_row_validate"] / timings["validate_once"], 2)
+            results[name] = {"rows": len(rows), "median_ms": timings}
+            print(f"{name}: {results[name]}", flush=True)
+
+    print(json.dumps({"repeat": args.repeat, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""Endpoint benchmark suite over generated datasets of several sizes.
+
+For each scale factor the suite recreates the schema in the configured
+database, fills it with ``src.db.fake.generate``, boots ``src.main:app``
+under uvicorn against it and drives a mix of the read and write routes at a
+fixed concurrency. Throughput and p50/p95/p99 are reported per endpoint as
+JSON, so runs on two commits can be diffed:
+
+    uv run python -m benchmarks.suite --scales 1,20,200 --output head.json
+    uv run python -m benchmarks.suite --scales 1,20,200 --baseline head.json
+
+Everything in ``DATABASE_URL`` is dropped; point it at a scratch database.
+Request sequences are seeded, so the same data and the same mix are
+replayed on every run.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, NamedTuple
+
+import httpx
+import psycopg
+
+from benchmarks.concurrency import KEYWORDS, summarize
+from src.config import settings
+from src.db.fake.generate import load_generated
+from src.db.init_db import init_db
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# (weight, endpoint) — search, page reads, visits and link churn
+MIX = [
+    (3, "search_problems"),
+    (1, "search_resources"),
+    (4, "problem_full"),
+    (2, "resource_detail"),
+    (1, "dashboard"),
+    (2, "visit"),
+    (1, "attach"),
+    (1, "detach"),
+]
+
+COUNTED_TABLES = ["users", "problems", "solutions", "resources", "problem_resources", "problem_tags"]
+
+
+class IdRanges(NamedTuple):
+    problems: int
+    resources: int
+    users: int
+
+
+def _dataset(conn: psycopg.Connection) -> tuple[IdRanges, dict]:
+    ids = IdRanges(*conn.execute(
+        """
+        SELECT (SELECT max(problem_id) FROM problems),
+               (SELECT max(resource_id) FROM resources),
+               (SELECT max(user_id) FROM users)
+        """
+    ).fetchone())
+    rows = {table: conn.execute(f"SELECT count(*) FROM {table}").fetchone()[0] for table in COUNTED_TABLES}
+    return ids, rows
+
+
+def _next_request(
+    rng: random.Random, ids: IdRanges, attached: list[tuple[int, int]]
+) -> tuple[str, str, str, dict | None]:
+    """(endpoint, method, path, body) of the worker's next request."""
+    endpoint = rng.choices([name for _, name in MIX], weights=[weight for weight, _ in MIX])[0]
+    problem_id = rng.randint(1, ids.problems)
+    resource_id = rng.randint(1, ids.resources)
+
+    if endpoint == "detach" and not attached:
+        endpoint = "attach"
+    if endpoint == "search_problems":
+        return endpoint, "GET", f"/problems?keyword={rng.choice(KEYWORDS)}&limit=20", None
+    if endpoint == "search_resources":
+        return endpoint, "GET", f"/resources?keyword={rng.choice(KEYWORDS)}&limit=20", None
+    if endpoint == "problem_full":
+        return endpoint, "GET", f"/problems/{problem_id}/full", None
+    if endpoint == "resource_detail":
+        return endpoint, "GET", f"/resources/{resource_id}", None
+    if endpoint == "dashboard":
+        return endpoint, "GET", f"/dashboard/{rng.randint(1, ids.users)}", None
+    if endpoint == "visit":
+        return endpoint, "POST", f"/resources/{resource_id}/visit", None
+    if endpoint == "attach":
+        body = {"resource_id": resource_id, "relevance_score": round(rng.random(), 2)}
+        return endpoint, "POST", f"/problems/{problem_id}/resources", body
+    # Detach a link this worker attached earlier, so the link count stays level
+    problem_id, resource_id = attached.pop(rng.randrange(len(attached)))
+    return endpoint, "DELETE", f"/problems/{problem_id}/resources/{resource_id}", None
+
+
+async def _worker(
+    client: httpx.AsyncClient, deadline: float, seed: int, ids: IdRanges, latencies: dict, errors: dict
+):
+    rng = random.Random(seed)
+    attached: list[tuple[int, int]] = []
+    while time.perf_counter() < deadline:
+        endpoint, method, path, body = _next_request(rng, ids, attached)
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, path, json=body)
+            ok = response.status_code < 500
+        except httpx.HTTPError:
+            ok = False
+        if not ok:
+            errors[endpoint] = errors.get(endpoint, 0) + 1
+            continue
+        latencies.setdefault(endpoint, []).append(time.perf_counter() - start)
+        if endpoint == "attach" and response.status_code == 200:
+            attached.append((int(path.split("/")[2]), body["resource_id"]))
+
+
+async def drive(base_url: str, ids: IdRanges, concurrency: int, duration: float, warmup: float, seed: int) -> dict:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        if warmup:
+            await asyncio.gather(*(
+                _worker(client, time.perf_counter() + warmup, -seed - i - 1, ids, {}, {})
+                for i in range(concurrency)
+            ))
+
+        latencies: dict[str, list[float]] = {}
+        errors: dict[str, int] = {}
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            _worker(client, started + duration, seed + i, ids, latencies, errors)
+            for i in range(concurrency)
+        ))
+        elapsed = time.perf_counter() - started
+
+    everything = [latency for samples in latencies.values() for latency in samples]
+    return {
+        "overall": summarize(everything, sum(errors.values()), elapsed),
+        "endpoints": {
+            endpoint: summarize(latencies.get(endpoint, []), errors.get(endpoint, 0), elapsed)
+            for _, endpoint in MIX
+        },
+    }
+
+
+@contextmanager
+def serve(port: int) -> Iterator[str]:
+    """Run the app against the already seeded database until the block exits."""
+    env = {**os.environ, "INIT_SCHEMA": "false", "LOAD_FAKE_DATA": "false"}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.perf_counter() + 60
+        while True:
+            if server.poll() is not None:
+                raise RuntimeError(f"server exited with status {server.returncode} during startup")
+            try:
+                if httpx.get(f"{base_url}/health").status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if time.perf_counter() > deadline:
+                raise RuntimeError("server did not become ready within 60s")
+            time.sleep(0.2)
+        yield base_url
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def run_scale(scale: int, args: argparse.Namespace) -> dict:
+    started = time.perf_counter()
+    init_db()
+    load_generated(scale, args.seed)
+    seed_seconds = time.perf_counter() - started
+    with psycopg.connect(settings.database_url) as conn:
+        ids, rows = _dataset(conn)
+
+    with serve(args.port) as base_url:
+        result = asyncio.run(drive(base_url, ids, args.concurrency, args.duration, args.warmup, args.seed))
+    return {"rows": rows, "seed_s": round(seed_seconds, 1), **result}
+
+
+def _revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _change(old: float, new: float) -> str:
+    return f"{old:>9.2f} -> {new:>9.2f} ({(new - old) / old * 100:+.0f}%)" if old else f"{new:>9.2f}"
+
+
+def compare(baseline: dict, report: dict):
+    """Print how each endpoint moved against an earlier report."""
+    print(f"\n{baseline.get('revision')} -> {report.get('revision')}")
+    for scale, result in report["scales"].items():
+        before = baseline["scales"].get(scale)
+        if before is None:
+            continue
+        for endpoint, now in {"overall": result["overall"], **result["endpoints"]}.items():
+            then = before["overall"] if endpoint == "overall" else before["endpoints"].get(endpoint)
+            if not then or not then.get("requests") or not now.get("requests"):
+                continue
+            print(
+                f"scale {scale:>5} {endpoint:<17}"
+                f" p95 ms {_change(then['p95_ms'], now['p95_ms'])}"
+                f"   rps {_change(then['rps'], now['rps'])}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", default="1,20", help="comma separated generator scale factors")
+    parser.add_argument("--seed", type=int, default=0, help="seeds both the dataset and the request mix")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=15.0, help="measured seconds per scale")
+    parser.add_argument("--warmup", type=float, default=3.0, help="seconds per scale")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--output", type=Path, help="also write the JSON report here")
+    parser.add_argument("--baseline", type=Path, help="earlier JSON report to compare against")
+    args = parser.parse_args()
+    scales = [int(scale) for scale in args.scales.split(",")]
+
+    report = {
+        "revision": _revision(),
+        "seed": args.seed,
+        "concurrency": args.concurrency,
+        "duration": args.duration,
+        "scales": {},
+    }
+    for scale in scales:
+        report["scales"][str(scale)] = run_scale(scale, args)
+        print(f"scale {scale}: {report['scales'][str(scale)]['overall']}", flush=True)
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        args.output.write_text(text + "\n")
+    if args.baseline:
+        compare(json.loads(args.baseline.read_text()), report)
+
+
+if __name__ == "__main__":
+    main()
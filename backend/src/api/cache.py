@@ -0,0 +1,104 @@
+from collections import OrderedDict
+from collections.abc import Hashable, Iterable
+
+from src.config import settings
+
+# An entity a cached response was built from, e.g. ("problem", 12)
+Dependency = tuple[str, int]
+
+
+class ResponseCache:
+    """In-process LRU of rendered JSON bodies, bounded by total byte size.
+
+    Every entry records the entities it was built from. Mutations call
+    ``invalidate`` with the entities they touched and every entry that
+    depends on one of them is dropped, so reads never need a freshness check.
+
+    Invalidation is per process. Callers that may run beside other workers
+    put the page's content version (see ``versions``) in the key, so a
+    write committed elsewhere turns into a miss rather than a stale hit.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries: OrderedDict[Hashable, tuple[bytes, frozenset[Dependency]]] = OrderedDict()
+        self._dependents: dict[Dependency, set[Hashable]] = {}
+        self._epoch = 0
+
+    @property
+    def epoch(self) -> int:
+        """Capture before reading from the database and hand back to ``set``."""
+        return self._epoch
+
+    def get(self, key: Hashable) -> bytes | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def set(self, key: Hashable, body: bytes, deps: Iterable[Dependency], epoch: int) -> None:
+        # A write committed while this body was being built; it may be stale
+        if epoch != self._epoch or len(body) > self.max_bytes:
+            return
+
+        self._remove(key)
+        deps = frozenset(deps)
+        self._entries[key] = (body, deps)
+        self.size += len(body)
+        for dep in deps:
+            self._dependents.setdefault(dep, set()).add(key)
+
+        while self.size > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def invalidate(self, *deps: Dependency) -> None:
+        """Drop every entry built from any of ``deps``. Call after commit."""
+        self._epoch += 1
+        for dep in deps:
+            for key in self._dependents.pop(dep, ()):
+                if self._remove(key):
+                    self.invalidations += 1
+
+    def clear(self) -> None:
+        self._epoch += 1
+        self._entries.clear()
+        self._dependents.clear()
+        self.size = 0
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+    def _remove(self, key: Hashable) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        body, deps = entry
+        self.size -= len(body)
+        for dep in deps:
+            keys = self._dependents.get(dep)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._dependents[dep]
+        return True
+
+
+response_cache = ResponseCache(settings.response_cache_max_bytes)
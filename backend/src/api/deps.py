@@ -1,15 +1,31 @@
-from collections.abc import Generator
+import time
+from collections.abc import AsyncGenerator
 from typing import Annotated
 
-from fastapi import Depends
-from psycopg import Connection
+from fastapi import Depends, Request
+from psycopg import AsyncConnection
 
-from src.db.connection import get_connection
+from src.api.middleware import wrote_recently
+from src.db.connection import get_async_connection
+from src.db.instrumentation import record_pool_wait
+from src.db.replicas import replica_set
 
 
-def get_db() -> Generator[Connection, None, None]:
-    with get_connection() as conn:
+async def get_async_db() -> AsyncGenerator[AsyncConnection, None]:
+    started = time.perf_counter()
+    async with get_async_connection() as conn:
+        record_pool_wait(time.perf_counter() - started)
         yield conn
 
 
-ConnectionDep = Annotated[Connection, Depends(get_db)]
+async def get_read_db(request: Request) -> AsyncGenerator[AsyncConnection, None]:
+    """A connection for routes that only read; a replica's when one is healthy."""
+    request.state.read_only = True
+    started = time.perf_counter()
+    async with replica_set.connection(use_primary=wrote_recently(request)) as conn:
+        record_pool_wait(time.perf_counter() - started)
+        yield conn
+
+
+AsyncConnectionDep = Annotated[AsyncConnection, Depends(get_async_db)]
+ReadConnectionDep = Annotated[AsyncConnection, Depends(get_read_db)]
@@ -0,0 +1,281 @@
+import math
+from array import array
+from bisect import bisect_left
+from collections.abc import Iterator
+from typing import Literal
+
+from psycopg import AsyncConnection
+
+RelationDirection = Literal["out", "in", "both"]
+
+# An edge as stored: (from_problem_id, to_problem_id, strength, relation_type)
+Edge = tuple[int, int, float | None, str | None]
+
+_REVERSE = {"out": "in", "in": "out", "both": "both"}
+
+
+class _CSR:
+    """Compressed sparse rows: the edges leaving node ``n`` are
+    ``targets[offsets[n]:offsets[n + 1]]``, sorted by target id."""
+
+    __slots__ = ("offsets", "targets", "strengths", "kinds")
+
+    def __init__(self, rows: list[tuple[int, int, float, int]]):
+        rows.sort()
+        size = (rows[-1][0] + 2) if rows else 1
+        counts = [0] * size
+        for source, _, _, _ in rows:
+            counts[source + 1] += 1
+        for i in range(1, size):
+            counts[i] += counts[i - 1]
+        self.offsets = array("l", counts)
+        self.targets = array("l", (r[1] for r in rows))
+        self.strengths = array("d", (r[2] for r in rows))
+        self.kinds = array("H", (r[3] for r in rows))
+
+    def row(self, node: int) -> range:
+        if node + 1 >= len(self.offsets):
+            return range(0)
+        return range(self.offsets[node], self.offsets[node + 1])
+
+    def find(self, source: int, target: int) -> int | None:
+        span = self.row(source)
+        i = bisect_left(self.targets, target, span.start, span.stop)
+        return i if i < span.stop and self.targets[i] == target else None
+
+
+class RelationGraph:
+    """In-memory adjacency index over ``problem_relations``.
+
+    Edges live in two CSR arrays, outgoing and incoming, built once from the
+    table. Later writes go to a small overlay of added and removed edges that
+    is folded back into fresh arrays once it grows, so traversals never touch
+    the database. Missing strengths are stored as NaN.
+
+    Like the response cache this is per process: another worker's writes are
+    not seen until restart.
+    """
+
+    def __init__(self, compact_threshold: int = 1024):
+        self.compact_threshold = compact_threshold
+        self._kinds: list[str | None] = [None]
+        self._kind_codes: dict[str | None, int] = {None: 0}
+        self._out = _CSR([])
+        self._in = _CSR([])
+        self._base_edges = 0
+        self._added_out: dict[int, dict[int, tuple[float, int]]] = {}
+        self._added_in: dict[int, dict[int, tuple[float, int]]] = {}
+        self._removed: set[tuple[int, int]] = set()
+
+    async def load(self, conn: AsyncConnection) -> None:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                "SELECT from_problem_id, to_problem_id, strength, relation_type FROM problem_relations"
+            )
+            rows = await cur.fetchall()
+        self._rebuild(
+            (r["from_problem_id"], r["to_problem_id"], r["strength"], r["relation_type"]) for r in rows
+        )
+
+    @property
+    def edge_count(self) -> int:
+        return (
+            self._base_edges
+            - len(self._removed)
+            + sum(len(targets) for targets in self._added_out.values())
+        )
+
+    def stats(self) -> dict:
+        return {
+            "edges": self.edge_count,
+            "pending_changes": len(self._removed) + sum(len(t) for t in self._added_out.values()),
+        }
+
+    def add(self, from_id: int, to_id: int, strength: float | None, relation_type: str | None) -> None:
+        entry = (math.nan if strength is None else strength, self._kind(relation_type))
+        # Shadow any copy in the base arrays
+        if self._out.find(from_id, to_id) is not None:
+            self._removed.add((from_id, to_id))
+        self._added_out.setdefault(from_id, {})[to_id] = entry
+        self._added_in.setdefault(to_id, {})[from_id] = entry
+        self._maybe_compact()
+
+    def remove(self, from_id: int, to_id: int) -> None:
+        self._added_out.get(from_id, {}).pop(to_id, None)
+        self._added_in.get(to_id, {}).pop(from_id, None)
+        if self._out.find(from_id, to_id) is not None:
+            self._removed.add((from_id, to_id))
+        self._maybe_compact()
+
+    def remove_node(self, problem_id: int) -> None:
+        """Drop every relation of a deleted problem."""
+        for edge in list(self.edges(problem_id, "both")):
+            self.remove(edge[0], edge[1])
+
+    def edges(self, node: int, direction: RelationDirection) -> Iterator[Edge]:
+        """Stored edges incident to ``node`` in the given direction."""
+        if direction in ("out", "both"):
+            for i in self._out.row(node):
+                target = self._out.targets[i]
+                if (node, target) not in self._removed:
+                    yield node, target, self._strength(self._out.strengths[i]), self._kinds[self._out.kinds[i]]
+            for target, (strength, kind) in self._added_out.get(node, {}).items():
+                yield node, target, self._strength(strength), self._kinds[kind]
+        if direction in ("in", "both"):
+            for i in self._in.row(node):
+                source = self._in.targets[i]
+                if (source, node) not in self._removed:
+                    yield source, node, self._strength(self._in.strengths[i]), self._kinds[self._in.kinds[i]]
+            for source, (strength, kind) in self._added_in.get(node, {}).items():
+                yield source, node, self._strength(strength), self._kinds[kind]
+
+    def neighborhood(
+        self,
+        origin: int,
+        depth: int,
+        min_strength: float,
+        direction: RelationDirection,
+        max_nodes: int,
+    ) -> tuple[dict[int, int], list[Edge], bool]:
+        """Breadth-first walk up to ``depth`` hops.
+
+        Returns each reached problem's hop distance, the edges traversed and
+        whether the walk stopped early at ``max_nodes``.
+        """
+        distance = {origin: 0}
+        traversed: dict[tuple[int, int], Edge] = {}
+        frontier = [origin]
+        for hop in range(1, depth + 1):
+            reached = []
+            for node in frontier:
+                for edge in self.edges(node, direction):
+                    if not self._strong_enough(edge, min_strength):
+                        continue
+                    other = edge[1] if edge[0] == node else edge[0]
+                    if other not in distance:
+                        if len(distance) >= max_nodes:
+                            return distance, list(traversed.values()), True
+                        distance[other] = hop
+                        reached.append(other)
+                    traversed[edge[0], edge[1]] = edge
+            if not reached:
+                break
+            frontier = reached
+        return distance, list(traversed.values()), False
+
+    def shortest_path(
+        self,
+        source: int,
+        target: int,
+        max_depth: int,
+        min_strength: float,
+        direction: RelationDirection,
+    ) -> tuple[list[int], list[Edge]] | None:
+        """Fewest-hop path by bidirectional breadth-first search."""
+        if source == target:
+            return [source], []
+
+        # node -> (hops from that side's start, previous node, edge used)
+        forward: dict[int, tuple[int, int | None, Edge | None]] = {source: (0, None, None)}
+        backward: dict[int, tuple[int, int | None, Edge | None]] = {target: (0, None, None)}
+        forward_frontier, backward_frontier = [source], [target]
+
+        for _ in range(max_depth):
+            if not forward_frontier or not backward_frontier:
+                return None
+            # Grow the smaller side; stop after the first layer that meets
+            if len(forward_frontier) <= len(backward_frontier):
+                forward_frontier, meet = self._expand(forward_frontier, forward, backward, direction, min_strength)
+            else:
+                backward_frontier, meet = self._expand(
+                    backward_frontier, backward, forward, _REVERSE[direction], min_strength
+                )
+            if meet is not None:
+                return self._join(meet, forward, backward)
+        return None
+
+    def _expand(self, frontier, seen, other, direction, min_strength):
+        reached = []
+        best = None
+        for node in frontier:
+            hops = seen[node][0] + 1
+            for edge in self.edges(node, direction):
+                if not self._strong_enough(edge, min_strength):
+                    continue
+                nxt = edge[1] if edge[0] == node else edge[0]
+                if nxt in seen:
+                    continue
+                seen[nxt] = (hops, node, edge)
+                reached.append(nxt)
+                # Every node in this layer is equally far from our start, so
+                # the best meeting point is the one closest to the other start
+                if nxt in other and (best is None or other[nxt][0] < other[best][0]):
+                    best = nxt
+        return reached, best
+
+    @staticmethod
+    def _join(meet, forward, backward) -> tuple[list[int], list[Edge]]:
+        head, head_edges = [], []
+        node = meet
+        while node is not None:
+            head.append(node)
+            _, previous, edge = forward[node]
+            if edge is not None:
+                head_edges.append(edge)
+            node = previous
+        head.reverse()
+        head_edges.reverse()
+
+        tail, tail_edges = [], []
+        _, node, edge = backward[meet]
+        if edge is not None:
+            tail_edges.append(edge)
+        while node is not None:
+            tail.append(node)
+            _, previous, edge = backward[node]
+            if edge is not None:
+                tail_edges.append(edge)
+            node = previous
+        return head + tail, head_edges + tail_edges
+
+    @staticmethod
+    def _strong_enough(edge: Edge, min_strength: float) -> bool:
+        # Relations without a strength only pass when no minimum is asked for
+        return min_strength <= 0 or (edge[2] is not None and edge[2] >= min_strength)
+
+    @staticmethod
+    def _strength(value: float) -> float | None:
+        return None if math.isnan(value) else value
+
+    def _kind(self, relation_type: str | None) -> int:
+        code = self._kind_codes.get(relation_type)
+        if code is None:
+            code = self._kind_codes[relation_type] = len(self._kinds)
+            self._kinds.append(relation_type)
+        return code
+
+    def _maybe_compact(self) -> None:
+        pending = len(self._removed) + sum(len(t) for t in self._added_out.values())
+        if pending > max(self.compact_threshold, self._base_edges // 8):
+            self._rebuild(edge for node in self._nodes() for edge in self.edges(node, "out"))
+
+    def _nodes(self) -> Iterator[int]:
+        yield from range(len(self._out.offsets) - 1)
+        yield from (n for n in self._added_out if n >= len(self._out.offsets) - 1)
+
+    def _rebuild(self, edges) -> None:
+        out_rows, in_rows = [], []
+        for from_id, to_id, strength, relation_type in edges:
+            value = math.nan if strength is None else strength
+            kind = self._kind(relation_type)
+            out_rows.append((from_id, to_id, value, kind))
+            in_rows.append((to_id, from_id, value, kind))
+        self._out = _CSR(out_rows)
+        self._in = _CSR(in_rows)
+        self._base_edges = len(out_rows)
+        self._added_out.clear()
+        self._added_in.clear()
+        self._removed.clear()
+
+
+relation_graph = RelationGraph()
@@ -0,0 +1,129 @@
+import json
+import logging
+import math
+import time
+
+from fastapi import Request
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.config import settings
+from src.db.instrumentation import QueryStats, bind_query_stats, unbind_query_stats
+from src.db.replicas import replica_set
+
+logger = logging.getLogger(__name__)
+
+# Statements longer than this are cut short in repeated-query warnings
+SHAPE_LOG_LENGTH = 300
+
+# Holds the time until which the client's reads must see its own writes
+READ_YOUR_WRITES_COOKIE = "solvex_wrote_until"
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+class QueryStatsMiddleware:
+    """Accounts the database work of each HTTP request.
+
+    Adds a ``Server-Timing`` header (``db``, ``db-pool`` and ``app``
+    durations), logs one JSON line per request and warns when a statement
+    repeats more than ``settings.repeated_query_threshold`` times, the usual
+    sign of a query issued once per item in a loop.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if settings.server_timing:
+                    headers = MutableHeaders(scope=message)
+                    headers.append("Server-Timing", _server_timing(stats, time.perf_counter() - started))
+            await send(message)
+
+        token = bind_query_stats(stats)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            unbind_query_stats(token)
+            _report(scope, status_code, stats, time.perf_counter() - started)
+
+
+def _server_timing(stats: QueryStats, elapsed: float) -> str:
+    return ", ".join([
+        f'db;dur={stats.db_time * 1000:.2f};desc="{stats.queries} queries, {stats.rows} rows"',
+        f"db-pool;dur={stats.pool_wait * 1000:.2f}",
+        f"app;dur={elapsed * 1000:.2f}",
+    ])
+
+
+def _report(scope: Scope, status_code: int, stats: QueryStats, elapsed: float) -> None:
+    method, path = scope["method"], scope["path"]
+    logger.info(json.dumps({
+        "method": method,
+        "path": path,
+        "status": status_code,
+        "duration_ms": round(elapsed * 1000, 2),
+        "db_queries": stats.queries,
+        "db_ms": round(stats.db_time * 1000, 2),
+        "db_rows": stats.rows,
+        "pool_wait_ms": round(stats.pool_wait * 1000, 2),
+    }))
+    for shape, count in stats.repeated(settings.repeated_query_threshold):
+        logger.warning(
+            "Possible N+1: %s %s ran the same statement %d times: %s",
+            method, path, count, shape[:SHAPE_LOG_LENGTH],
+        )
+
+
+class ReadYourWritesMiddleware:
+    """Keeps a client's reads on the primary for a while after it writes.
+
+    A successful write answers with a short-lived cookie; while it is valid
+    ``get_read_db`` skips the replicas, which may not have replayed the
+    write yet. POSTs that only read (served through ``get_read_db``, such as
+    batch lookups) don't count as writes. Does nothing unless replicas are
+    configured.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS or not replica_set.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cookie(message: Message) -> None:
+            if (
+                message["type"] == "http.response.start"
+                and message["status"] < 400
+                and not scope.get("state", {}).get("read_only")
+            ):
+                window = settings.read_your_writes_seconds
+                MutableHeaders(scope=message).append(
+                    "Set-Cookie",
+                    f"{READ_YOUR_WRITES_COOKIE}={time.time() + window:.3f}; Max-Age={math.ceil(window)}; "
+                    "Path=/; HttpOnly; SameSite=Lax",
+                )
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
+
+
+def wrote_recently(request: Request) -> bool:
+    """Whether the client wrote within the read-your-writes window."""
+    try:
+        return float(request.cookies.get(READ_YOUR_WRITES_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
@@ -0,0 +1,64 @@
+import base64
+import json
+from datetime import datetime
+from typing import Annotated, Any
+
+from fastapi import HTTPException, Query, Response, status
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+LimitParam = Annotated[int, Query(ge=1, le=MAX_PAGE_SIZE)]
+CursorParam = Annotated[str | None, Query(description="Opaque cursor from X-Next-Cursor")]
+
+
+def encode_cursor(*values: Any) -> str:
+    """Encode the sort key of the last row on a page into an opaque cursor."""
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, *types: type) -> tuple:
+    """Decode a cursor back into typed sort key values or raise 400."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        if not isinstance(payload, list) or len(payload) != len(types):
+            raise ValueError("cursor arity mismatch")
+        return tuple(
+            None if value is None
+            else datetime.fromisoformat(value) if kind is datetime
+            else kind(value)
+            for value, kind in zip(payload, types)
+        )
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def seek_after(column: str, id_column: str, value: Any, row_id: Any) -> tuple[str, list]:
+    """Build a keyset condition for ``ORDER BY column DESC, id_column DESC``.
+
+    PostgreSQL sorts NULLs first in descending order, so a cursor sitting on a
+    NULL sort value still has every non-NULL row ahead of it.
+    """
+    if value is None:
+        return (
+            f"(({column} IS NULL AND {id_column} < %s) OR {column} IS NOT NULL)",
+            [row_id],
+        )
+    return f"({column}, {id_column}) < (%s, %s)", [value, row_id]
+
+
+def paginate(rows: list[dict], limit: int, response: Response, *keys: str) -> list[dict]:
+    """Trim the look-ahead row and advertise the next cursor in a header.
+
+    Queries fetch ``limit + 1`` rows; the extra row only signals that another
+    page exists.
+    """
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(*(last[k] for k in keys))
+    return rows
@@ -1,20 +1,54 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Request, status
 
 from src.api import schemas
-from src.api.deps import ConnectionDep
-from src.api.routes.utils import get_user_or_404
+from src.api.deps import ReadConnectionDep
+from src.api.serialization import render_model
+from src.api.versions import is_not_modified, make_etag, not_modified, with_etag
 
 
 router = APIRouter(prefix="/dashboard", tags=["dashboard"])
 
+# The user's own lists are covered by their content version. The top lists
+# are shared by every user, so rather than bumping every dashboard when a
+# counter moves they are fingerprinted here; both are short index reads.
+DASHBOARD_VERSION_QUERY = """
+    SELECT
+        COALESCE(cv.version, 0) AS version,
+        md5(concat_ws('|',
+            (
+                SELECT string_agg(concat_ws(':', t.tag_id, t.tag_name, tu.usage_count), ','
+                                  ORDER BY tu.usage_count DESC, tu.tag_id)
+                FROM (SELECT * FROM tag_usage ORDER BY usage_count DESC, tag_id LIMIT 5) tu
+                JOIN tags t ON t.tag_id = tu.tag_id
+            ),
+            (
+                SELECT string_agg(concat_ws(':', r.resource_id, r.title, ru.usage_count), ','
+                                  ORDER BY ru.usage_count DESC, ru.resource_id)
+                FROM (SELECT * FROM resource_usage ORDER BY usage_count DESC, resource_id LIMIT 5) ru
+                JOIN resources r ON r.resource_id = ru.resource_id
+            )
+        )) AS top_digest
+    FROM users u
+    LEFT JOIN content_versions cv ON cv.scope = 'dashboard' AND cv.entity_id = u.user_id
+    WHERE u.user_id = %s
+"""
+
 
 @router.get("/{user_id}", response_model=schemas.DashboardResponse)
-def get_dashboard(user_id: int, conn: ConnectionDep):
-    get_user_or_404(conn, user_id)
+async def get_dashboard(user_id: int, request: Request, conn: ReadConnectionDep):
+    async with conn.cursor() as cur:
+        await cur.execute(DASHBOARD_VERSION_QUERY, (user_id,))
+        current = await cur.fetchone()
+    if not current:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+
+    etag = make_etag("dashboard", user_id, f"{current['version']}.{current['top_digest'][:16]}")
+    if is_not_modified(request, etag):
+        return not_modified(etag)
 
     # 1. Get recent problems
-    with conn.cursor() as cur:
-        cur.execute(
+    async with conn.cursor() as cur:
+        await cur.execute(
             """
             SELECT * FROM problems
             WHERE user_id = %s
@@ -23,11 +57,11 @@ def get_dashboard(user_id: int, conn: ConnectionDep):
             """,
             (user_id,),
         )
-        recent_problems = [schemas.ProblemListItem.model_validate(r) for r in cur.fetchall()]
+        recent_problems = await cur.fetchall()
 
     # 2. Get recent solutions
-    with conn.cursor() as cur:
-        cur.execute(
+    async with conn.cursor() as cur:
+        await cur.execute(
             """
             SELECT s.* FROM solutions s
             JOIN problems p ON s.problem_id = p.problem_id
@@ -37,65 +71,43 @@ def get_dashboard(user_id: int, conn: ConnectionDep):
             """,
             (user_id,),
         )
-        recent_solutions = [schemas.SolutionRead.model_validate(r) for r in cur.fetchall()]
+        recent_solutions = await cur.fetchall()
 
-    # 3. Get top tags (LEFT JOIN + GROUP BY)
-    with conn.cursor() as cur:
-        cur.execute(
+    # 3. Get top tags (trigger-maintained counters, read off an index)
+    async with conn.cursor() as cur:
+        await cur.execute(
             """
-            SELECT
-                t.tag_id,
-                t.tag_name,
-                COUNT(pt.problem_id) as usage_count
-            FROM tags t
-            LEFT JOIN problem_tags pt ON t.tag_id = pt.tag_id
-            GROUP BY t.tag_id, t.tag_name
-            ORDER BY usage_count DESC
+            SELECT t.tag_id, t.tag_name, tu.usage_count
+            FROM tag_usage tu
+            JOIN tags t ON t.tag_id = tu.tag_id
+            ORDER BY tu.usage_count DESC, tu.tag_id
             LIMIT 5
             """
         )
-        top_tags = [
-            schemas.TopTag(
-                tag_id=row["tag_id"],
-                tag_name=row["tag_name"],
-                usage_count=row["usage_count"] or 0,
-            )
-            for row in cur.fetchall()
-        ]
+        top_tags = await cur.fetchall()
 
-    # 4. Get top resources (correlated subqueries)
-    with conn.cursor() as cur:
-        cur.execute(
+    # 4. Get top resources (trigger-maintained counters, read off an index)
+    async with conn.cursor() as cur:
+        await cur.execute(
             """
-            SELECT
-                r.resource_id,
-                r.title,
-                (
-                    SELECT COUNT(*)
-                    FROM problem_resources pr
-                    WHERE pr.resource_id = r.resource_id
-                ) + (
-                    SELECT COUNT(*)
-                    FROM solution_resources sr
-                    WHERE sr.resource_id = r.resource_id
-                ) as usage_count
-            FROM resources r
-            ORDER BY usage_count DESC
+            SELECT r.resource_id, r.title, ru.usage_count
+            FROM resource_usage ru
+            JOIN resources r ON r.resource_id = ru.resource_id
+            ORDER BY ru.usage_count DESC, ru.resource_id
             LIMIT 5
             """
         )
-        top_resources = [
-            schemas.TopResource(
-                resource_id=row["resource_id"],
-                title=row["title"],
-                usage_count=row["usage_count"] or 0,
-            )
-            for row in cur.fetchall()
-        ]
+        top_resources = await cur.fetchall()
 
-    return schemas.DashboardResponse(
-        recent_problems=recent_problems,
-        recent_solutions=recent_solutions,
-        top_tags=top_tags,
-        top_resources=top_resources,
+    return with_etag(
+        render_model(
+            schemas.DashboardResponse,
+            {
+                "recent_problems": recent_problems,
+                "recent_solutions": recent_solutions,
+                "top_tags": top_tags,
+                "top_resources": top_resources,
+            },
+        ),
+        etag,
     )
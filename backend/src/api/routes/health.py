@@ -1,13 +1,51 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Response, status
+
+from src.api.cache import response_cache
+from src.api.graph import relation_graph
+from src.api.tag_index import tag_index
+from src.api.tag_recommender import tag_recommender
+from src.api.visits import visit_buffer
+from src.config import settings
+from src.db.connection import async_pool_stats
+from src.db.replicas import replica_set
 
 router = APIRouter(tags=["health"])
 
 
 @router.get("/")
-def root():
+async def root():
     return {"message": "Hello"}
 
 
 @router.get("/health")
-def health_check():
-    return {"status": "ok"}
+async def health_check():
+    return {
+        "status": "ok",
+        "cache": response_cache.stats(),
+        "visits": visit_buffer.stats(),
+        "relation_graph": relation_graph.stats(),
+        "tag_index": tag_index.stats(),
+        "tag_recommender": tag_recommender.stats(),
+    }
+
+
+@router.get("/health/pool")
+async def pool_health():
+    return {**async_pool_stats(), "read_routing": replica_set.stats()}
+
+
+@router.get("/health/ready")
+async def readiness(response: Response):
+    """Fails while the pool is closed or too many requests queue for a
+    connection, so the load balancer routes new traffic elsewhere."""
+    pool = async_pool_stats()
+    ready = pool["open"] and pool["waiting"] <= settings.db_pool_ready_max_waiting
+    if not ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return {
+        "status": "ready" if ready else "unavailable",
+        "waiting": pool["waiting"],
+        "max_waiting": settings.db_pool_ready_max_waiting,
+        "in_use": pool["in_use"],
+        "max_size": pool["max_size"],
+    }
@@ -1,20 +1,63 @@
-from fastapi import APIRouter, status
+import json
+from datetime import datetime
+
+from fastapi import APIRouter, HTTPException, Query, Request, Response, status
+from pydantic import ValidationError
 
 from src.api import schemas
-from src.api.deps import ConnectionDep
-from src.api.routes.utils import get_problem_or_404, get_problem_with_author, get_tag_or_404, get_user_or_404
-from src.api.services.problems import build_problem_full
+from src.api.cache import response_cache
+from src.api.graph import relation_graph
+from src.api.tag_index import tag_index
+from src.api.tag_recommender import tag_recommender
+from src.api.deps import AsyncConnectionDep, ReadConnectionDep
+from src.api.pagination import DEFAULT_PAGE_SIZE, CursorParam, LimitParam, decode_cursor, paginate, seek_after
+from src.api.search import HEADLINE_OPTIONS, TS_CONFIG, SearchMode
+from src.api.serialization import render_rows
+from src.api.versions import content_version, is_not_modified, make_etag, not_modified, with_etag
+from src.api.routes.utils import get_problem_or_404, get_problem_with_author
+from src.api.services.problems import (
+    BULK_MAX_ITEMS,
+    DEDUPE_TITLE_THRESHOLD,
+    RELATED_PROBLEMS_KEPT,
+    SIMILAR_TITLE_THRESHOLD,
+    bulk_insert_problems,
+    find_missing_references,
+    find_related_problems,
+    find_similar_problems,
+    refresh_related_problems,
+    render_problem_full,
+)
 
 
 router = APIRouter(prefix="/problems", tags=["problems"])
 
 
 @router.post("", response_model=schemas.ProblemRead, status_code=status.HTTP_201_CREATED)
-def create_problem(payload: schemas.ProblemCreate, conn: ConnectionDep):
-    get_user_or_404(conn, payload.user_id)
-
-    with conn.cursor() as cur:
-        cur.execute(
+async def create_problem(
+    payload: schemas.ProblemCreate,
+    conn: AsyncConnectionDep,
+    response: Response,
+    dedupe: bool = False,
+):
+    tag_ids = set(payload.tags or ())
+    missing_users, missing_tags = await find_missing_references(conn, {payload.user_id}, tag_ids)
+    if missing_users:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    if missing_tags:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tag not found")
+
+    if dedupe:
+        matches = await find_similar_problems(
+            conn, payload.title, DEDUPE_TITLE_THRESHOLD, user_id=payload.user_id, limit=1
+        )
+        if matches:
+            response.status_code = status.HTTP_200_OK
+            return schemas.ProblemRead.model_validate(
+                await get_problem_or_404(conn, matches[0]["problem_id"])
+            )
+
+    async with conn.cursor() as cur:
+        await cur.execute(
             """
             INSERT INTO problems (user_id, title, description, problem_type)
             VALUES (%s, %s, %s, %s)
@@ -22,75 +65,223 @@ def create_problem(payload: schemas.ProblemCreate, conn: ConnectionDep):
             """,
             (payload.user_id, payload.title, payload.description, payload.problem_type),
         )
-        row = cur.fetchone()
+        row = await cur.fetchone()
 
     problem_id = row["problem_id"]
 
     # Add tags if provided
-    if payload.tags:
-        unique_tags = set(payload.tags)
-        for tag_id in unique_tags:
-            get_tag_or_404(conn, tag_id)
-            with conn.cursor() as cur:
-                cur.execute(
-                    """
-                    INSERT INTO problem_tags (problem_id, tag_id)
-                    VALUES (%s, %s)
-                    """,
-                    (problem_id, tag_id),
-                )
-
-    conn.commit()
+    if tag_ids:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                "INSERT INTO problem_tags (problem_id, tag_id) SELECT %s, unnest(%s::int[])",
+                (problem_id, list(tag_ids)),
+            )
+        await refresh_related_problems(conn, [problem_id])
+
+    await conn.commit()
+    for tag_id in tag_ids:
+        tag_index.use(tag_id, 1)
+    tag_recommender.add_item(dict.fromkeys(tag_ids, 1.0))
     return schemas.ProblemRead.model_validate(row)
 
 
+async def _read_bulk_items(request: Request) -> list:
+    """Raw items of a bulk request: a JSON array, or one object per line for
+    ``application/x-ndjson``. Unparseable NDJSON lines become ``None`` so
+    they are reported against their own index."""
+    if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+        items: list = []
+        tail = b""
+        async for chunk in request.stream():
+            *lines, tail = (tail + chunk).split(b"\n")
+            items.extend(_parse_ndjson_line(line) for line in lines if line.strip())
+            if len(items) > BULK_MAX_ITEMS:
+                break
+        if tail.strip():
+            items.append(_parse_ndjson_line(tail))
+        return items
+
+    try:
+        items = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Request body must be a JSON array")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="Request body must be a JSON array")
+    return items
+
+
+def _parse_ndjson_line(line: bytes):
+    try:
+        return json.loads(line)
+    except ValueError:
+        return None
+
+
+def _validation_message(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in error['loc']) or 'item'}: {error['msg']}" for error in exc.errors()
+    )
+
+
+@router.post(":bulk", response_model=schemas.ProblemBulkResult)
+async def bulk_create_problems(request: Request, conn: AsyncConnectionDep):
+    """Create many problems in one transaction.
+
+    Each item is a ``ProblemCreate`` payload. Items that fail validation or
+    reference a missing user or tag are reported and skipped; the rest are
+    inserted together.
+    """
+    raw_items = await _read_bulk_items(request)
+    if len(raw_items) > BULK_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {BULK_MAX_ITEMS} problems per request",
+        )
+
+    results = [schemas.ProblemBulkItemResult(index=index) for index in range(len(raw_items))]
+    valid: dict[int, schemas.ProblemCreate] = {}
+    for index, raw in enumerate(raw_items):
+        if raw is None:
+            results[index].error = "Invalid JSON"
+            continue
+        try:
+            valid[index] = schemas.ProblemCreate.model_validate(raw)
+        except ValidationError as exc:
+            results[index].error = _validation_message(exc)
+
+    missing_users, missing_tags = await find_missing_references(
+        conn,
+        {item.user_id for item in valid.values()},
+        {tag_id for item in valid.values() for tag_id in item.tags or ()},
+    )
+    for index, item in list(valid.items()):
+        if item.user_id in missing_users:
+            results[index].error = "User not found"
+        elif missing := sorted(missing_tags.intersection(item.tags or ())):
+            results[index].error = f"Tag not found: {', '.join(map(str, missing))}"
+        else:
+            continue
+        del valid[index]
+
+    problem_ids = await bulk_insert_problems(conn, list(valid.values()))
+    await refresh_related_problems(
+        conn, [problem_id for problem_id, item in zip(problem_ids, valid.values()) if item.tags]
+    )
+    await conn.commit()
+    for index, problem_id in zip(valid, problem_ids):
+        results[index].problem_id = problem_id
+    for item in valid.values():
+        for tag_id in set(item.tags or ()):
+            tag_index.use(tag_id, 1)
+        tag_recommender.add_item(dict.fromkeys(item.tags or (), 1.0))
+
+    return schemas.ProblemBulkResult(
+        created=len(problem_ids),
+        failed=len(results) - len(problem_ids),
+        items=results,
+    )
+
+
+@router.get("/similar", response_model=list[schemas.ProblemSimilar])
+async def similar_problems(
+    conn: ReadConnectionDep,
+    title: str = Query(min_length=1),
+    user_id: int | None = None,
+    threshold: float = Query(default=SIMILAR_TITLE_THRESHOLD, ge=0, le=1),
+    limit: int = Query(default=10, ge=1, le=50),
+):
+    rows = await find_similar_problems(conn, title, threshold, user_id=user_id, limit=limit)
+    return render_rows(schemas.ProblemSimilar, rows)
+
+
+@router.get("/{problem_id}/related", response_model=list[schemas.ProblemRelated])
+async def related_problems(
+    problem_id: int,
+    conn: ReadConnectionDep,
+    limit: int = Query(default=10, ge=1, le=RELATED_PROBLEMS_KEPT),
+):
+    """Problems sharing tags, resources or a relation with this one, best
+    first, read from the precomputed problem_related lists."""
+    rows = await find_related_problems(conn, problem_id, limit)
+    if not rows:
+        await get_problem_or_404(conn, problem_id)
+    return render_rows(schemas.ProblemRelated, rows)
+
+
 @router.get("/{problem_id}", response_model=schemas.ProblemWithAuthor)
-def get_problem(problem_id: int, conn: ConnectionDep):
-    problem_data = get_problem_with_author(conn, problem_id)
+async def get_problem(problem_id: int, conn: ReadConnectionDep):
+    problem_data = await get_problem_with_author(conn, problem_id)
     return schemas.ProblemWithAuthor.model_validate(problem_data)
 
 
 @router.patch("/{problem_id}", response_model=schemas.ProblemRead)
-def update_problem(problem_id: int, payload: schemas.ProblemUpdate, conn: ConnectionDep):
-    get_problem_or_404(conn, problem_id)
+async def update_problem(problem_id: int, payload: schemas.ProblemUpdate, conn: AsyncConnectionDep):
+    await get_problem_or_404(conn, problem_id)
     updates = payload.model_dump(exclude_unset=True)
 
     if not updates:
-        problem = get_problem_or_404(conn, problem_id)
+        problem = await get_problem_or_404(conn, problem_id)
         return schemas.ProblemRead.model_validate(problem)
 
     # Build dynamic SET clause
     set_clause = ", ".join([f"{k} = %s" for k in updates.keys()])
     values = list(updates.values()) + [problem_id]
 
-    with conn.cursor() as cur:
-        cur.execute(
+    async with conn.cursor() as cur:
+        await cur.execute(
             f"UPDATE problems SET {set_clause} WHERE problem_id = %s RETURNING *",
             values,
         )
-        row = cur.fetchone()
-    conn.commit()
+        row = await cur.fetchone()
+    await conn.commit()
+    response_cache.invalidate(("problem", problem_id))
     return schemas.ProblemRead.model_validate(row)
 
 
 @router.delete("/{problem_id}")
-def delete_problem(problem_id: int, conn: ConnectionDep):
-    get_problem_or_404(conn, problem_id)
-    with conn.cursor() as cur:
-        cur.execute("DELETE FROM problems WHERE problem_id = %s", (problem_id,))
-    conn.commit()
+async def delete_problem(problem_id: int, conn: AsyncConnectionDep):
+    await get_problem_or_404(conn, problem_id)
+    async with conn.cursor() as cur:
+        # Lists the problem drops out of are refilled once it is gone
+        await cur.execute(
+            "SELECT problem_id FROM problem_related WHERE related_problem_id = %s", (problem_id,)
+        )
+        listed_on = [row["problem_id"] for row in await cur.fetchall()]
+        await cur.execute("DELETE FROM problems WHERE problem_id = %s", (problem_id,))
+    await refresh_related_problems(conn, listed_on)
+    await conn.commit()
+    relation_graph.remove_node(problem_id)
+    response_cache.invalidate(("problem", problem_id))
     return {"deleted": True}
 
 
-@router.get("", response_model=list[schemas.ProblemListItem])
-def search_problems(
-    conn: ConnectionDep,
+@router.get("", response_model=list[schemas.ProblemSearchHit])
+async def search_problems(
+    conn: ReadConnectionDep,
+    response: Response,
     keyword: str | None = None,
     type: str | None = None,
     tag: str | None = None,
+    mode: SearchMode = "fts",
+    limit: LimitParam = DEFAULT_PAGE_SIZE,
+    after: CursorParam = None,
 ):
-    query = "SELECT DISTINCT p.* FROM problems p"
-    params = []
+    ranked = bool(keyword) and mode == "fts"
+
+    # The hit's fields only: search_vector is the widest column, and
+    # descriptions are read just to build snippets
+    columns = "p.problem_id, p.title, p.resolved, p.created_at"
+
+    # tag_name is unique, so the tag join yields at most one row per problem
+    if ranked:
+        query = (
+            f"SELECT {columns}, p.description, ts_rank(p.search_vector, q)::float8 AS rank FROM problems p"
+            f" CROSS JOIN websearch_to_tsquery('{TS_CONFIG}', %s) q"
+        )
+        params = [keyword]
+    else:
+        query = f"SELECT {columns} FROM problems p"
+        params = []
     conditions = []
 
     if tag:
@@ -99,7 +290,9 @@ def search_problems(
         conditions.append("LOWER(t.tag_name) = %s")
         params.append(tag.lower())
 
-    if keyword:
+    if ranked:
+        conditions.append("p.search_vector @@ q")
+    elif keyword:
         conditions.append(
             "(LOWER(p.title) LIKE %s OR LOWER(COALESCE(p.description, '')) LIKE %s)"
         )
@@ -110,24 +303,54 @@ def search_problems(
         conditions.append("LOWER(p.problem_type) = %s")
         params.append(type.lower())
 
+    if after and ranked:
+        rank, problem_id = decode_cursor(after, float, int)
+        condition, seek_params = seek_after("ts_rank(p.search_vector, q)::float8", "p.problem_id", rank, problem_id)
+        conditions.append(condition)
+        params.extend(seek_params)
+    elif after:
+        created_at, problem_id = decode_cursor(after, datetime, int)
+        condition, seek_params = seek_after("p.created_at", "p.problem_id", created_at, problem_id)
+        conditions.append(condition)
+        params.extend(seek_params)
+
     if conditions:
         query += " WHERE " + " AND ".join(conditions)
 
-    query += " ORDER BY p.created_at DESC"
-
-    with conn.cursor() as cur:
-        cur.execute(query, params)
-        rows = cur.fetchall()
-
-    return [schemas.ProblemListItem.model_validate(row) for row in rows]
+    if ranked:
+        query += " ORDER BY rank DESC, p.problem_id DESC LIMIT %s"
+        params.append(limit + 1)
+        # Highlight only the rows that made it onto the page
+        query = f"""
+            SELECT hit.problem_id, hit.title, hit.resolved, hit.created_at, hit.rank, ts_headline(
+                '{TS_CONFIG}',
+                COALESCE(NULLIF(hit.description, ''), hit.title),
+                websearch_to_tsquery('{TS_CONFIG}', %s),
+                '{HEADLINE_OPTIONS}'
+            ) AS snippet
+            FROM ({query}) hit
+            ORDER BY hit.rank DESC, hit.problem_id DESC
+        """
+        params.insert(0, keyword)
+        keys = ("rank", "problem_id")
+    else:
+        query += " ORDER BY p.created_at DESC, p.problem_id DESC LIMIT %s"
+        params.append(limit + 1)
+        keys = ("created_at", "problem_id")
+
+    async with conn.cursor() as cur:
+        await cur.execute(query, params)
+        rows = paginate(await cur.fetchall(), limit, response, *keys)
+
+    return render_rows(schemas.ProblemSearchHit, rows, response)
 
 
 @router.post("/{problem_id}/resolve", response_model=schemas.ProblemRead)
-def mark_problem_resolved(problem_id: int, conn: ConnectionDep):
-    get_problem_or_404(conn, problem_id)
+async def mark_problem_resolved(problem_id: int, conn: AsyncConnectionDep):
+    await get_problem_or_404(conn, problem_id)
 
-    with conn.cursor() as cur:
-        cur.execute(
+    async with conn.cursor() as cur:
+        await cur.execute(
             """
             UPDATE problems
             SET resolved = TRUE
@@ -136,11 +359,17 @@ def mark_problem_resolved(problem_id: int, conn: ConnectionDep):
             """,
             (problem_id,),
         )
-        row = cur.fetchone()
-    conn.commit()
+        row = await cur.fetchone()
+    await conn.commit()
+    response_cache.invalidate(("problem", problem_id))
     return schemas.ProblemRead.model_validate(row)
 
 
 @router.get("/{problem_id}/full", response_model=schemas.ProblemFull)
-def problem_full(problem_id: int, conn: ConnectionDep):
-    return build_problem_full(conn, problem_id)
+async def problem_full(problem_id: int, request: Request, conn: ReadConnectionDep):
+    version = await content_version(conn, "problem", problem_id)
+    etag = make_etag("problem", problem_id, version)
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    body = await render_problem_full(conn, problem_id, version)
+    return with_etag(Response(body, media_type="application/json"), etag)
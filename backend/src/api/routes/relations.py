@@ -1,224 +1,270 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Query, Response, status
 from psycopg import errors
 
 from src.api import schemas
-from src.api.deps import ConnectionDep
+from src.api.cache import response_cache
+from src.api.deps import AsyncConnectionDep, ReadConnectionDep
+from src.api.graph import RelationDirection, relation_graph
 from src.api.routes.utils import (
     get_problem_or_404,
-    get_resource_or_404,
     get_solution_or_404,
 )
-from src.api.services.problems import build_problem_full
+from src.api.services.problems import refresh_related_problems, render_problem_full
+from src.api.serialization import render_rows
+from src.db.errors import handle_db_error
 
 
 router = APIRouter(tags=["relations"])
 
 
 @router.post("/problems/{problem_id}/relations", response_model=schemas.ProblemRelationRead, status_code=status.HTTP_201_CREATED)
-def create_problem_relation(problem_id: int, payload: schemas.ProblemRelationCreate, conn: ConnectionDep):
-    get_problem_or_404(conn, problem_id)
-    get_problem_or_404(conn, payload.to_problem_id)
-
+async def create_problem_relation(problem_id: int, payload: schemas.ProblemRelationCreate, conn: AsyncConnectionDep):
     try:
-        with conn.cursor() as cur:
-            cur.execute(
+        async with conn.cursor() as cur:
+            await cur.execute(
                 """
                 INSERT INTO problem_relations (from_problem_id, to_problem_id, relation_type, strength)
                 VALUES (%s, %s, %s, %s)
+                ON CONFLICT (from_problem_id, to_problem_id) DO NOTHING
                 RETURNING *
                 """,
                 (problem_id, payload.to_problem_id, payload.relation_type, payload.strength),
             )
-            row = cur.fetchone()
-        conn.commit()
-        return schemas.ProblemRelationRead.model_validate(row)
-    except errors.UniqueViolation:
-        conn.rollback()
+            row = await cur.fetchone()
+    except errors.IntegrityError as e:
+        await conn.rollback()
+        handle_db_error(e)
+
+    if row is None:
+        await conn.rollback()
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Relation already exists")
 
+    await refresh_related_problems(conn, [problem_id, payload.to_problem_id])
+    await conn.commit()
+    relation_graph.add(problem_id, payload.to_problem_id, row["strength"], row["relation_type"])
+    response_cache.invalidate(("problem", problem_id), ("problem", payload.to_problem_id))
+    return schemas.ProblemRelationRead.model_validate(row)
+
 
 @router.delete("/problems/{problem_id}/relations/{to_problem_id}")
-def delete_problem_relation(problem_id: int, to_problem_id: int, conn: ConnectionDep):
-    with conn.cursor() as cur:
-        cur.execute(
+async def delete_problem_relation(problem_id: int, to_problem_id: int, conn: AsyncConnectionDep):
+    async with conn.cursor() as cur:
+        await cur.execute(
             """
             SELECT * FROM problem_relations
             WHERE from_problem_id = %s AND to_problem_id = %s
             """,
             (problem_id, to_problem_id),
         )
-        relation = cur.fetchone()
+        relation = await cur.fetchone()
 
     if not relation:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Relation not found")
 
-    with conn.cursor() as cur:
-        cur.execute(
+    async with conn.cursor() as cur:
+        await cur.execute(
             """
             DELETE FROM problem_relations
             WHERE from_problem_id = %s AND to_problem_id = %s
             """,
             (problem_id, to_problem_id),
         )
-    conn.commit()
+    await refresh_related_problems(conn, [problem_id, to_problem_id])
+    await conn.commit()
+    relation_graph.remove(problem_id, to_problem_id)
+    response_cache.invalidate(("problem", problem_id), ("problem", to_problem_id))
     return {"deleted": True}
 
 
 @router.get("/problems/{problem_id}/relations/out", response_model=list[schemas.ProblemRelationRead])
-def list_problem_relations_out(problem_id: int, conn: ConnectionDep):
-    get_problem_or_404(conn, problem_id)
+async def list_problem_relations_out(problem_id: int, conn: ReadConnectionDep):
+    await get_problem_or_404(conn, problem_id)
 
-    with conn.cursor() as cur:
-        cur.execute(
+    async with conn.cursor() as cur:
+        await cur.execute(
             """
             SELECT * FROM problem_relations
             WHERE from_problem_id = %s
             """,
             (problem_id,),
         )
-        rows = cur.fetchall()
+        rows = await cur.fetchall()
 
-    return [schemas.ProblemRelationRead.model_validate(row) for row in rows]
+    return render_rows(schemas.ProblemRelationRead, rows)
 
 
 @router.get("/problems/{problem_id}/relations/in", response_model=list[schemas.ProblemRelationRead])
-def list_problem_relations_in(problem_id: int, conn: ConnectionDep):
-    get_problem_or_404(conn, problem_id)
+async def list_problem_relations_in(problem_id: int, conn: ReadConnectionDep):
+    await get_problem_or_404(conn, problem_id)
 
-    with conn.cursor() as cur:
-        cur.execute(
+    async with conn.cursor() as cur:
+        await cur.execute(
             """
             SELECT * FROM problem_relations
             WHERE to_problem_id = %s
             """,
             (problem_id,),
         )
-        rows = cur.fetchall()
-
-    return [schemas.ProblemRelationRead.model_validate(row) for row in rows]
+        rows = await cur.fetchall()
+
+    return render_rows(schemas.ProblemRelationRead, rows)
+
+
+def _relation(edge) -> schemas.ProblemRelationRead:
+    from_id, to_id, strength, relation_type = edge
+    return schemas.ProblemRelationRead(
+        from_problem_id=from_id,
+        to_problem_id=to_id,
+        relation_type=relation_type,
+        strength=strength,
+    )
+
+
+@router.get("/problems/{problem_id}/neighborhood", response_model=schemas.ProblemNeighborhood)
+async def get_problem_neighborhood(
+    problem_id: int,
+    depth: int = Query(default=2, ge=1, le=6),
+    min_strength: float = Query(default=0, ge=0, le=1),
+    direction: RelationDirection = "both",
+    max_nodes: int = Query(default=500, ge=1, le=5000),
+):
+    """Problems within ``depth`` relation hops, answered from the in-memory graph."""
+    distances, edges, truncated = relation_graph.neighborhood(
+        problem_id, depth, min_strength, direction, max_nodes
+    )
+    return schemas.ProblemNeighborhood(
+        problem_id=problem_id,
+        nodes=[schemas.ProblemNeighbor(problem_id=p, distance=d) for p, d in distances.items()],
+        edges=[_relation(edge) for edge in edges],
+        truncated=truncated,
+    )
+
+
+@router.get("/problems/{problem_id}/path/{to_problem_id}", response_model=schemas.ProblemPath)
+async def get_problem_path(
+    problem_id: int,
+    to_problem_id: int,
+    max_depth: int = Query(default=6, ge=1, le=12),
+    min_strength: float = Query(default=0, ge=0, le=1),
+    direction: RelationDirection = "both",
+):
+    """Fewest-hop chain of relations between two problems."""
+    found = relation_graph.shortest_path(problem_id, to_problem_id, max_depth, min_strength, direction)
+    if found is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No path found")
+
+    problem_ids, edges = found
+    return schemas.ProblemPath(
+        from_problem_id=problem_id,
+        to_problem_id=to_problem_id,
+        problem_ids=problem_ids,
+        edges=[_relation(edge) for edge in edges],
+    )
 
 
 @router.post("/problems/{problem_id}/resources", response_model=schemas.ProblemFull)
-def attach_resource_to_problem(problem_id: int, payload: schemas.ProblemResourceAttach, conn: ConnectionDep):
-    get_problem_or_404(conn, problem_id)
-    get_resource_or_404(conn, payload.resource_id)
-
-    # Check if link exists (upsert pattern)
-    with conn.cursor() as cur:
-        cur.execute(
-            """
-            SELECT * FROM problem_resources
-            WHERE problem_id = %s AND resource_id = %s
-            """,
-            (problem_id, payload.resource_id),
-        )
-        existing = cur.fetchone()
-
-    if not existing:
-        with conn.cursor() as cur:
-            cur.execute(
+async def attach_resource_to_problem(problem_id: int, payload: schemas.ProblemResourceAttach, conn: AsyncConnectionDep):
+    try:
+        async with conn.cursor() as cur:
+            await cur.execute(
                 """
                 INSERT INTO problem_resources (problem_id, resource_id, relevance_score, contribution_type)
                 VALUES (%s, %s, %s, %s)
+                ON CONFLICT (problem_id, resource_id) DO UPDATE
+                SET relevance_score = EXCLUDED.relevance_score,
+                    contribution_type = EXCLUDED.contribution_type
+                RETURNING (xmax = 0) AS inserted
                 """,
                 (problem_id, payload.resource_id, payload.relevance_score, payload.contribution_type),
             )
-    else:
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                UPDATE problem_resources
-                SET relevance_score = %s, contribution_type = %s
-                WHERE problem_id = %s AND resource_id = %s
-                """,
-                (payload.relevance_score, payload.contribution_type, problem_id, payload.resource_id),
-            )
-    conn.commit()
-    return build_problem_full(conn, problem_id)
+            if (await cur.fetchone())["inserted"]:
+                await refresh_related_problems(conn, [problem_id])
+    except errors.IntegrityError as e:
+        await conn.rollback()
+        handle_db_error(e)
+    await conn.commit()
+    response_cache.invalidate(("problem", problem_id), ("resource", payload.resource_id))
+    return Response(await render_problem_full(conn, problem_id), media_type="application/json")
 
 
 @router.delete("/problems/{problem_id}/resources/{resource_id}", response_model=schemas.ProblemFull)
-def detach_resource_from_problem(problem_id: int, resource_id: int, conn: ConnectionDep):
-    with conn.cursor() as cur:
-        cur.execute(
+async def detach_resource_from_problem(problem_id: int, resource_id: int, conn: AsyncConnectionDep):
+    async with conn.cursor() as cur:
+        await cur.execute(
             """
             SELECT * FROM problem_resources
             WHERE problem_id = %s AND resource_id = %s
             """,
             (problem_id, resource_id),
         )
-        link = cur.fetchone()
+        link = await cur.fetchone()
 
     if not link:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Attachment not found")
 
-    with conn.cursor() as cur:
-        cur.execute(
+    async with conn.cursor() as cur:
+        await cur.execute(
             """
             DELETE FROM problem_resources
             WHERE problem_id = %s AND resource_id = %s
             """,
             (problem_id, resource_id),
         )
-    conn.commit()
-    return build_problem_full(conn, problem_id)
+    await refresh_related_problems(conn, [problem_id])
+    await conn.commit()
+    response_cache.invalidate(("problem", problem_id), ("resource", resource_id))
+    return Response(await render_problem_full(conn, problem_id), media_type="application/json")
 
 
 @router.post("/solutions/{solution_id}/resources", response_model=schemas.SolutionRead)
-def attach_resource_to_solution(solution_id: int, payload: schemas.SolutionResourceAttach, conn: ConnectionDep):
-    get_solution_or_404(conn, solution_id)
-    get_resource_or_404(conn, payload.resource_id)
-
-    # Check if link exists
-    with conn.cursor() as cur:
-        cur.execute(
-            """
-            SELECT * FROM solution_resources
-            WHERE solution_id = %s AND resource_id = %s
-            """,
-            (solution_id, payload.resource_id),
-        )
-        existing = cur.fetchone()
-
-    if not existing:
-        with conn.cursor() as cur:
-            cur.execute(
+async def attach_resource_to_solution(solution_id: int, payload: schemas.SolutionResourceAttach, conn: AsyncConnectionDep):
+    try:
+        async with conn.cursor() as cur:
+            await cur.execute(
                 """
                 INSERT INTO solution_resources (solution_id, resource_id)
                 VALUES (%s, %s)
+                ON CONFLICT (solution_id, resource_id) DO NOTHING
                 """,
                 (solution_id, payload.resource_id),
             )
-        conn.commit()
-
-    solution = get_solution_or_404(conn, solution_id)
+            inserted = cur.rowcount
+    except errors.IntegrityError as e:
+        await conn.rollback()
+        handle_db_error(e)
+    await conn.commit()
+    if inserted:
+        response_cache.invalidate(("solution", solution_id), ("resource", payload.resource_id))
+
+    solution = await get_solution_or_404(conn, solution_id)
     return schemas.SolutionRead.model_validate(solution)
 
 
 @router.delete("/solutions/{solution_id}/resources/{resource_id}", response_model=schemas.SolutionRead)
-def detach_resource_from_solution(solution_id: int, resource_id: int, conn: ConnectionDep):
-    with conn.cursor() as cur:
-        cur.execute(
+async def detach_resource_from_solution(solution_id: int, resource_id: int, conn: AsyncConnectionDep):
+    async with conn.cursor() as cur:
+        await cur.execute(
             """
             SELECT * FROM solution_resources
             WHERE solution_id = %s AND resource_id = %s
             """,
             (solution_id, resource_id),
         )
-        link = cur.fetchone()
+        link = await cur.fetchone()
 
     if not link:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Attachment not found")
 
-    with conn.cursor() as cur:
-        cur.execute(
+    async with conn.cursor() as cur:
+        await cur.execute(
             """
             DELETE FROM solution_resources
             WHERE solution_id = %s AND resource_id = %s
             """,
             (solution_id, resource_id),
         )
-    conn.commit()
+    await conn.commit()
+    response_cache.invalidate(("solution", solution_id), ("resource", resource_id))
 
-    solution = get_solution_or_404(conn, solution_id)
+    solution = await get_solution_or_404(conn, solution_id)
     return schemas.SolutionRead.model_validate(solution)
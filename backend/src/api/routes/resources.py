@@ -1,23 +1,48 @@
 from datetime import datetime
 
-from fastapi import APIRouter, status
+from fastapi import APIRouter, Query, Request, Response, status
 
 from src.api import schemas
-from src.api.deps import ConnectionDep
+from src.api.cache import response_cache
+from src.api.deps import AsyncConnectionDep, ReadConnectionDep
+from src.api.pagination import DEFAULT_PAGE_SIZE, CursorParam, LimitParam, decode_cursor, paginate, seek_after
+from src.api.search import HEADLINE_OPTIONS, TS_CONFIG, SearchMode
+from src.api.serialization import render_model, render_rows
+from src.api.versions import is_not_modified, make_etag, not_modified, with_etag
+from src.api.visits import visit_buffer
 from src.api.routes.utils import get_resource_or_404, get_user_or_404
-from src.api.services.resources import build_resource_detail
+from src.api.services.resources import (
+    SIMILAR_URL_THRESHOLD,
+    find_resource_by_url,
+    find_similar_resources,
+    lookup_resources_by_url,
+    render_resource_detail,
+    resource_detail_version,
+)
 
 
 router = APIRouter(prefix="/resources", tags=["resources"])
 
 
 @router.post("", response_model=schemas.ResourceRead, status_code=status.HTTP_201_CREATED)
-def create_resource(payload: schemas.ResourceCreate, conn: ConnectionDep):
-    get_user_or_404(conn, payload.user_id)
+async def create_resource(
+    payload: schemas.ResourceCreate,
+    conn: AsyncConnectionDep,
+    response: Response,
+    dedupe: bool = False,
+):
+    await get_user_or_404(conn, payload.user_id)
+
+    if dedupe:
+        existing = await find_resource_by_url(conn, payload.user_id, payload.url)
+        if existing:
+            response.status_code = status.HTTP_200_OK
+            return schemas.ResourceRead.model_validate(existing)
+
     now = datetime.now()
 
-    with conn.cursor() as cur:
-        cur.execute(
+    async with conn.cursor() as cur:
+        await cur.execute(
             """
             INSERT INTO resources (
                 user_id, url, title, source_platform, content_summary,
@@ -37,68 +62,136 @@ def create_resource(payload: schemas.ResourceCreate, conn: ConnectionDep):
                 now,
             ),
         )
-        row = cur.fetchone()
-    conn.commit()
+        row = await cur.fetchone()
+    await conn.commit()
     return schemas.ResourceRead.model_validate(row)
 
 
+@router.get("/similar", response_model=list[schemas.ResourceSimilar])
+async def similar_resources(
+    conn: ReadConnectionDep,
+    url: str = Query(min_length=1),
+    user_id: int | None = None,
+    threshold: float = Query(default=SIMILAR_URL_THRESHOLD, ge=0, le=1),
+    limit: int = Query(default=10, ge=1, le=50),
+):
+    rows = await find_similar_resources(conn, url, threshold, user_id=user_id, limit=limit)
+    return render_rows(schemas.ResourceSimilar, rows)
+
+
+@router.get("/lookup", response_model=schemas.ResourceLookup)
+async def lookup_resource(conn: ReadConnectionDep, user_id: int, url: str = Query(min_length=1)):
+    """Whether the user already saved ``url``, compared by normalized URL."""
+    [resource] = await lookup_resources_by_url(conn, user_id, [url])
+    return render_model(schemas.ResourceLookup, {"url": url, "resource": resource})
+
+
+@router.post("/lookup:batch", response_model=list[schemas.ResourceLookup])
+async def lookup_resources(payload: schemas.ResourceLookupBatch, conn: ReadConnectionDep):
+    """``GET /resources/lookup`` for many URLs at once, answered in order."""
+    resources = await lookup_resources_by_url(conn, payload.user_id, payload.urls)
+    return render_rows(
+        schemas.ResourceLookup,
+        [{"url": url, "resource": resource} for url, resource in zip(payload.urls, resources)],
+    )
+
+
 @router.get("/{resource_id}", response_model=schemas.ResourceDetail)
-def get_resource(resource_id: int, conn: ConnectionDep):
-    return build_resource_detail(conn, resource_id)
+async def get_resource(resource_id: int, request: Request, conn: ReadConnectionDep):
+    version = await resource_detail_version(conn, resource_id)
+    etag = make_etag("resource", resource_id, version)
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    body = await render_resource_detail(conn, resource_id, version)
+    return with_etag(Response(body, media_type="application/json"), etag)
 
 
 @router.patch("/{resource_id}", response_model=schemas.ResourceRead)
-def update_resource(resource_id: int, payload: schemas.ResourceUpdate, conn: ConnectionDep):
-    get_resource_or_404(conn, resource_id)
+async def update_resource(resource_id: int, payload: schemas.ResourceUpdate, conn: AsyncConnectionDep):
+    await get_resource_or_404(conn, resource_id)
     updates = payload.model_dump(exclude_unset=True)
 
     if not updates:
-        resource = get_resource_or_404(conn, resource_id)
+        resource = await get_resource_or_404(conn, resource_id)
         return schemas.ResourceRead.model_validate(resource)
 
     # Build dynamic SET clause
     set_clause = ", ".join([f"{k} = %s" for k in updates.keys()])
     values = list(updates.values()) + [resource_id]
 
-    with conn.cursor() as cur:
-        cur.execute(
+    async with conn.cursor() as cur:
+        await cur.execute(
             f"UPDATE resources SET {set_clause} WHERE resource_id = %s RETURNING *",
             values,
         )
-        row = cur.fetchone()
-    conn.commit()
+        row = await cur.fetchone()
+    await conn.commit()
+    response_cache.invalidate(("resource", resource_id))
     return schemas.ResourceRead.model_validate(row)
 
 
-@router.post("/{resource_id}/visit", response_model=schemas.ResourceRead)
-def visit_resource(resource_id: int, conn: ConnectionDep):
-    get_resource_or_404(conn, resource_id)
+@router.post("/{resource_id}/visit", status_code=status.HTTP_202_ACCEPTED)
+async def visit_resource(resource_id: int):
+    # Written by the visit buffer's next flush. No lookup first: the flush's
+    # UPDATE joins on resource_id, so visits to unknown ids are dropped there
+    visit_buffer.record(resource_id)
+    return {"accepted": True}
 
-    with conn.cursor() as cur:
-        cur.execute(
-            """
-            UPDATE resources
-            SET visit_count = visit_count + 1,
-                last_visited_at = %s
-            WHERE resource_id = %s
-            RETURNING *
-            """,
-            (datetime.now(), resource_id),
+
+@router.post(
+    "/visits:batch",
+    response_model=schemas.ResourceVisitBatchResult,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def record_visits(payload: schemas.ResourceVisitBatch, conn: AsyncConnectionDep):
+    resource_ids = {visit.resource_id for visit in payload.visits}
+
+    async with conn.cursor() as cur:
+        await cur.execute(
+            "SELECT resource_id FROM resources WHERE resource_id = ANY(%s)",
+            (list(resource_ids),),
         )
-        row = cur.fetchone()
-    conn.commit()
-    return schemas.ResourceRead.model_validate(row)
+        known = {row["resource_id"] for row in await cur.fetchall()}
+
+    accepted = 0
+    for visit in payload.visits:
+        if visit.resource_id in known:
+            visit_buffer.record(visit.resource_id, visit.visited_at)
+            accepted += 1
 
+    return schemas.ResourceVisitBatchResult(accepted=accepted, missing=sorted(resource_ids - known))
 
-@router.get("", response_model=list[schemas.ResourceSummary])
-def search_resources(
-    conn: ConnectionDep,
+
+@router.get("", response_model=list[schemas.ResourceSearchHit])
+async def search_resources(
+    conn: ReadConnectionDep,
+    response: Response,
     tag: str | None = None,
     min_score: float | None = None,
     keyword: str | None = None,
+    mode: SearchMode = "fts",
+    limit: LimitParam = DEFAULT_PAGE_SIZE,
+    after: CursorParam = None,
 ):
-    query = "SELECT DISTINCT r.* FROM resources r"
-    params = []
+    ranked = bool(keyword) and mode == "fts"
+
+    # The hit's fields only: the generated columns (search_vector above all)
+    # are the widest and never leave the database
+    columns = (
+        "r.resource_id, r.user_id, r.url, r.title, r.source_platform, r.content_summary,"
+        " r.usefulness_score, r.visit_count, r.first_visited_at, r.last_visited_at"
+    )
+
+    # tag_name is unique, so the tag join yields at most one row per resource
+    if ranked:
+        query = (
+            f"SELECT {columns}, ts_rank(r.search_vector, q)::float8 AS rank FROM resources r"
+            f" CROSS JOIN websearch_to_tsquery('{TS_CONFIG}', %s) q"
+        )
+        params = [keyword]
+    else:
+        query = f"SELECT {columns} FROM resources r"
+        params = []
     conditions = []
 
     if tag:
@@ -111,20 +204,52 @@ def search_resources(
         conditions.append("r.usefulness_score >= %s")
         params.append(min_score)
 
-    if keyword:
+    if ranked:
+        conditions.append("r.search_vector @@ q")
+    elif keyword:
         conditions.append(
             "(LOWER(r.title) LIKE %s OR LOWER(COALESCE(r.content_summary, '')) LIKE %s)"
         )
         pattern = f"%{keyword.lower()}%"
         params.extend([pattern, pattern])
 
+    if after and ranked:
+        rank, resource_id = decode_cursor(after, float, int)
+        condition, seek_params = seek_after("ts_rank(r.search_vector, q)::float8", "r.resource_id", rank, resource_id)
+        conditions.append(condition)
+        params.extend(seek_params)
+    elif after:
+        last_visited_at, resource_id = decode_cursor(after, datetime, int)
+        condition, seek_params = seek_after("r.last_visited_at", "r.resource_id", last_visited_at, resource_id)
+        conditions.append(condition)
+        params.extend(seek_params)
+
     if conditions:
         query += " WHERE " + " AND ".join(conditions)
 
-    query += " ORDER BY r.last_visited_at DESC, r.resource_id DESC"
-
-    with conn.cursor() as cur:
-        cur.execute(query, params)
-        rows = cur.fetchall()
-
-    return [schemas.ResourceSummary.model_validate(row) for row in rows]
+    if ranked:
+        query += " ORDER BY rank DESC, r.resource_id DESC LIMIT %s"
+        params.append(limit + 1)
+        # Highlight only the rows that made it onto the page
+        query = f"""
+            SELECT hit.*, ts_headline(
+                '{TS_CONFIG}',
+                COALESCE(NULLIF(hit.content_summary, ''), hit.title, ''),
+                websearch_to_tsquery('{TS_CONFIG}', %s),
+                '{HEADLINE_OPTIONS}'
+            ) AS snippet
+            FROM ({query}) hit
+            ORDER BY hit.rank DESC, hit.resource_id DESC
+        """
+        params.insert(0, keyword)
+        keys = ("rank", "resource_id")
+    else:
+        query += " ORDER BY r.last_visited_at DESC, r.resource_id DESC LIMIT %s"
+        params.append(limit + 1)
+        keys = ("last_visited_at", "resource_id")
+
+    async with conn.cursor() as cur:
+        await cur.execute(query, params)
+        rows = paginate(await cur.fetchall(), limit, response, *keys)
+
+    return render_rows(schemas.ResourceSearchHit, rows, response)
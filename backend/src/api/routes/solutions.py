@@ -1,29 +1,38 @@
-from fastapi import APIRouter, HTTPException, status
+from datetime import datetime
+
+from fastapi import APIRouter, HTTPException, Query, Response, status
 
 from src.api import schemas
-from src.api.deps import ConnectionDep
+from src.api.cache import response_cache
+from src.api.deps import AsyncConnectionDep, ReadConnectionDep
+from src.api.pagination import DEFAULT_PAGE_SIZE, CursorParam, LimitParam, decode_cursor, paginate, seek_after
 from src.api.routes.utils import get_problem_or_404, get_solution_or_404
+from src.api.serialization import render_model, render_rows
 
 
 router = APIRouter(tags=["solutions"])
 
 
+def _int_list(value) -> list[int]:
+    return [int(v) for v in value]
+
+
 @router.post(
     "/problems/{problem_id}/solutions",
     response_model=schemas.SolutionRead,
     status_code=status.HTTP_201_CREATED,
 )
-def create_solution(problem_id: int, payload: schemas.SolutionCreate, conn: ConnectionDep):
+async def create_solution(problem_id: int, payload: schemas.SolutionCreate, conn: AsyncConnectionDep):
     if payload.problem_id != problem_id:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Problem ID mismatch")
 
-    get_problem_or_404(conn, problem_id)
+    await get_problem_or_404(conn, problem_id)
 
     if payload.parent_solution_id:
-        get_solution_or_404(conn, payload.parent_solution_id)
+        await get_solution_or_404(conn, payload.parent_solution_id)
 
-    with conn.cursor() as cur:
-        cur.execute(
+    async with conn.cursor() as cur:
+        await cur.execute(
             """
             INSERT INTO solutions (
                 problem_id, parent_solution_id, code_snippet, explanation,
@@ -43,38 +52,38 @@ def create_solution(problem_id: int, payload: schemas.SolutionCreate, conn: Conn
                 payload.branch_type,
             ),
         )
-        row = cur.fetchone()
-    conn.commit()
+        row = await cur.fetchone()
+    await conn.commit()
+    response_cache.invalidate(("problem", problem_id))
     return schemas.SolutionRead.model_validate(row)
 
 
 @router.get("/solutions/{solution_id}", response_model=schemas.SolutionDetail)
-def get_solution(solution_id: int, conn: ConnectionDep):
-    solution = get_solution_or_404(conn, solution_id)
+async def get_solution(solution_id: int, conn: ReadConnectionDep):
+    solution = await get_solution_or_404(conn, solution_id)
 
     # Get children count
-    with conn.cursor() as cur:
-        cur.execute(
+    async with conn.cursor() as cur:
+        await cur.execute(
             "SELECT COUNT(*) as count FROM solutions WHERE parent_solution_id = %s",
             (solution_id,),
         )
-        children_count = cur.fetchone()["count"]
+        children_count = (await cur.fetchone())["count"]
 
     # Get parent solution if exists
     parent = None
     if solution["parent_solution_id"]:
-        parent = get_solution_or_404(conn, solution["parent_solution_id"])
+        parent = await get_solution_or_404(conn, solution["parent_solution_id"])
 
-    return schemas.SolutionDetail(
-        **schemas.SolutionRead.model_validate(solution).model_dump(),
-        children_count=children_count,
-        parent_solution=schemas.SolutionRead.model_validate(parent) if parent else None,
+    return render_model(
+        schemas.SolutionDetail,
+        {**solution, "children_count": children_count, "parent_solution": parent},
     )
 
 
 @router.patch("/solutions/{solution_id}", response_model=schemas.SolutionRead)
-def update_solution(solution_id: int, payload: schemas.SolutionUpdate, conn: ConnectionDep):
-    solution = get_solution_or_404(conn, solution_id)
+async def update_solution(solution_id: int, payload: schemas.SolutionUpdate, conn: AsyncConnectionDep):
+    solution = await get_solution_or_404(conn, solution_id)
     updates = payload.model_dump(exclude_unset=True)
 
     if not updates:
@@ -82,65 +91,163 @@ def update_solution(solution_id: int, payload: schemas.SolutionUpdate, conn: Con
 
     # Validate references if being updated
     if "parent_solution_id" in updates and updates["parent_solution_id"]:
-        get_solution_or_404(conn, updates["parent_solution_id"])
+        parent = await get_solution_or_404(conn, updates["parent_solution_id"])
+        # The parent's path lists all of its ancestors
+        if solution_id in parent["path"]:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="A solution cannot descend from itself",
+            )
 
     if "problem_id" in updates and updates["problem_id"] and updates["problem_id"] != solution["problem_id"]:
-        get_problem_or_404(conn, updates["problem_id"])
+        await get_problem_or_404(conn, updates["problem_id"])
 
     # Build dynamic SET clause
     set_clause = ", ".join([f"{k} = %s" for k in updates.keys()])
     values = list(updates.values()) + [solution_id]
 
-    with conn.cursor() as cur:
-        cur.execute(
+    async with conn.cursor() as cur:
+        await cur.execute(
             f"UPDATE solutions SET {set_clause} WHERE solution_id = %s RETURNING *",
             values,
         )
-        row = cur.fetchone()
-    conn.commit()
+        row = await cur.fetchone()
+    await conn.commit()
+    # A solution moved to another problem also changes that problem's payload
+    response_cache.invalidate(("solution", solution_id), ("problem", row["problem_id"]))
     return schemas.SolutionRead.model_validate(row)
 
 
 @router.delete("/solutions/{solution_id}")
-def delete_solution(solution_id: int, conn: ConnectionDep):
-    get_solution_or_404(conn, solution_id)
-    with conn.cursor() as cur:
-        cur.execute("DELETE FROM solutions WHERE solution_id = %s", (solution_id,))
-    conn.commit()
+async def delete_solution(solution_id: int, conn: AsyncConnectionDep):
+    await get_solution_or_404(conn, solution_id)
+    async with conn.cursor() as cur:
+        # Delete the whole subtree by path so every removed id comes back
+        # for cache invalidation
+        await cur.execute(
+            """
+            DELETE FROM solutions s
+            USING solutions root
+            WHERE root.solution_id = %s
+              AND s.path >= root.path AND s.path < path_upper_bound(root.path)
+            RETURNING s.solution_id
+            """,
+            (solution_id,),
+        )
+        removed = [row["solution_id"] for row in await cur.fetchall()]
+    await conn.commit()
+    response_cache.invalidate(*(("solution", sid) for sid in removed))
     return {"deleted": True}
 
 
 @router.get("/problems/{problem_id}/solutions", response_model=list[schemas.SolutionRead])
-def list_problem_solutions(problem_id: int, conn: ConnectionDep):
-    get_problem_or_404(conn, problem_id)
+async def list_problem_solutions(
+    problem_id: int,
+    conn: ReadConnectionDep,
+    response: Response,
+    limit: LimitParam = DEFAULT_PAGE_SIZE,
+    after: CursorParam = None,
+):
+    await get_problem_or_404(conn, problem_id)
 
-    with conn.cursor() as cur:
-        cur.execute(
-            """
-            SELECT * FROM solutions
-            WHERE problem_id = %s
-            ORDER BY created_at DESC
-            """,
-            (problem_id,),
-        )
-        rows = cur.fetchall()
+    query = "SELECT * FROM solutions WHERE problem_id = %s"
+    params = [problem_id]
 
-    return [schemas.SolutionRead.model_validate(row) for row in rows]
+    if after:
+        condition, seek_params = seek_after("created_at", "solution_id", *decode_cursor(after, datetime, int))
+        query += f" AND {condition}"
+        params.extend(seek_params)
 
+    query += " ORDER BY created_at DESC, solution_id DESC LIMIT %s"
+    params.append(limit + 1)
 
-@router.get("/solutions/{solution_id}/children", response_model=list[schemas.SolutionRead])
-def get_solution_children(solution_id: int, conn: ConnectionDep):
-    get_solution_or_404(conn, solution_id)
+    async with conn.cursor() as cur:
+        await cur.execute(query, params)
+        rows = paginate(await cur.fetchall(), limit, response, "created_at", "solution_id")
 
-    with conn.cursor() as cur:
-        cur.execute(
+    return render_rows(schemas.SolutionRead, rows, response)
+
+
+@router.get("/solutions/{solution_id}/children", response_model=list[schemas.SolutionRead])
+async def get_solution_children(
+    solution_id: int,
+    conn: ReadConnectionDep,
+    response: Response,
+    limit: LimitParam = DEFAULT_PAGE_SIZE,
+    after: CursorParam = None,
+):
+    await get_solution_or_404(conn, solution_id)
+
+    query = "SELECT * FROM solutions WHERE parent_solution_id = %s"
+    params = [solution_id]
+
+    if after:
+        condition, seek_params = seek_after("created_at", "solution_id", *decode_cursor(after, datetime, int))
+        query += f" AND {condition}"
+        params.extend(seek_params)
+
+    query += " ORDER BY created_at DESC, solution_id DESC LIMIT %s"
+    params.append(limit + 1)
+
+    async with conn.cursor() as cur:
+        await cur.execute(query, params)
+        rows = paginate(await cur.fetchall(), limit, response, "created_at", "solution_id")
+
+    return render_rows(schemas.SolutionRead, rows, response)
+
+
+@router.get("/solutions/{solution_id}/lineage", response_model=list[schemas.SolutionTreeNode])
+async def get_solution_lineage(solution_id: int, conn: ReadConnectionDep):
+    """Ancestors from the root version down to and including this solution."""
+    async with conn.cursor() as cur:
+        await cur.execute(
             """
-            SELECT * FROM solutions
-            WHERE parent_solution_id = %s
-            ORDER BY created_at DESC
+            SELECT a.*, cardinality(a.path) - 1 AS depth
+            FROM solutions s
+            JOIN solutions a ON a.solution_id = ANY(s.path)
+            WHERE s.solution_id = %s
+            ORDER BY a.path
             """,
             (solution_id,),
         )
-        rows = cur.fetchall()
-
-    return [schemas.SolutionRead.model_validate(row) for row in rows]
+        rows = await cur.fetchall()
+
+    if not rows:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Solution not found")
+    return render_rows(schemas.SolutionTreeNode, rows)
+
+
+@router.get("/solutions/{solution_id}/tree", response_model=list[schemas.SolutionTreeNode])
+async def get_solution_tree(
+    solution_id: int,
+    conn: ReadConnectionDep,
+    response: Response,
+    depth: int = Query(default=10, ge=0, le=100, description="Levels below this solution"),
+    limit: LimitParam = DEFAULT_PAGE_SIZE,
+    after: CursorParam = None,
+):
+    """This solution and its descendants in depth-first order."""
+    root = await get_solution_or_404(conn, solution_id)
+
+    # Path order is depth-first order, and the subtree is one index range
+    query = """
+        SELECT *, cardinality(path) - 1 AS depth
+        FROM solutions
+        WHERE path >= %s::int[] AND path < path_upper_bound(%s::int[])
+          AND cardinality(path) <= %s
+    """
+    params = [root["path"], root["path"], len(root["path"]) + depth]
+
+    if after:
+        (path,) = decode_cursor(after, _int_list)
+        query += " AND path > %s::int[]"
+        params.append(path)
+
+    query += " ORDER BY path LIMIT %s"
+    params.append(limit + 1)
+
+    async with conn.cursor() as cur:
+        await cur.execute(query, params)
+        rows = paginate(await cur.fetchall(), limit, response, "path")
+
+    return render_rows(schemas.SolutionTreeNode, rows, response)
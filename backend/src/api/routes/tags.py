@@ -1,19 +1,31 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Query, Response, status
 from psycopg import errors
 
 from src.api import schemas
-from src.api.deps import ConnectionDep
-from src.api.routes.utils import get_problem_or_404, get_problem_with_author, get_resource_or_404, get_tag_or_404
+from src.api.cache import response_cache
+from src.api.deps import AsyncConnectionDep, ReadConnectionDep
+from src.api.pagination import DEFAULT_PAGE_SIZE, CursorParam, LimitParam, decode_cursor, paginate
+from src.api.routes.utils import get_problem_or_404, get_problem_with_author, get_resource_or_404
+from src.api.services.problems import refresh_related_problems
+from src.api.serialization import render_rows
+from src.api.tag_index import MAX_SUGGESTIONS, tag_index
+from src.api.tag_recommender import resource_tag_weight, tag_recommender
+from src.db.errors import handle_db_error
 
 
 router = APIRouter(tags=["tags"])
 
+# Held until commit, so concurrent tag writes on one problem or resource take
+# turns: each reads the tags the previous one committed and the recommender
+# gets exact deltas. Pipelined with the write, so it costs no round trip.
+_LOCK_ITEM_TAGS = "SELECT pg_advisory_xact_lock(%s::regclass::oid::int, %s)"
+
 
 @router.post("/tags", response_model=schemas.TagRead, status_code=status.HTTP_201_CREATED)
-def create_tag(payload: schemas.TagCreate, conn: ConnectionDep):
+async def create_tag(payload: schemas.TagCreate, conn: AsyncConnectionDep):
     try:
-        with conn.cursor() as cur:
-            cur.execute(
+        async with conn.cursor() as cur:
+            await cur.execute(
                 """
                 INSERT INTO tags (tag_name, category, description)
                 VALUES (%s, %s, %s)
@@ -21,158 +33,213 @@ def create_tag(payload: schemas.TagCreate, conn: ConnectionDep):
                 """,
                 (payload.tag_name, payload.category, payload.description),
             )
-            row = cur.fetchone()
-        conn.commit()
-        return schemas.TagRead.model_validate(row)
+            row = await cur.fetchone()
+        await conn.commit()
     except errors.UniqueViolation:
-        conn.rollback()
+        await conn.rollback()
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Tag already exists")
+    tag_index.add(row)
+    tag_recommender.add_tag(row)
+    return schemas.TagRead.model_validate(row)
 
 
 @router.get("/tags", response_model=list[schemas.TagRead])
-def list_tags(conn: ConnectionDep):
-    with conn.cursor() as cur:
-        cur.execute("SELECT * FROM tags ORDER BY tag_name")
-        rows = cur.fetchall()
-    return [schemas.TagRead.model_validate(row) for row in rows]
+async def list_tags(
+    conn: ReadConnectionDep,
+    response: Response,
+    limit: LimitParam = DEFAULT_PAGE_SIZE,
+    after: CursorParam = None,
+):
+    # tag_name is unique and NOT NULL, so it is a complete sort key on its own
+    query = "SELECT * FROM tags"
+    params = []
+
+    if after:
+        (tag_name,) = decode_cursor(after, str)
+        query += " WHERE tag_name > %s"
+        params.append(tag_name)
+
+    query += " ORDER BY tag_name LIMIT %s"
+    params.append(limit + 1)
+
+    async with conn.cursor() as cur:
+        await cur.execute(query, params)
+        rows = paginate(await cur.fetchall(), limit, response, "tag_name")
+    return render_rows(schemas.TagRead, rows, response)
+
+
+@router.get("/tags/suggest", response_model=list[schemas.TagSuggestion])
+async def suggest_tags(
+    prefix: str = Query(default="", max_length=100),
+    limit: int = Query(default=10, ge=1, le=MAX_SUGGESTIONS),
+):
+    """Tags whose name starts with ``prefix`` (case-insensitive), most used
+    first; served from memory without touching the database."""
+    return render_rows(schemas.TagSuggestion, tag_index.suggest(prefix, limit))
+
+
+@router.post("/tags/recommend", response_model=list[schemas.TagRecommendation])
+async def recommend_tags(payload: schemas.TagRecommendRequest):
+    """Tags that go with a draft problem: ones named in its title or
+    description, and ones that co-occur with its chosen tags. Served from
+    memory without touching the database."""
+    text = f"{payload.title}\n{payload.description or ''}"
+    return render_rows(
+        schemas.TagRecommendation, tag_recommender.recommend(text, payload.tags, payload.limit)
+    )
 
 
 @router.post("/problems/{problem_id}/tags", response_model=schemas.ProblemWithAuthor)
-def assign_tag_to_problem(problem_id: int, payload: schemas.ProblemTagAssign, conn: ConnectionDep):
-    get_problem_or_404(conn, problem_id)
-    get_tag_or_404(conn, payload.tag_id)
-
-    # Check if link already exists
-    with conn.cursor() as cur:
-        cur.execute(
-            """
-            SELECT * FROM problem_tags
-            WHERE problem_id = %s AND tag_id = %s
-            """,
-            (problem_id, payload.tag_id),
-        )
-        existing = cur.fetchone()
-
-    if not existing:
-        with conn.cursor() as cur:
-            cur.execute(
+async def assign_tag_to_problem(problem_id: int, payload: schemas.ProblemTagAssign, conn: AsyncConnectionDep):
+    try:
+        async with conn.pipeline(), conn.cursor() as cur:
+            await cur.execute(_LOCK_ITEM_TAGS, ("problem_tags", problem_id))
+            # No rows when the tag was already there; otherwise the problem's
+            # other tags, read from the snapshot the insert ran against
+            await cur.execute(
                 """
-                INSERT INTO problem_tags (problem_id, tag_id)
-                VALUES (%s, %s)
+                WITH inserted AS (
+                    INSERT INTO problem_tags (problem_id, tag_id)
+                    VALUES (%(problem_id)s, %(tag_id)s)
+                    ON CONFLICT (problem_id, tag_id) DO NOTHING
+                    RETURNING tag_id
+                )
+                SELECT pt.tag_id
+                FROM inserted
+                LEFT JOIN problem_tags pt ON pt.problem_id = %(problem_id)s
                 """,
-                (problem_id, payload.tag_id),
+                {"problem_id": problem_id, "tag_id": payload.tag_id},
             )
-        conn.commit()
+            rows = await cur.fetchall()
+            inserted = bool(rows)
+            tags = {row["tag_id"]: 1.0 for row in rows if row["tag_id"] is not None}
+        if inserted:
+            await refresh_related_problems(conn, [problem_id])
+    except errors.IntegrityError as e:
+        await conn.rollback()
+        handle_db_error(e)
+    await conn.commit()
+    if inserted:
+        response_cache.invalidate(("problem", problem_id))
+        tag_index.use(payload.tag_id, 1)
+        tag_recommender.reweight(payload.tag_id, 0.0, 1.0, tags)
 
     # Return problem with author
-    problem_data = get_problem_with_author(conn, problem_id)
+    problem_data = await get_problem_with_author(conn, problem_id)
     return schemas.ProblemWithAuthor.model_validate(problem_data)
 
 
 @router.delete("/problems/{problem_id}/tags/{tag_id}", response_model=schemas.ProblemWithAuthor)
-def remove_problem_tag(problem_id: int, tag_id: int, conn: ConnectionDep):
-    get_problem_or_404(conn, problem_id)
-
-    # Check if link exists
-    with conn.cursor() as cur:
-        cur.execute(
+async def remove_problem_tag(problem_id: int, tag_id: int, conn: AsyncConnectionDep):
+    await get_problem_or_404(conn, problem_id)
+
+    # No rows when the link didn't exist; otherwise the problem's tags as
+    # the delete found them, which feed the recommender
+    async with conn.pipeline(), conn.cursor() as cur:
+        await cur.execute(_LOCK_ITEM_TAGS, ("problem_tags", problem_id))
+        await cur.execute(
             """
-            SELECT * FROM problem_tags
-            WHERE problem_id = %s AND tag_id = %s
+            WITH removed AS (
+                DELETE FROM problem_tags
+                WHERE problem_id = %(problem_id)s AND tag_id = %(tag_id)s
+                RETURNING tag_id
+            )
+            SELECT pt.tag_id
+            FROM removed
+            JOIN problem_tags pt ON pt.problem_id = %(problem_id)s
             """,
-            (problem_id, tag_id),
+            {"problem_id": problem_id, "tag_id": tag_id},
         )
-        link = cur.fetchone()
+        tags = {row["tag_id"]: 1.0 for row in await cur.fetchall()}
 
-    if not link:
+    if not tags:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tag link not found")
 
-    with conn.cursor() as cur:
-        cur.execute(
-            """
-            DELETE FROM problem_tags
-            WHERE problem_id = %s AND tag_id = %s
-            """,
-            (problem_id, tag_id),
-        )
-    conn.commit()
+    await refresh_related_problems(conn, [problem_id])
+    await conn.commit()
+    response_cache.invalidate(("problem", problem_id))
+    tag_index.use(tag_id, -1)
+    tag_recommender.reweight(tag_id, 1.0, 0.0, tags)
 
     # Return problem with author
-    problem_data = get_problem_with_author(conn, problem_id)
+    problem_data = await get_problem_with_author(conn, problem_id)
     return schemas.ProblemWithAuthor.model_validate(problem_data)
 
 
 @router.post("/resources/{resource_id}/tags", response_model=schemas.ResourceDetail)
-def assign_tag_to_resource(resource_id: int, payload: schemas.ResourceTagAssign, conn: ConnectionDep):
-    get_resource_or_404(conn, resource_id)
-    get_tag_or_404(conn, payload.tag_id)
-
-    # Check if link exists (upsert pattern)
-    with conn.cursor() as cur:
-        cur.execute(
-            """
-            SELECT * FROM resource_tags
-            WHERE resource_id = %s AND tag_id = %s
-            """,
-            (resource_id, payload.tag_id),
-        )
-        existing = cur.fetchone()
-
-    if not existing:
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                INSERT INTO resource_tags (resource_id, tag_id, confidence)
-                VALUES (%s, %s, %s)
-                """,
-                (resource_id, payload.tag_id, payload.confidence),
-            )
-    else:
-        with conn.cursor() as cur:
-            cur.execute(
+async def assign_tag_to_resource(resource_id: int, payload: schemas.ResourceTagAssign, conn: AsyncConnectionDep):
+    try:
+        async with conn.pipeline(), conn.cursor() as cur:
+            await cur.execute(_LOCK_ITEM_TAGS, ("resource_tags", resource_id))
+            # No rows when the link already had this confidence; otherwise
+            # the resource's tags as the upsert found them
+            await cur.execute(
                 """
-                UPDATE resource_tags
-                SET confidence = %s
-                WHERE resource_id = %s AND tag_id = %s
+                WITH upserted AS (
+                    INSERT INTO resource_tags (resource_id, tag_id, confidence)
+                    VALUES (%(resource_id)s, %(tag_id)s, %(confidence)s)
+                    ON CONFLICT (resource_id, tag_id) DO UPDATE
+                    SET confidence = EXCLUDED.confidence
+                    WHERE resource_tags.confidence IS DISTINCT FROM EXCLUDED.confidence
+                    RETURNING tag_id
+                )
+                SELECT rt.tag_id, rt.confidence
+                FROM upserted
+                LEFT JOIN resource_tags rt ON rt.resource_id = %(resource_id)s
                 """,
-                (payload.confidence, resource_id, payload.tag_id),
+                {"resource_id": resource_id, "tag_id": payload.tag_id, "confidence": payload.confidence},
             )
-    conn.commit()
+            rows = await cur.fetchall()
+            changed = bool(rows)
+            tags = {
+                row["tag_id"]: resource_tag_weight(row["confidence"]) for row in rows if row["tag_id"] is not None
+            }
+    except errors.IntegrityError as e:
+        await conn.rollback()
+        handle_db_error(e)
+    await conn.commit()
+    if changed:
+        response_cache.invalidate(("resource", resource_id))
+        tag_recommender.reweight(
+            payload.tag_id, tags.get(payload.tag_id, 0.0), resource_tag_weight(payload.confidence), tags
+        )
 
     # Return ResourceDetail (will be properly implemented when services are migrated)
     # For now, return a simplified version
-    from src.api.services.resources import build_resource_detail
-    return build_resource_detail(conn, resource_id)
+    from src.api.services.resources import render_resource_detail
+    return Response(await render_resource_detail(conn, resource_id), media_type="application/json")
 
 
 @router.delete("/resources/{resource_id}/tags/{tag_id}", response_model=schemas.ResourceDetail)
-def remove_resource_tag(resource_id: int, tag_id: int, conn: ConnectionDep):
-    get_resource_or_404(conn, resource_id)
-
-    # Check if link exists
-    with conn.cursor() as cur:
-        cur.execute(
+async def remove_resource_tag(resource_id: int, tag_id: int, conn: AsyncConnectionDep):
+    await get_resource_or_404(conn, resource_id)
+
+    # No rows when the link didn't exist; otherwise the resource's tags as
+    # the delete found them, which feed the recommender
+    async with conn.pipeline(), conn.cursor() as cur:
+        await cur.execute(_LOCK_ITEM_TAGS, ("resource_tags", resource_id))
+        await cur.execute(
             """
-            SELECT * FROM resource_tags
-            WHERE resource_id = %s AND tag_id = %s
+            WITH removed AS (
+                DELETE FROM resource_tags
+                WHERE resource_id = %(resource_id)s AND tag_id = %(tag_id)s
+                RETURNING tag_id
+            )
+            SELECT rt.tag_id, rt.confidence
+            FROM removed
+            JOIN resource_tags rt ON rt.resource_id = %(resource_id)s
             """,
-            (resource_id, tag_id),
+            {"resource_id": resource_id, "tag_id": tag_id},
         )
-        link = cur.fetchone()
+        tags = {row["tag_id"]: resource_tag_weight(row["confidence"]) for row in await cur.fetchall()}
 
-    if not link:
+    if not tags:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tag link not found")
 
-    with conn.cursor() as cur:
-        cur.execute(
-            """
-            DELETE FROM resource_tags
-            WHERE resource_id = %s AND tag_id = %s
-            """,
-            (resource_id, tag_id),
-        )
-    conn.commit()
+    await conn.commit()
+    response_cache.invalidate(("resource", resource_id))
+    tag_recommender.reweight(tag_id, tags[tag_id], 0.0, tags)
 
     # Return ResourceDetail (will be properly implemented when services are migrated)
-    from src.api.services.resources import build_resource_detail
-    return build_resource_detail(conn, resource_id)
+    from src.api.services.resources import render_resource_detail
+    return Response(await render_resource_detail(conn, resource_id), media_type="application/json")
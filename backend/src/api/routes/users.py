@@ -1,19 +1,26 @@
-from fastapi import APIRouter, HTTPException, status
+from datetime import datetime
+
+from fastapi import APIRouter, HTTPException, Response, status
+from fastapi.responses import StreamingResponse
 from psycopg import errors
 
 from src.api import schemas
-from src.api.deps import ConnectionDep
+from src.api.cache import response_cache
+from src.api.deps import AsyncConnectionDep, ReadConnectionDep
+from src.api.pagination import DEFAULT_PAGE_SIZE, CursorParam, LimitParam, decode_cursor, paginate, seek_after
 from src.api.routes.utils import get_user_or_404
+from src.api.serialization import render_rows
+from src.api.services.export import begin_export, export_user, gzip_chunks
 
 
 router = APIRouter(prefix="/users", tags=["users"])
 
 
 @router.post("", response_model=schemas.UserRead, status_code=status.HTTP_201_CREATED)
-def create_user(payload: schemas.UserCreate, conn: ConnectionDep):
+async def create_user(payload: schemas.UserCreate, conn: AsyncConnectionDep):
     try:
-        with conn.cursor() as cur:
-            cur.execute(
+        async with conn.cursor() as cur:
+            await cur.execute(
                 """
                 INSERT INTO users (username, email, first_name, last_name)
                 VALUES (%s, %s, %s, %s)
@@ -21,11 +28,11 @@ def create_user(payload: schemas.UserCreate, conn: ConnectionDep):
                 """,
                 (payload.username, payload.email, payload.first_name, payload.last_name),
             )
-            row = cur.fetchone()
-        conn.commit()
+            row = await cur.fetchone()
+        await conn.commit()
         return schemas.UserRead.model_validate(row)
     except errors.UniqueViolation:
-        conn.rollback()
+        await conn.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username or email already exists",
@@ -33,19 +40,19 @@ def create_user(payload: schemas.UserCreate, conn: ConnectionDep):
 
 
 @router.get("/{user_id}", response_model=schemas.UserRead)
-def get_user(user_id: int, conn: ConnectionDep):
-    user = get_user_or_404(conn, user_id)
+async def get_user(user_id: int, conn: ReadConnectionDep):
+    user = await get_user_or_404(conn, user_id)
     return schemas.UserRead.model_validate(user)
 
 
 @router.patch("/{user_id}", response_model=schemas.UserRead)
-def update_user(user_id: int, payload: schemas.UserUpdate, conn: ConnectionDep):
-    get_user_or_404(conn, user_id)
+async def update_user(user_id: int, payload: schemas.UserUpdate, conn: AsyncConnectionDep):
+    await get_user_or_404(conn, user_id)
     updates = payload.model_dump(exclude_unset=True)
 
     if not updates:
         # No fields to update, return existing user
-        user = get_user_or_404(conn, user_id)
+        user = await get_user_or_404(conn, user_id)
         return schemas.UserRead.model_validate(user)
 
     # Build dynamic SET clause
@@ -53,16 +60,17 @@ def update_user(user_id: int, payload: schemas.UserUpdate, conn: ConnectionDep):
     values = list(updates.values()) + [user_id]
 
     try:
-        with conn.cursor() as cur:
-            cur.execute(
+        async with conn.cursor() as cur:
+            await cur.execute(
                 f"UPDATE users SET {set_clause} WHERE user_id = %s RETURNING *",
                 values,
             )
-            row = cur.fetchone()
-        conn.commit()
+            row = await cur.fetchone()
+        await conn.commit()
+        response_cache.invalidate(("user", user_id))
         return schemas.UserRead.model_validate(row)
     except errors.UniqueViolation:
-        conn.rollback()
+        await conn.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username or email already exists",
@@ -70,36 +78,81 @@ def update_user(user_id: int, payload: schemas.UserUpdate, conn: ConnectionDep):
 
 
 @router.get("/{user_id}/problems", response_model=list[schemas.ProblemListItem])
-def list_user_problems(user_id: int, conn: ConnectionDep):
-    get_user_or_404(conn, user_id)
-
-    with conn.cursor() as cur:
-        cur.execute(
-            """
-            SELECT * FROM problems
-            WHERE user_id = %s
-            ORDER BY created_at DESC
-            """,
-            (user_id,),
-        )
-        rows = cur.fetchall()
+async def list_user_problems(
+    user_id: int,
+    conn: ReadConnectionDep,
+    response: Response,
+    limit: LimitParam = DEFAULT_PAGE_SIZE,
+    after: CursorParam = None,
+):
+    await get_user_or_404(conn, user_id)
+
+    query = "SELECT * FROM problems WHERE user_id = %s"
+    params = [user_id]
+
+    if after:
+        condition, seek_params = seek_after("created_at", "problem_id", *decode_cursor(after, datetime, int))
+        query += f" AND {condition}"
+        params.extend(seek_params)
 
-    return [schemas.ProblemListItem.model_validate(row) for row in rows]
+    query += " ORDER BY created_at DESC, problem_id DESC LIMIT %s"
+    params.append(limit + 1)
+
+    async with conn.cursor() as cur:
+        await cur.execute(query, params)
+        rows = paginate(await cur.fetchall(), limit, response, "created_at", "problem_id")
+
+    return render_rows(schemas.ProblemListItem, rows, response)
 
 
 @router.get("/{user_id}/resources", response_model=list[schemas.ResourceSummary])
-def list_user_resources(user_id: int, conn: ConnectionDep):
-    get_user_or_404(conn, user_id)
-
-    with conn.cursor() as cur:
-        cur.execute(
-            """
-            SELECT * FROM resources
-            WHERE user_id = %s
-            ORDER BY last_visited_at DESC, resource_id DESC
-            """,
-            (user_id,),
+async def list_user_resources(
+    user_id: int,
+    conn: ReadConnectionDep,
+    response: Response,
+    limit: LimitParam = DEFAULT_PAGE_SIZE,
+    after: CursorParam = None,
+):
+    await get_user_or_404(conn, user_id)
+
+    query = "SELECT * FROM resources WHERE user_id = %s"
+    params = [user_id]
+
+    if after:
+        condition, seek_params = seek_after("last_visited_at", "resource_id", *decode_cursor(after, datetime, int))
+        query += f" AND {condition}"
+        params.extend(seek_params)
+
+    query += " ORDER BY last_visited_at DESC, resource_id DESC LIMIT %s"
+    params.append(limit + 1)
+
+    async with conn.cursor() as cur:
+        await cur.execute(query, params)
+        rows = paginate(await cur.fetchall(), limit, response, "last_visited_at", "resource_id")
+
+    return render_rows(schemas.ResourceSummary, rows, response)
+
+
+@router.get("/{user_id}/export", response_class=StreamingResponse)
+async def export_user_data(user_id: int, conn: ReadConnectionDep, gzip: bool = False):
+    """Everything the user owns as NDJSON, streamed from one snapshot.
+
+    With ``?gzip=true`` the stream is compressed on the fly and sent as a
+    ``.ndjson.gz`` file.
+    """
+    await begin_export(conn)
+    await get_user_or_404(conn, user_id)
+
+    filename = f"solvex-user-{user_id}.ndjson"
+    chunks = export_user(conn, user_id)
+    if gzip:
+        return StreamingResponse(
+            gzip_chunks(chunks),
+            media_type="application/gzip",
+            headers={"Content-Disposition": f'attachment; filename="{filename}.gz"'},
         )
-        rows = cur.fetchall()
-
-    return [schemas.ResourceSummary.model_validate(row) for row in rows]
+    return StreamingResponse(
+        chunks,
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -1,31 +1,31 @@
 from fastapi import HTTPException, status
-from psycopg import Connection
+from psycopg import AsyncConnection
 
 
-def get_user_or_404(conn: Connection, user_id: int) -> dict:
+async def get_user_or_404(conn: AsyncConnection, user_id: int) -> dict:
     """Get user by ID or raise 404."""
-    with conn.cursor() as cur:
-        cur.execute("SELECT * FROM users WHERE user_id = %s", (user_id,))
-        row = cur.fetchone()
+    async with conn.cursor() as cur:
+        await cur.execute("SELECT * FROM users WHERE user_id = %s", (user_id,))
+        row = await cur.fetchone()
     if not row:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     return row
 
 
-def get_problem_or_404(conn: Connection, problem_id: int) -> dict:
+async def get_problem_or_404(conn: AsyncConnection, problem_id: int) -> dict:
     """Get problem by ID or raise 404."""
-    with conn.cursor() as cur:
-        cur.execute("SELECT * FROM problems WHERE problem_id = %s", (problem_id,))
-        row = cur.fetchone()
+    async with conn.cursor() as cur:
+        await cur.execute("SELECT * FROM problems WHERE problem_id = %s", (problem_id,))
+        row = await cur.fetchone()
     if not row:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Problem not found")
     return row
 
 
-def get_problem_with_author(conn: Connection, problem_id: int) -> dict:
+async def get_problem_with_author(conn: AsyncConnection, problem_id: int) -> dict:
     """Get problem with author information (joined) or raise 404."""
-    with conn.cursor() as cur:
-        cur.execute(
+    async with conn.cursor() as cur:
+        await cur.execute(
             """
             SELECT
                 p.problem_id,
@@ -47,7 +47,7 @@ def get_problem_with_author(conn: Connection, problem_id: int) -> dict:
             """,
             (problem_id,),
         )
-        row = cur.fetchone()
+        row = await cur.fetchone()
     if not row:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Problem not found")
 
@@ -71,31 +71,31 @@ def get_problem_with_author(conn: Connection, problem_id: int) -> dict:
     }
 
 
-def get_solution_or_404(conn: Connection, solution_id: int) -> dict:
+async def get_solution_or_404(conn: AsyncConnection, solution_id: int) -> dict:
     """Get solution by ID or raise 404."""
-    with conn.cursor() as cur:
-        cur.execute("SELECT * FROM solutions WHERE solution_id = %s", (solution_id,))
-        row = cur.fetchone()
+    async with conn.cursor() as cur:
+        await cur.execute("SELECT * FROM solutions WHERE solution_id = %s", (solution_id,))
+        row = await cur.fetchone()
     if not row:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Solution not found")
     return row
 
 
-def get_resource_or_404(conn: Connection, resource_id: int) -> dict:
+async def get_resource_or_404(conn: AsyncConnection, resource_id: int) -> dict:
     """Get resource by ID or raise 404."""
-    with conn.cursor() as cur:
-        cur.execute("SELECT * FROM resources WHERE resource_id = %s", (resource_id,))
-        row = cur.fetchone()
+    async with conn.cursor() as cur:
+        await cur.execute("SELECT * FROM resources WHERE resource_id = %s", (resource_id,))
+        row = await cur.fetchone()
     if not row:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Resource not found")
     return row
 
 
-def get_tag_or_404(conn: Connection, tag_id: int) -> dict:
+async def get_tag_or_404(conn: AsyncConnection, tag_id: int) -> dict:
     """Get tag by ID or raise 404."""
-    with conn.cursor() as cur:
-        cur.execute("SELECT * FROM tags WHERE tag_id = %s", (tag_id,))
-        row = cur.fetchone()
+    async with conn.cursor() as cur:
+        await cur.execute("SELECT * FROM tags WHERE tag_id = %s", (tag_id,))
+        row = await cur.fetchone()
     if not row:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tag not found")
     return row
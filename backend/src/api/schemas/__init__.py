@@ -4,9 +4,14 @@ from .problems import (
     ProblemBase,
     ProblemCreate,
     ProblemUpdate,
+    ProblemBulkItemResult,
+    ProblemBulkResult,
     ProblemRead,
     ProblemWithAuthor,
     ProblemListItem,
+    ProblemSearchHit,
+    ProblemSimilar,
+    ProblemRelated,
     ProblemSearchResponse,
     ProblemFull,
 )
@@ -15,6 +20,7 @@ from .solutions import (
     SolutionCreate,
     SolutionUpdate,
     SolutionRead,
+    SolutionTreeNode,
     SolutionDetail,
     SolutionWithResources,
 )
@@ -24,9 +30,16 @@ from .resources import (
     ResourceUpdate,
     ResourceRead,
     ResourceSummary,
+    ResourceSearchHit,
+    ResourceSimilar,
+    ResourceLookup,
+    ResourceLookupBatch,
     ResourceDetail,
+    ResourceVisit,
+    ResourceVisitBatch,
+    ResourceVisitBatchResult,
 )
-from .tags import TagBase, TagCreate, TagRead
+from .tags import TagBase, TagCreate, TagRead, TagRecommendation, TagRecommendRequest, TagSuggestion
 from .relations import (
     ProblemTagAssign,
     ResourceTagAssign,
@@ -35,6 +48,9 @@ from .relations import (
     ProblemRelationCreate,
     ProblemRelationRead,
     ProblemResourceSummary,
+    ProblemNeighbor,
+    ProblemNeighborhood,
+    ProblemPath,
 )
 from .dashboard import TopTag, TopResource, DashboardResponse
 
@@ -48,15 +64,21 @@ __all__ = [
     "ProblemBase",
     "ProblemCreate",
     "ProblemUpdate",
+    "ProblemBulkItemResult",
+    "ProblemBulkResult",
     "ProblemRead",
     "ProblemWithAuthor",
     "ProblemListItem",
+    "ProblemSearchHit",
+    "ProblemSimilar",
+    "ProblemRelated",
     "ProblemSearchResponse",
     "ProblemFull",
     "SolutionBase",
     "SolutionCreate",
     "SolutionUpdate",
     "SolutionRead",
+    "SolutionTreeNode",
     "SolutionDetail",
     "SolutionWithResources",
     "ResourceBase",
@@ -64,10 +86,20 @@ __all__ = [
     "ResourceUpdate",
     "ResourceRead",
     "ResourceSummary",
+    "ResourceSearchHit",
+    "ResourceSimilar",
+    "ResourceLookup",
+    "ResourceLookupBatch",
     "ResourceDetail",
+    "ResourceVisit",
+    "ResourceVisitBatch",
+    "ResourceVisitBatchResult",
     "TagBase",
     "TagCreate",
     "TagRead",
+    "TagSuggestion",
+    "TagRecommendRequest",
+    "TagRecommendation",
     "ProblemTagAssign",
     "ResourceTagAssign",
     "ProblemResourceAttach",
@@ -75,6 +107,9 @@ __all__ = [
     "ProblemRelationCreate",
     "ProblemRelationRead",
     "ProblemResourceSummary",
+    "ProblemNeighbor",
+    "ProblemNeighborhood",
+    "ProblemPath",
     "TopTag",
     "TopResource",
     "DashboardResponse",
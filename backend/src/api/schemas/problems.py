@@ -3,7 +3,7 @@ from __future__ import annotations
 from datetime import datetime
 from typing import Optional, TYPE_CHECKING
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 from .base import ORMModel
 
@@ -15,9 +15,9 @@ if TYPE_CHECKING:
 
 
 class ProblemBase(BaseModel):
-    title: str
+    title: str = Field(max_length=500)
     description: Optional[str] = None
-    problem_type: Optional[str] = None
+    problem_type: Optional[str] = Field(default=None, max_length=100)
 
 
 class ProblemCreate(ProblemBase):
@@ -26,12 +26,24 @@ class ProblemCreate(ProblemBase):
 
 
 class ProblemUpdate(BaseModel):
-    title: Optional[str] = None
+    title: Optional[str] = Field(default=None, max_length=500)
     description: Optional[str] = None
-    problem_type: Optional[str] = None
+    problem_type: Optional[str] = Field(default=None, max_length=100)
     resolved: Optional[bool] = None
 
 
+class ProblemBulkItemResult(BaseModel):
+    index: int
+    problem_id: Optional[int] = None
+    error: Optional[str] = None
+
+
+class ProblemBulkResult(BaseModel):
+    created: int
+    failed: int
+    items: list[ProblemBulkItemResult]
+
+
 class ProblemRead(ProblemBase, ORMModel):
     problem_id: int
     user_id: int
@@ -50,6 +62,24 @@ class ProblemListItem(ORMModel):
     created_at: datetime
 
 
+class ProblemSearchHit(ProblemListItem):
+    rank: Optional[float] = None
+    snippet: Optional[str] = None
+
+
+class ProblemSimilar(ProblemListItem):
+    user_id: int
+    similarity: float
+
+
+class ProblemRelated(ProblemListItem):
+    user_id: int
+    score: float
+    shared_tags: int
+    shared_resources: int
+    relation_strength: Optional[float] = None
+
+
 class ProblemSearchResponse(ORMModel):
     results: list[ProblemListItem]
 
@@ -67,9 +97,14 @@ __all__ = [
     "ProblemBase",
     "ProblemCreate",
     "ProblemUpdate",
+    "ProblemBulkItemResult",
+    "ProblemBulkResult",
     "ProblemRead",
     "ProblemWithAuthor",
     "ProblemListItem",
+    "ProblemSearchHit",
+    "ProblemSimilar",
+    "ProblemRelated",
     "ProblemSearchResponse",
     "ProblemFull",
 ]
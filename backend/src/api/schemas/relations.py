@@ -49,6 +49,25 @@ class ProblemResourceSummary(ORMModel):
     contribution_type: Optional[str] = None
 
 
+class ProblemNeighbor(BaseModel):
+    problem_id: int
+    distance: int
+
+
+class ProblemNeighborhood(BaseModel):
+    problem_id: int
+    nodes: list[ProblemNeighbor]
+    edges: list[ProblemRelationRead]
+    truncated: bool
+
+
+class ProblemPath(BaseModel):
+    from_problem_id: int
+    to_problem_id: int
+    problem_ids: list[int]
+    edges: list[ProblemRelationRead]
+
+
 __all__ = [
     "ProblemTagAssign",
     "ResourceTagAssign",
@@ -57,4 +76,7 @@ __all__ = [
     "ProblemRelationCreate",
     "ProblemRelationRead",
     "ProblemResourceSummary",
+    "ProblemNeighbor",
+    "ProblemNeighborhood",
+    "ProblemPath",
 ]
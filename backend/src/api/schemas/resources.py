@@ -36,23 +36,64 @@ class ResourceRead(ResourceBase, ORMModel):
     user_id: int
     first_visited_at: Optional[datetime] = None
     last_visited_at: Optional[datetime] = None
+    visit_count: Optional[int] = None
 
 
 class ResourceSummary(ResourceRead):
     pass
 
 
+class ResourceSearchHit(ResourceSummary):
+    rank: Optional[float] = None
+    snippet: Optional[str] = None
+
+
+class ResourceSimilar(ResourceSummary):
+    similarity: float
+
+
 class ResourceDetail(ResourceRead):
     linked_problems: list["ProblemListItem"]
     linked_solutions: list["SolutionRead"]
     tags: list["TagRead"]
 
 
+class ResourceLookup(BaseModel):
+    url: str
+    resource: Optional[ResourceRead] = None
+
+
+class ResourceLookupBatch(BaseModel):
+    user_id: int
+    urls: list[str] = Field(min_length=1, max_length=1000)
+
+
+class ResourceVisit(BaseModel):
+    resource_id: int
+    visited_at: Optional[datetime] = None
+
+
+class ResourceVisitBatch(BaseModel):
+    visits: list[ResourceVisit] = Field(min_length=1, max_length=10_000)
+
+
+class ResourceVisitBatchResult(BaseModel):
+    accepted: int
+    missing: list[int]
+
+
 __all__ = [
     "ResourceBase",
     "ResourceCreate",
     "ResourceUpdate",
     "ResourceRead",
     "ResourceSummary",
+    "ResourceSearchHit",
+    "ResourceSimilar",
+    "ResourceLookup",
+    "ResourceLookupBatch",
     "ResourceDetail",
+    "ResourceVisit",
+    "ResourceVisitBatch",
+    "ResourceVisitBatchResult",
 ]
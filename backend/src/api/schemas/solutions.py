@@ -41,6 +41,10 @@ class SolutionRead(SolutionBase, ORMModel):
     created_at: datetime
 
 
+class SolutionTreeNode(SolutionRead):
+    depth: int
+
+
 class SolutionDetail(SolutionRead):
     children_count: int
     parent_solution: Optional["SolutionRead"] = None
@@ -59,6 +63,7 @@ __all__ = [
     "SolutionCreate",
     "SolutionUpdate",
     "SolutionRead",
+    "SolutionTreeNode",
     "SolutionDetail",
     "SolutionWithResources",
 ]
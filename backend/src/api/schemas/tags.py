@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from typing import Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 from .base import ORMModel
 
@@ -21,4 +21,32 @@ class TagRead(TagBase, ORMModel):
     tag_id: int
 
 
-__all__ = ["TagBase", "TagCreate", "TagRead"]
+class TagSuggestion(BaseModel):
+    tag_id: int
+    tag_name: str
+    category: Optional[str] = None
+    usage_count: int
+
+
+class TagRecommendRequest(BaseModel):
+    title: str = Field(default="", max_length=500)
+    description: Optional[str] = Field(default=None, max_length=20_000)
+    tags: list[int] = Field(default_factory=list, max_length=50)
+    limit: int = Field(default=10, ge=1, le=50)
+
+
+class TagRecommendation(BaseModel):
+    tag_id: int
+    tag_name: str
+    category: Optional[str] = None
+    score: float
+
+
+__all__ = [
+    "TagBase",
+    "TagCreate",
+    "TagRead",
+    "TagSuggestion",
+    "TagRecommendRequest",
+    "TagRecommendation",
+]
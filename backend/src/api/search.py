@@ -0,0 +1,11 @@
+from typing import Literal
+
+# Text search configuration shared by the generated tsvector columns in
+# schema.sql and the queries that match against them.
+TS_CONFIG = "english"
+
+HEADLINE_OPTIONS = "StartSel=<mark>, StopSel=</mark>, MaxWords=35, MinWords=15, MaxFragments=2"
+
+# "fts" ranks matches with websearch_to_tsquery; "substring" keeps the legacy
+# case-insensitive LIKE scan for comparison.
+SearchMode = Literal["fts", "substring"]
@@ -0,0 +1,55 @@
+"""Response rendering that validates database rows once.
+
+Returning models from a handler makes FastAPI check them against
+``response_model`` again and serialize through Python dicts and
+``json.dumps``. List handlers instead validate their rows once with a cached
+``TypeAdapter`` and hand back JSON bytes produced by pydantic-core's Rust
+serializer, keeping ``response_model`` on the route for the OpenAPI schema.
+"""
+
+from functools import cache
+from typing import Any
+
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+from pydantic_core import to_json
+
+
+class JSONBytesResponse(Response):
+    """JSON response rendered by pydantic-core; ``bytes`` pass through as-is."""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return to_json(content)
+
+
+@cache
+def list_adapter(model: type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(list[model])
+
+
+def dump_rows(model: type[BaseModel], rows: list[dict]) -> bytes:
+    """Validate ``rows`` as a list of ``model`` and serialize them to JSON."""
+    adapter = list_adapter(model)
+    return adapter.dump_json(adapter.validate_python(rows))
+
+
+def render_rows(model: type[BaseModel], rows: list[dict], response: Response | None = None) -> JSONBytesResponse:
+    """List response body for ``rows``.
+
+    Headers already set on the handler's injected ``response`` (such as the
+    next-page cursor) are carried over, since FastAPI drops them when a
+    handler returns its own response.
+    """
+    rendered = JSONBytesResponse(dump_rows(model, rows))
+    if response is not None:
+        rendered.headers.raw.extend(response.headers.raw)
+    return rendered
+
+
+def render_model(model: type[BaseModel], data: dict) -> JSONBytesResponse:
+    """Response body for one ``model`` validated straight from plain ``data``."""
+    return JSONBytesResponse(model.model_validate(data))
@@ -0,0 +1,116 @@
+"""NDJSON export of everything a user owns.
+
+Each line is one record, ``{"type": ..., "data": {...}}``, with the row's
+columns under ``data``. Columns the database derives (search vectors,
+normalized URLs, solution paths) are left out, so a dump can be loaded back
+through plain inserts. Records come in dependency order: the user, the tags
+they use, problems, solutions (parents before their versions), resources,
+then the link tables.
+
+Postgres renders every line as JSON itself, and each table is read through
+a server-side cursor ``EXPORT_BATCH_SIZE`` rows at a time. Memory stays flat
+however large the account, and the first bytes go out as soon as the first
+batch is fetched.
+"""
+
+import zlib
+from collections.abc import AsyncIterable, AsyncIterator
+
+from psycopg import AsyncConnection
+from psycopg.rows import tuple_row
+
+# Rows per FETCH from a server-side cursor, and per chunk sent to the client
+EXPORT_BATCH_SIZE = 2000
+
+_USER_PROBLEMS = "SELECT problem_id FROM problems WHERE user_id = %(user_id)s"
+_USER_RESOURCES = "SELECT resource_id FROM resources WHERE user_id = %(user_id)s"
+
+# (record type, JSON of a row, the rows in order)
+_EXPORT_QUERIES = [
+    ("user", "to_jsonb(u)", "FROM users u WHERE user_id = %(user_id)s"),
+    (
+        "tag",
+        "to_jsonb(t)",
+        f"""
+        FROM tags t
+        WHERE tag_id IN (
+            SELECT tag_id FROM problem_tags WHERE problem_id IN ({_USER_PROBLEMS})
+            UNION
+            SELECT tag_id FROM resource_tags WHERE resource_id IN ({_USER_RESOURCES})
+        )
+        ORDER BY tag_id
+        """,
+    ),
+    ("problem", "to_jsonb(p) - 'search_vector'", "FROM problems p WHERE user_id = %(user_id)s ORDER BY problem_id"),
+    # A solution can be moved under a newer parent, so ids don't order a
+    # tree; its path (root first) does, putting every parent before its
+    # versions
+    (
+        "solution",
+        "to_jsonb(s) - 'path'",
+        f"FROM solutions s WHERE problem_id IN ({_USER_PROBLEMS}) ORDER BY s.path",
+    ),
+    (
+        "resource",
+        "to_jsonb(r) - 'search_vector' - 'normalized_url'",
+        "FROM resources r WHERE user_id = %(user_id)s ORDER BY resource_id",
+    ),
+    (
+        "problem_tag",
+        "to_jsonb(pt)",
+        f"FROM problem_tags pt WHERE problem_id IN ({_USER_PROBLEMS}) ORDER BY problem_id, tag_id",
+    ),
+    (
+        "resource_tag",
+        "to_jsonb(rt)",
+        f"FROM resource_tags rt WHERE resource_id IN ({_USER_RESOURCES}) ORDER BY resource_id, tag_id",
+    ),
+    (
+        "problem_resource",
+        "to_jsonb(pr)",
+        f"FROM problem_resources pr WHERE problem_id IN ({_USER_PROBLEMS}) ORDER BY problem_id, resource_id",
+    ),
+    (
+        "solution_resource",
+        "to_jsonb(sr)",
+        f"""
+        FROM solution_resources sr
+        WHERE solution_id IN (SELECT solution_id FROM solutions WHERE problem_id IN ({_USER_PROBLEMS}))
+        ORDER BY solution_id, resource_id
+        """,
+    ),
+    # Relations pointing at other users' problems go with the source problem
+    (
+        "problem_relation",
+        "to_jsonb(pr)",
+        f"FROM problem_relations pr WHERE from_problem_id IN ({_USER_PROBLEMS}) ORDER BY from_problem_id, to_problem_id",
+    ),
+]
+
+
+async def begin_export(conn: AsyncConnection) -> None:
+    """Make the rest of ``conn``'s transaction one read-only snapshot, so
+    the export is consistent across tables while writes carry on. Must run
+    before anything else in the transaction."""
+    await conn.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+
+
+async def export_user(conn: AsyncConnection, user_id: int) -> AsyncIterator[bytes]:
+    """NDJSON lines of everything ``user_id`` owns, one chunk per batch."""
+    for record_type, data, rows_in_order in _EXPORT_QUERIES:
+        async with conn.cursor(name=f"export_{record_type}", row_factory=tuple_row) as cur:
+            await cur.execute(
+                f"SELECT jsonb_build_object('type', '{record_type}', 'data', {data})::text {rows_in_order}",
+                {"user_id": user_id},
+            )
+            while rows := await cur.fetchmany(EXPORT_BATCH_SIZE):
+                yield "".join(f"{row[0]}\n" for row in rows).encode()
+
+
+async def gzip_chunks(chunks: AsyncIterable[bytes]) -> AsyncIterator[bytes]:
+    """Compress a stream of chunks into one gzip member as they arrive."""
+    compressor = zlib.compressobj(wbits=31)
+    async for chunk in chunks:
+        if compressed := compressor.compress(chunk):
+            yield compressed
+    yield compressor.flush()
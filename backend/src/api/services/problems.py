@@ -1,121 +1,249 @@
 from __future__ import annotations
 
-from psycopg import Connection
+from collections.abc import Iterable
+
+from fastapi import HTTPException, status
+from psycopg import AsyncConnection
 
 from src.api import schemas
-from src.api.routes.utils import get_problem_with_author
+from src.api.cache import Dependency, response_cache
+from src.api.versions import content_version
 
+# Default pg_trgm similarity cut-offs: loose for suggestions, strict for
+# silently reusing an existing problem on create.
+SIMILAR_TITLE_THRESHOLD = 0.4
+DEDUPE_TITLE_THRESHOLD = 0.8
 
-def build_problem_full(conn: Connection, problem_id: int) -> schemas.ProblemFull:
-    # 1. Get problem with author
-    problem_data = get_problem_with_author(conn, problem_id)
+# Upper bound on the items accepted by one bulk import request
+BULK_MAX_ITEMS = 10_000
 
-    # 2. Get solutions
-    with conn.cursor() as cur:
-        cur.execute(
-            """
-            SELECT * FROM solutions
-            WHERE problem_id = %s
-            ORDER BY created_at DESC
-            """,
-            (problem_id,),
-        )
-        solution_rows = cur.fetchall()
+# Neighbours kept per problem in problem_related (the default k of its SQL
+# functions)
+RELATED_PROBLEMS_KEPT = 20
 
-    resources_by_solution: dict[int, list[schemas.ResourceRead]] = {
-        row["solution_id"]: [] for row in solution_rows
-    }
 
-    if solution_rows:
-        solution_ids = [row["solution_id"] for row in solution_rows]
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                SELECT sr.solution_id, r.*
-                FROM solution_resources sr
-                JOIN resources r ON r.resource_id = sr.resource_id
-                WHERE sr.solution_id = ANY(%s)
-                ORDER BY r.last_visited_at DESC, r.resource_id DESC
-                """,
-                (solution_ids,),
-            )
-            for row in cur.fetchall():
-                resource_data = dict(row)
-                solution_id = resource_data.pop("solution_id")
-                resources_by_solution[solution_id].append(
-                    schemas.ResourceRead.model_validate(resource_data)
-                )
+async def find_similar_problems(
+    conn: AsyncConnection,
+    title: str,
+    threshold: float = SIMILAR_TITLE_THRESHOLD,
+    user_id: int | None = None,
+    limit: int = 10,
+) -> list[dict]:
+    """Problems whose title is trigram-similar to ``title``, best match first."""
+    query = """
+        SELECT p.problem_id, p.user_id, p.title, p.resolved, p.created_at,
+               similarity(p.title, %(title)s) AS similarity
+        FROM problems p
+        WHERE p.title %% %(title)s
+    """
+    params = {"title": title, "user_id": user_id, "limit": limit}
+    if user_id is not None:
+        query += " AND p.user_id = %(user_id)s"
+    query += " ORDER BY similarity DESC, p.problem_id LIMIT %(limit)s"
 
-    solutions = [
-        schemas.SolutionWithResources(
-            **schemas.SolutionRead.model_validate(row).model_dump(),
-            resources=resources_by_solution.get(row["solution_id"], []),
+    async with conn.cursor() as cur:
+        # Transaction-local, so the GIN index filters at the requested cut-off
+        await cur.execute(
+            "SELECT set_config('pg_trgm.similarity_threshold', %s, true)",
+            (str(threshold),),
         )
-        for row in solution_rows
-    ]
+        await cur.execute(query, params)
+        return await cur.fetchall()
 
-    # 3. Get tags
-    with conn.cursor() as cur:
-        cur.execute(
-            """
-            SELECT t.* FROM tags t
-            JOIN problem_tags pt ON t.tag_id = pt.tag_id
-            WHERE pt.problem_id = %s
-            """,
-            (problem_id,),
-        )
-        tags = [schemas.TagRead.model_validate(r) for r in cur.fetchall()]
 
-    # 4. Get linked resources with metadata
-    with conn.cursor() as cur:
-        cur.execute(
+async def find_related_problems(conn: AsyncConnection, problem_id: int, limit: int) -> list[dict]:
+    """The precomputed neighbours of a problem, best first."""
+    async with conn.cursor() as cur:
+        await cur.execute(
             """
-            SELECT
-                r.*,
-                pr.relevance_score,
-                pr.contribution_type
-            FROM resources r
-            JOIN problem_resources pr ON r.resource_id = pr.resource_id
-            WHERE pr.problem_id = %s
+            SELECT p.problem_id, p.user_id, p.title, p.resolved, p.created_at,
+                   r.score, r.shared_tags, r.shared_resources, r.relation_strength
+            FROM problem_related r
+            JOIN problems p ON p.problem_id = r.related_problem_id
+            WHERE r.problem_id = %s
+            ORDER BY r.score DESC, r.related_problem_id
+            LIMIT %s
             """,
-            (problem_id,),
+            (problem_id, limit),
         )
-        linked_resources = [
-            schemas.ProblemResourceSummary(
-                resource=schemas.ResourceRead.model_validate(r),
-                relevance_score=r["relevance_score"],
-                contribution_type=r["contribution_type"],
-            )
-            for r in cur.fetchall()
-        ]
+        return await cur.fetchall()
+
+
+async def refresh_related_problems(conn: AsyncConnection, problem_ids: Iterable[int]) -> None:
+    """Update problem_related after the tags, resources or relations of these
+    problems changed. Runs in the caller's transaction."""
+    problem_ids = sorted(set(problem_ids))
+    if not problem_ids:
+        return
+    async with conn.cursor() as cur:
+        await cur.execute("SELECT refresh_related_problems(%s::int[])", (problem_ids,))
+
+
+async def find_missing_references(
+    conn: AsyncConnection, user_ids: set[int], tag_ids: set[int]
+) -> tuple[set[int], set[int]]:
+    """The given user and tag ids that do not exist, one query per table."""
+    async with conn.cursor() as cur:
+        await cur.execute("SELECT user_id FROM users WHERE user_id = ANY(%s::int[])", (list(user_ids),))
+        missing_users = user_ids - {row["user_id"] for row in await cur.fetchall()}
+        await cur.execute("SELECT tag_id FROM tags WHERE tag_id = ANY(%s::int[])", (list(tag_ids),))
+        missing_tags = tag_ids - {row["tag_id"] for row in await cur.fetchall()}
+    return missing_users, missing_tags
 
-    # 5. Get outward relations
-    with conn.cursor() as cur:
-        cur.execute(
-            """
-            SELECT * FROM problem_relations
-            WHERE from_problem_id = %s
-            """,
-            (problem_id,),
-        )
-        relations_out = [schemas.ProblemRelationRead.model_validate(r) for r in cur.fetchall()]
 
-    # 6. Get inward relations
-    with conn.cursor() as cur:
-        cur.execute(
+async def bulk_insert_problems(conn: AsyncConnection, items: list[schemas.ProblemCreate]) -> list[int]:
+    """Insert validated problems and their tags; returns the new ids in item order.
+
+    Ids are drawn from the sequence up front so both tables can be written
+    with COPY and each tag row knows its problem without a round trip. The
+    caller commits.
+    """
+    if not items:
+        return []
+    async with conn.cursor() as cur:
+        await cur.execute(
             """
-            SELECT * FROM problem_relations
-            WHERE to_problem_id = %s
+            SELECT nextval(pg_get_serial_sequence('problems', 'problem_id')) AS problem_id
+            FROM generate_series(1, %s)
             """,
-            (problem_id,),
+            (len(items),),
         )
-        relations_in = [schemas.ProblemRelationRead.model_validate(r) for r in cur.fetchall()]
-
-    return schemas.ProblemFull(
-        problem=schemas.ProblemWithAuthor.model_validate(problem_data),
-        solutions=solutions,
-        tags=tags,
-        linked_resources=linked_resources,
-        relations_out=relations_out,
-        relations_in=relations_in,
+        problem_ids = [row["problem_id"] for row in await cur.fetchall()]
+
+        async with cur.copy(
+            "COPY problems (problem_id, user_id, title, description, problem_type) FROM STDIN"
+        ) as copy:
+            for problem_id, item in zip(problem_ids, items):
+                await copy.write_row(
+                    (problem_id, item.user_id, item.title, item.description, item.problem_type)
+                )
+
+        async with cur.copy("COPY problem_tags (problem_id, tag_id) FROM STDIN") as copy:
+            for problem_id, item in zip(problem_ids, items):
+                for tag_id in set(item.tags or ()):
+                    await copy.write_row((problem_id, tag_id))
+    return problem_ids
+
+
+_RESOURCE_JSON = """
+    json_build_object(
+        'resource_id', r.resource_id,
+        'user_id', r.user_id,
+        'url', r.url,
+        'title', r.title,
+        'source_platform', r.source_platform,
+        'content_summary', r.content_summary,
+        'usefulness_score', r.usefulness_score,
+        'first_visited_at', r.first_visited_at,
+        'last_visited_at', r.last_visited_at,
+        'visit_count', r.visit_count
     )
+"""
+
+# The whole /full payload in one statement: each collection is a correlated
+# json_agg subquery, so the problem costs one round-trip and one parse.
+PROBLEM_FULL_QUERY = f"""
+    SELECT json_build_object(
+        'problem', json_build_object(
+            'problem_id', p.problem_id,
+            'user_id', p.user_id,
+            'title', p.title,
+            'description', p.description,
+            'problem_type', p.problem_type,
+            'created_at', p.created_at,
+            'resolved', p.resolved,
+            'author', json_build_object('user_id', u.user_id, 'username', u.username)
+        ),
+        'solutions', COALESCE((
+            SELECT json_agg(
+                to_jsonb(s) || jsonb_build_object('resources', sres.resources)
+                ORDER BY s.created_at DESC, s.solution_id DESC
+            )
+            FROM solutions s
+            CROSS JOIN LATERAL (
+                SELECT COALESCE(
+                    json_agg({_RESOURCE_JSON} ORDER BY r.last_visited_at DESC, r.resource_id DESC),
+                    '[]'
+                ) AS resources
+                FROM solution_resources sr
+                JOIN resources r ON r.resource_id = sr.resource_id
+                WHERE sr.solution_id = s.solution_id
+            ) sres
+            WHERE s.problem_id = p.problem_id
+        ), '[]'),
+        'tags', COALESCE((
+            SELECT json_agg(to_json(t))
+            FROM tags t
+            JOIN problem_tags pt ON t.tag_id = pt.tag_id
+            WHERE pt.problem_id = p.problem_id
+        ), '[]'),
+        'linked_resources', COALESCE((
+            SELECT json_agg(json_build_object(
+                'resource', {_RESOURCE_JSON},
+                'relevance_score', pr.relevance_score,
+                'contribution_type', pr.contribution_type
+            ))
+            FROM resources r
+            JOIN problem_resources pr ON r.resource_id = pr.resource_id
+            WHERE pr.problem_id = p.problem_id
+        ), '[]'),
+        'relations_out', COALESCE((
+            SELECT json_agg(to_json(rel))
+            FROM problem_relations rel
+            WHERE rel.from_problem_id = p.problem_id
+        ), '[]'),
+        'relations_in', COALESCE((
+            SELECT json_agg(to_json(rel))
+            FROM problem_relations rel
+            WHERE rel.to_problem_id = p.problem_id
+        ), '[]')
+    )::text AS payload
+    FROM problems p
+    JOIN users u ON p.user_id = u.user_id
+    WHERE p.problem_id = %s
+"""
+
+
+async def build_problem_full(conn: AsyncConnection, problem_id: int) -> schemas.ProblemFull:
+    async with conn.cursor() as cur:
+        await cur.execute(PROBLEM_FULL_QUERY, (problem_id,))
+        row = await cur.fetchone()
+    if not row:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Problem not found")
+
+    # Validate straight from the JSON text; no intermediate Python dicts
+    return schemas.ProblemFull.model_validate_json(row["payload"])
+
+
+def problem_full_deps(full: schemas.ProblemFull) -> set[Dependency]:
+    """Entities whose changes must evict a cached /full payload."""
+    deps: set[Dependency] = {
+        ("problem", full.problem.problem_id),
+        ("user", full.problem.author.user_id),
+    }
+    for solution in full.solutions:
+        deps.add(("solution", solution.solution_id))
+        deps.update(("resource", r.resource_id) for r in solution.resources)
+    deps.update(("tag", t.tag_id) for t in full.tags)
+    deps.update(("resource", link.resource.resource_id) for link in full.linked_resources)
+    deps.update(("problem", rel.to_problem_id) for rel in full.relations_out)
+    deps.update(("problem", rel.from_problem_id) for rel in full.relations_in)
+    return deps
+
+
+async def render_problem_full(conn: AsyncConnection, problem_id: int, version: int | None = None) -> bytes:
+    """JSON body of /problems/{id}/full, served from the response cache when warm.
+
+    Bodies are cached per content version, so writes made by other
+    processes are never served from here.
+    """
+    if version is None:
+        version = await content_version(conn, "problem", problem_id)
+    key = ("problem_full", problem_id, version)
+    body = response_cache.get(key)
+    if body is None:
+        epoch = response_cache.epoch
+        full = await build_problem_full(conn, problem_id)
+        body = full.model_dump_json().encode()
+        response_cache.set(key, body, problem_full_deps(full), epoch)
+    return body
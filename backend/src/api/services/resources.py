@@ -1,18 +1,80 @@
 from __future__ import annotations
 
-from psycopg import Connection
+from psycopg import AsyncConnection
 
 from src.api import schemas
+from src.api.cache import Dependency, response_cache
+from src.api.versions import content_version
+from src.api.visits import visit_buffer
 from src.api.routes.utils import get_resource_or_404
 
+SIMILAR_URL_THRESHOLD = 0.5
 
-def build_resource_detail(conn: Connection, resource_id: int) -> schemas.ResourceDetail:
-    # 1. Get resource
-    resource = get_resource_or_404(conn, resource_id)
+# Each URL is one probe of idx_resources_user_url_hash; comparing the
+# normalized URLs too rules out hash collisions
+_LOOKUP_QUERY = """
+    SELECT r.*
+    FROM unnest(%(urls)s::text[]) WITH ORDINALITY AS u(url, position)
+    LEFT JOIN LATERAL (
+        SELECT * FROM resources
+        WHERE user_id = %(user_id)s
+          AND md5(normalized_url)::uuid = md5(normalize_url(u.url))::uuid
+          AND normalized_url = normalize_url(u.url)
+        ORDER BY resource_id
+        LIMIT 1
+    ) r ON true
+    ORDER BY u.position
+"""
+
+
+async def lookup_resources_by_url(conn: AsyncConnection, user_id: int, urls: list[str]) -> list[dict | None]:
+    """The user's oldest resource saved under each URL's normalized form, or
+    None, in the order of ``urls``."""
+    async with conn.cursor() as cur:
+        await cur.execute(_LOOKUP_QUERY, {"urls": urls, "user_id": user_id})
+        rows = await cur.fetchall()
+    return [row if row["resource_id"] is not None else None for row in rows]
+
+
+async def find_resource_by_url(conn: AsyncConnection, user_id: int, url: str) -> dict | None:
+    """The user's resource saved under the same normalized URL, if any."""
+    return (await lookup_resources_by_url(conn, user_id, [url]))[0]
+
+
+async def find_similar_resources(
+    conn: AsyncConnection,
+    url: str,
+    threshold: float = SIMILAR_URL_THRESHOLD,
+    user_id: int | None = None,
+    limit: int = 10,
+) -> list[dict]:
+    """Resources whose normalized URL is trigram-similar to ``url``."""
+    query = """
+        SELECT r.*, similarity(r.normalized_url, normalize_url(%(url)s)) AS similarity
+        FROM resources r
+        WHERE r.normalized_url %% normalize_url(%(url)s)
+    """
+    params = {"url": url, "user_id": user_id, "limit": limit}
+    if user_id is not None:
+        query += " AND r.user_id = %(user_id)s"
+    query += " ORDER BY similarity DESC, r.resource_id LIMIT %(limit)s"
+
+    async with conn.cursor() as cur:
+        await cur.execute(
+            "SELECT set_config('pg_trgm.similarity_threshold', %s, true)",
+            (str(threshold),),
+        )
+        await cur.execute(query, params)
+        return await cur.fetchall()
+
+
+async def build_resource_detail(conn: AsyncConnection, resource_id: int) -> schemas.ResourceDetail:
+    # 1. Get resource, with visits the buffer has not written yet
+    resource = visit_buffer.apply_pending(await get_resource_or_404(conn, resource_id))
 
     # 2. Get linked problems
-    with conn.cursor() as cur:
-        cur.execute(
+    async with conn.cursor() as cur:
+        await cur.execute(
             """
             SELECT p.* FROM problems p
             JOIN problem_resources pr ON p.problem_id = pr.problem_id
@@ -21,11 +83,11 @@ def build_resource_detail(conn: Connection, resource_id: int) -> schemas.Resourc
             """,
             (resource_id,),
         )
-        linked_problems = [schemas.ProblemListItem.model_validate(r) for r in cur.fetchall()]
+        linked_problems = await cur.fetchall()
 
     # 3. Get linked solutions
-    with conn.cursor() as cur:
-        cur.execute(
+    async with conn.cursor() as cur:
+        await cur.execute(
             """
             SELECT s.* FROM solutions s
             JOIN solution_resources sr ON s.solution_id = sr.solution_id
@@ -34,11 +96,11 @@ def build_resource_detail(conn: Connection, resource_id: int) -> schemas.Resourc
             """,
             (resource_id,),
         )
-        linked_solutions = [schemas.SolutionRead.model_validate(r) for r in cur.fetchall()]
+        linked_solutions = await cur.fetchall()
 
     # 4. Get tags
-    with conn.cursor() as cur:
-        cur.execute(
+    async with conn.cursor() as cur:
+        await cur.execute(
             """
             SELECT t.* FROM tags t
             JOIN resource_tags rt ON t.tag_id = rt.tag_id
@@ -46,11 +108,44 @@ def build_resource_detail(conn: Connection, resource_id: int) -> schemas.Resourc
             """,
             (resource_id,),
         )
-        tags = [schemas.TagRead.model_validate(r) for r in cur.fetchall()]
+        tags = await cur.fetchall()
 
-    return schemas.ResourceDetail(
-        **schemas.ResourceRead.model_validate(resource).model_dump(),
-        linked_problems=linked_problems,
-        linked_solutions=linked_solutions,
-        tags=tags,
+    # One validation over the plain rows, nested lists included
+    return schemas.ResourceDetail.model_validate(
+        {**resource, "linked_problems": linked_problems, "linked_solutions": linked_solutions, "tags": tags}
     )
+
+
+def resource_detail_deps(detail: schemas.ResourceDetail) -> set[Dependency]:
+    """Entities whose changes must evict a cached resource detail."""
+    deps: set[Dependency] = {("resource", detail.resource_id)}
+    deps.update(("problem", p.problem_id) for p in detail.linked_problems)
+    for solution in detail.linked_solutions:
+        # A problem delete cascades to its solutions
+        deps.add(("solution", solution.solution_id))
+        deps.add(("problem", solution.problem_id))
+    deps.update(("tag", t.tag_id) for t in detail.tags)
+    return deps
+
+
+async def resource_detail_version(conn: AsyncConnection, resource_id: int) -> str:
+    """Content version of /resources/{id}. Visits still in the buffer count
+    towards it instead of being flushed, so reading stays read-only and
+    works on a replica."""
+    version = await content_version(conn, "resource", resource_id)
+    pending = visit_buffer.pending(resource_id)
+    return str(version) if pending is None else f"{version}+{pending[0]}"
+
+
+async def render_resource_detail(conn: AsyncConnection, resource_id: int, version: str | None = None) -> bytes:
+    """JSON body of /resources/{id}, served from the response cache when warm."""
+    if version is None:
+        version = await resource_detail_version(conn, resource_id)
+    key = ("resource_detail", resource_id, version)
+    body = response_cache.get(key)
+    if body is None:
+        epoch = response_cache.epoch
+        detail = await build_resource_detail(conn, resource_id)
+        body = detail.model_dump_json().encode()
+        response_cache.set(key, body, resource_detail_deps(detail), epoch)
+    return body
@@ -0,0 +1,150 @@
+import heapq
+from bisect import bisect_left, insort
+
+from psycopg import AsyncConnection
+
+# Prefixes matching more tags than this keep a ranked list of their best
+# MAX_SUGGESTIONS tags; narrower ones are ranked by scanning their range
+SCAN_LIMIT = 64
+MAX_SUGGESTIONS = 50
+
+# Sorts after every character a tag name can continue a prefix with
+_PREFIX_END = "\U0010ffff"
+
+
+class TagIndex:
+    """In-memory autocomplete index over ``tags.tag_name``.
+
+    Case-folded names are kept sorted, so the tags matching a prefix form
+    one contiguous range. Ranges of at most ``SCAN_LIMIT`` tags are ranked
+    by usage on demand; wider prefixes keep their top ``MAX_SUGGESTIONS``
+    tags, which are maintained as tags are created and used. Either way a
+    suggestion ranks a bounded number of tags, however many exist.
+
+    Like the relation graph this is per process: another worker's writes
+    are not seen until restart, and usage changes other than tag assignment
+    (such as a problem delete) are picked up at the next load.
+    """
+
+    def __init__(self):
+        self._entries: list[tuple[str, int]] = []
+        self._tags: dict[int, dict] = {}
+        self._folded: dict[int, str] = {}
+        self._usage: dict[int, int] = {}
+        # Ranked tag ids of wide prefixes; None until re-ranked after a
+        # listed tag lost usage
+        self._top: dict[str, list[int] | None] = {}
+
+    async def load(self, conn: AsyncConnection) -> None:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """
+                SELECT t.tag_id, t.tag_name, t.category, COALESCE(tu.usage_count, 0) AS usage_count
+                FROM tags t
+                LEFT JOIN tag_usage tu ON tu.tag_id = t.tag_id
+                """
+            )
+            rows = await cur.fetchall()
+        self._tags, self._folded, self._usage = {}, {}, {}
+        for row in rows:
+            self._store(row, row["usage_count"])
+        self._entries = sorted((folded, tag_id) for tag_id, folded in self._folded.items())
+        self._top = {}
+        if len(self._entries) > SCAN_LIMIT:
+            self._index_prefix("", 0, len(self._entries))
+
+    def stats(self) -> dict:
+        return {"tags": len(self._entries), "ranked_prefixes": len(self._top)}
+
+    def suggest(self, prefix: str, limit: int) -> list[dict]:
+        """Tags whose case-folded name starts with ``prefix``, most used first."""
+        prefix = prefix.casefold()
+        if prefix in self._top:
+            ranked = self._top[prefix]
+            if ranked is None:
+                ranked = self._top[prefix] = self._rank(*self._range(prefix), MAX_SUGGESTIONS)
+        else:
+            ranked = self._rank(*self._range(prefix), limit)
+        return [{**self._tags[tag_id], "usage_count": self._usage[tag_id]} for tag_id in ranked[:limit]]
+
+    def add(self, tag: dict) -> None:
+        """Index a newly created tag."""
+        tag_id, folded = self._store(tag, 0)
+        insort(self._entries, (folded, tag_id))
+        for prefix in self._prefixes(folded):
+            if prefix in self._top:
+                self._offer(prefix, tag_id)
+                continue
+            lo, hi = self._range(prefix)
+            if hi - lo <= SCAN_LIMIT:
+                # Longer prefixes match a subset of this range
+                break
+            self._top[prefix] = self._rank(lo, hi, MAX_SUGGESTIONS)
+
+    def use(self, tag_id: int, delta: int) -> None:
+        """Record ``delta`` more (or fewer) problems carrying a tag.
+
+        Usage counts problems only, like ``tag_usage`` it is loaded from, so
+        resource tags don't move a tag's rank.
+        """
+        if tag_id not in self._usage:
+            return
+        self._usage[tag_id] += delta
+        for prefix in self._prefixes(self._folded[tag_id]):
+            if prefix not in self._top:
+                break
+            if delta > 0:
+                self._offer(prefix, tag_id)
+            elif self._top[prefix] is not None and tag_id in self._top[prefix]:
+                # A tag outside the list may outrank it now
+                self._top[prefix] = None
+
+    def _store(self, tag: dict, usage: int) -> tuple[int, str]:
+        tag_id = tag["tag_id"]
+        self._tags[tag_id] = {"tag_id": tag_id, "tag_name": tag["tag_name"], "category": tag["category"]}
+        self._folded[tag_id] = tag["tag_name"].casefold()
+        self._usage[tag_id] = usage
+        return tag_id, self._folded[tag_id]
+
+    @staticmethod
+    def _prefixes(folded: str):
+        return (folded[:length] for length in range(len(folded) + 1))
+
+    def _range(self, prefix: str, lo: int = 0, hi: int | None = None) -> tuple[int, int]:
+        hi = len(self._entries) if hi is None else hi
+        start = bisect_left(self._entries, (prefix,), lo, hi)
+        return start, bisect_left(self._entries, (prefix + _PREFIX_END,), start, hi)
+
+    def _rank_key(self, tag_id: int) -> tuple:
+        return (-self._usage[tag_id], self._folded[tag_id], tag_id)
+
+    def _rank(self, lo: int, hi: int, limit: int) -> list[int]:
+        return heapq.nsmallest(limit, (self._entries[i][1] for i in range(lo, hi)), key=self._rank_key)
+
+    def _offer(self, prefix: str, tag_id: int) -> None:
+        ranked = self._top[prefix]
+        if ranked is None:
+            return
+        if tag_id in ranked:
+            ranked.sort(key=self._rank_key)
+        elif len(ranked) < MAX_SUGGESTIONS or self._rank_key(tag_id) < self._rank_key(ranked[-1]):
+            insort(ranked, tag_id, key=self._rank_key)
+            del ranked[MAX_SUGGESTIONS:]
+
+    def _index_prefix(self, prefix: str, lo: int, hi: int) -> None:
+        """Rank ``prefix`` and, recursively, its extensions that are still wide."""
+        self._top[prefix] = self._rank(lo, hi, MAX_SUGGESTIONS)
+        depth = len(prefix)
+        i = lo
+        while i < hi:
+            folded = self._entries[i][0]
+            if len(folded) <= depth:
+                i += 1
+                continue
+            child_lo, child_hi = self._range(folded[: depth + 1], i, hi)
+            if child_hi - child_lo > SCAN_LIMIT:
+                self._index_prefix(folded[: depth + 1], child_lo, child_hi)
+            i = child_hi
+
+
+tag_index = TagIndex()
@@ -0,0 +1,180 @@
+import math
+import re
+from collections.abc import Iterable
+
+import numpy as np
+from psycopg import AsyncConnection
+
+# Weight of a resource tag without a confidence; problem tags always weigh 1
+DEFAULT_CONFIDENCE = 1.0
+# Score of a tag named in the draft's text, and how strongly it pulls in
+# its co-occurring tags compared with a tag the author already chose
+TEXT_MATCH_SCORE = 1.0
+TEXT_SEED_WEIGHT = 0.5
+
+# Entries that cancel out to (almost) nothing are dropped from their row
+_EPSILON = 1e-9
+
+_WORD = re.compile(r"\w[\w+#]*(?:[.-]\w[\w+#]*)*")
+
+_EMPTY_IDS = np.empty(0, dtype=np.int64)
+_EMPTY_WEIGHTS = np.empty(0, dtype=np.float64)
+
+
+def resource_tag_weight(confidence: float | None) -> float:
+    return DEFAULT_CONFIDENCE if confidence is None else confidence
+
+
+def _name_key(text: str) -> str:
+    """How tag names and draft words are compared: "Node.js" matches "nodejs"."""
+    return text.casefold().replace(".", "")
+
+
+class TagRecommender:
+    """Tag co-occurrence matrix over ``problem_tags`` and ``resource_tags``.
+
+    Every problem or resource adds, for each pair of its tags, the product
+    of their weights (1 for a problem tag, the confidence for a resource
+    tag) to that pair's entry; the diagonal holds each tag's own weighted
+    frequency. Rows are kept sparse as sorted NumPy arrays of neighbour ids
+    and weights, updated in place as tags are assigned and removed.
+
+    A recommendation sums the cosine-normalised rows of the chosen tags and
+    of the tags named in the draft text, so its cost depends on how many
+    tags are involved, not on how many problems and resources exist.
+
+    Like the relation graph this is per process: another worker's writes
+    are not seen until restart, and deletes of whole problems or resources
+    are picked up at the next load.
+    """
+
+    def __init__(self):
+        self._tags: dict[int, dict] = {}
+        self._by_name: dict[str, int] = {}
+        self._rows: dict[int, tuple[np.ndarray, np.ndarray]] = {}
+        # Indexed by tag id
+        self._frequency = np.zeros(1)
+
+    async def load(self, conn: AsyncConnection) -> None:
+        async with conn.cursor() as cur:
+            await cur.execute("SELECT tag_id, tag_name, category FROM tags")
+            tags = await cur.fetchall()
+            await cur.execute(
+                """
+                SELECT tag_a, tag_b, SUM(weight) AS weight
+                FROM (
+                    SELECT a.tag_id AS tag_a, b.tag_id AS tag_b, 1.0 AS weight
+                    FROM problem_tags a
+                    JOIN problem_tags b ON b.problem_id = a.problem_id
+                    UNION ALL
+                    SELECT a.tag_id, b.tag_id,
+                           COALESCE(a.confidence, %(default)s) * COALESCE(b.confidence, %(default)s)
+                    FROM resource_tags a
+                    JOIN resource_tags b ON b.resource_id = a.resource_id
+                ) pairs
+                GROUP BY tag_a, tag_b
+                ORDER BY tag_a, tag_b
+                """,
+                {"default": DEFAULT_CONFIDENCE},
+            )
+            pairs = await cur.fetchall()
+
+        self._tags, self._by_name = {}, {}
+        for tag in tags:
+            self.add_tag(tag)
+
+        self._rows = {}
+        self._frequency = np.zeros(max(self._tags, default=0) + 1)
+        if not pairs:
+            return
+        rows = np.fromiter((p["tag_a"] for p in pairs), dtype=np.int64, count=len(pairs))
+        cols = np.fromiter((p["tag_b"] for p in pairs), dtype=np.int64, count=len(pairs))
+        weights = np.fromiter((p["weight"] for p in pairs), dtype=np.float64, count=len(pairs))
+        diagonal = rows == cols
+        self._frequency[rows[diagonal]] = weights[diagonal]
+        rows, cols, weights = rows[~diagonal], cols[~diagonal], weights[~diagonal]
+        # Pairs arrive sorted by row, then column: split them into rows
+        starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]]) if len(rows) else _EMPTY_IDS
+        for start, stop in zip(starts, np.r_[starts[1:], len(rows)]):
+            self._rows[int(rows[start])] = (cols[start:stop].copy(), weights[start:stop].copy())
+
+    def stats(self) -> dict:
+        return {"tags": len(self._tags), "pairs": sum(len(ids) for ids, _ in self._rows.values()) // 2}
+
+    def add_tag(self, tag: dict) -> None:
+        """Make a tag recommendable and matchable by name."""
+        tag_id = tag["tag_id"]
+        self._tags[tag_id] = {"tag_id": tag_id, "tag_name": tag["tag_name"], "category": tag["category"]}
+        self._by_name[_name_key(tag["tag_name"])] = tag_id
+        if tag_id >= len(self._frequency):
+            self._frequency = np.pad(self._frequency, (0, tag_id + 1 - len(self._frequency)))
+
+    def reweight(self, tag_id: int, old: float, new: float, others: dict[int, float]) -> None:
+        """Record a tag's weight on one item changing from ``old`` to ``new``
+        (0 when absent), given the weights of the item's other tags."""
+        delta = new - old
+        if not delta or tag_id not in self._tags:
+            return
+        self._frequency[tag_id] += new * new - old * old
+        for other, weight in others.items():
+            if other != tag_id and other in self._tags and weight:
+                self._bump(tag_id, other, delta * weight)
+                self._bump(other, tag_id, delta * weight)
+
+    def add_item(self, weights: dict[int, float]) -> None:
+        """Record a new item carrying ``weights`` tags."""
+        seen: dict[int, float] = {}
+        for tag_id, weight in weights.items():
+            self.reweight(tag_id, 0.0, weight, seen)
+            seen[tag_id] = weight
+
+    def recommend(self, text: str, chosen: Iterable[int], limit: int) -> list[dict]:
+        """Tags to add to a draft, best first, with their scores."""
+        chosen = {tag_id for tag_id in chosen if tag_id in self._tags}
+        named = self._named(text) - chosen
+        seeds = [(tag_id, 1.0) for tag_id in chosen] + [(tag_id, TEXT_SEED_WEIGHT) for tag_id in named]
+
+        ids = [np.fromiter(named, dtype=np.int64, count=len(named))]
+        scores = [np.full(len(named), TEXT_MATCH_SCORE)]
+        for seed, strength in seeds:
+            neighbours, weights = self._rows.get(seed, (_EMPTY_IDS, _EMPTY_WEIGHTS))
+            if not len(neighbours):
+                continue
+            norms = np.sqrt(np.maximum(self._frequency[seed] * self._frequency[neighbours], _EPSILON))
+            ids.append(neighbours)
+            scores.append(strength * weights / norms)
+
+        ids, inverse = np.unique(np.concatenate(ids), return_inverse=True)
+        totals = np.bincount(inverse, weights=np.concatenate(scores), minlength=len(ids))
+        keep = (totals > _EPSILON) & ~np.isin(ids, list(chosen))
+        ids, totals = ids[keep], totals[keep]
+        if len(ids) > limit:
+            top = np.argpartition(-totals, limit - 1)[:limit]
+            ids, totals = ids[top], totals[top]
+        order = np.lexsort((ids, -totals))
+        return [
+            {**self._tags[tag_id], "score": round(score, 4)}
+            for tag_id, score in zip(ids[order].tolist(), totals[order].tolist())
+            if tag_id in self._tags
+        ]
+
+    def _named(self, text: str) -> set[int]:
+        """Tags whose name appears in ``text`` as a word, or as two words
+        standing for a hyphenated name ("dynamic programming")."""
+        words = [_name_key(word) for word in _WORD.findall(text)]
+        candidates = words + [f"{a}-{b}" for a, b in zip(words, words[1:])]
+        return {self._by_name[c] for c in candidates if c in self._by_name}
+
+    def _bump(self, row: int, column: int, delta: float) -> None:
+        ids, weights = self._rows.get(row, (_EMPTY_IDS, _EMPTY_WEIGHTS))
+        i = int(np.searchsorted(ids, column))
+        if i < len(ids) and ids[i] == column:
+            weights[i] += delta
+            if math.fabs(weights[i]) < _EPSILON:
+                ids, weights = np.delete(ids, i), np.delete(weights, i)
+        elif delta > 0:
+            ids, weights = np.insert(ids, i, column), np.insert(weights, i, delta)
+        self._rows[row] = (ids, weights)
+
+
+tag_recommender = TagRecommender()
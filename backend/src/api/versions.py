@@ -0,0 +1,50 @@
+"""Conditional GETs backed by the trigger-maintained ``content_versions`` table.
+
+Every write bumps the version of each page it changes, so a request whose
+``If-None-Match`` still names the current version is answered ``304`` after
+one primary key lookup, before any of the page's own queries run.
+"""
+
+from fastapi import Request, Response, status
+from psycopg import AsyncConnection
+
+# Browsers may keep these pages but must revalidate them on every use
+CACHE_CONTROL = "private, no-cache"
+
+
+async def content_version(conn: AsyncConnection, scope: str, entity_id: int) -> int:
+    """Current version of a page; 0 until something on it first changes."""
+    async with conn.cursor() as cur:
+        await cur.execute(
+            "SELECT version FROM content_versions WHERE scope = %s AND entity_id = %s",
+            (scope, entity_id),
+        )
+        row = await cur.fetchone()
+    return row["version"] if row else 0
+
+
+def make_etag(scope: str, entity_id: int, version: int | str) -> str:
+    return f'"{scope}-{entity_id}-{version}"'
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """Whether ``If-None-Match`` already names ``etag`` (weak or strong)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+def not_modified(etag: str) -> Response:
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers={"ETag": etag, "Cache-Control": CACHE_CONTROL},
+    )
+
+
+def with_etag(response: Response, etag: str) -> Response:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    return response
@@ -0,0 +1,157 @@
+import asyncio
+import logging
+from datetime import datetime
+
+from src.api.cache import response_cache
+from src.config import settings
+from src.db.connection import async_pool
+
+logger = logging.getLogger(__name__)
+
+# One statement per flush however many resources were visited. Arrays keep
+# the statement text fixed, so the server can reuse its plan.
+FLUSH_QUERY = """
+    UPDATE resources AS r
+    SET visit_count = r.visit_count + v.visits,
+        last_visited_at = GREATEST(r.last_visited_at, v.last_visited_at)
+    FROM unnest(%s::int[], %s::int[], %s::timestamp[]) AS v(resource_id, visits, last_visited_at)
+    WHERE r.resource_id = v.resource_id
+"""
+
+
+class VisitBuffer:
+    """Coalesces resource visits in memory and writes them in batches.
+
+    Visits are summed per resource and flushed as a single UPDATE every
+    ``interval_ms`` or as soon as ``max_events`` visits are waiting, so a
+    popular resource costs one row update per flush instead of one per
+    click. Counts not yet flushed are reported by ``pending``, so single
+    resource reads served by the worker that accepted a visit return an
+    exact ``visit_count``; other workers see it within one flush interval.
+    """
+
+    def __init__(self, interval_ms: int, max_events: int):
+        self.interval = interval_ms / 1000
+        self.max_events = max_events
+        self.flushes = 0
+        self.flushed_events = 0
+        self._pending: dict[int, tuple[int, datetime]] = {}
+        self._in_flight: dict[int, tuple[int, datetime]] = {}
+        self._events = 0
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+
+    def record(self, resource_id: int, visited_at: datetime | None = None, count: int = 1) -> None:
+        now = datetime.now()
+        if visited_at is None:
+            visited_at = now
+        elif visited_at.tzinfo is not None:
+            # last_visited_at is a naive local TIMESTAMP column
+            visited_at = visited_at.astimezone().replace(tzinfo=None)
+        # Client clocks may run ahead; never move last_visited_at into the future
+        visited_at = min(visited_at, now)
+        self._merge(self._pending, resource_id, count, visited_at)
+        self._events += count
+        if self._events >= self.max_events:
+            self._wakeup.set()
+
+    def pending(self, resource_id: int) -> tuple[int, datetime] | None:
+        """Visits accepted for ``resource_id`` but not yet committed."""
+        merged: dict[int, tuple[int, datetime]] = {}
+        for source in (self._in_flight, self._pending):
+            if resource_id in source:
+                self._merge(merged, resource_id, *source[resource_id])
+        return merged.get(resource_id)
+
+    def apply_pending(self, row: dict) -> dict:
+        """Overlay unflushed visits onto a ``resources`` row."""
+        pending = self.pending(row["resource_id"])
+        if pending is None:
+            return row
+        count, visited_at = pending
+        last = row.get("last_visited_at")
+        return {
+            **row,
+            "visit_count": (row.get("visit_count") or 0) + count,
+            "last_visited_at": visited_at if last is None else max(last, visited_at),
+        }
+
+    async def flush(self) -> int:
+        """Write every buffered visit; returns the number of visits written."""
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            batch, self._pending, self._events = self._pending, {}, 0
+            self._in_flight = batch
+            ids = sorted(batch)
+            try:
+                async with async_pool.connection() as conn:
+                    async with conn.cursor() as cur:
+                        await cur.execute(
+                            FLUSH_QUERY,
+                            (ids, [batch[i][0] for i in ids], [batch[i][1] for i in ids]),
+                        )
+                    await conn.commit()
+                    self._in_flight = {}
+            except Exception:
+                # Keep the visits for the next attempt
+                for resource_id, (count, visited_at) in batch.items():
+                    self._merge(self._pending, resource_id, count, visited_at)
+                    self._events += count
+                self._in_flight = {}
+                raise
+
+            written = sum(count for count, _ in batch.values())
+            self.flushes += 1
+            self.flushed_events += written
+            response_cache.invalidate(*(("resource", resource_id) for resource_id in ids))
+            return written
+
+    def start(self) -> None:
+        # Bind the primitives to the loop that is starting the app
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Cancel the background flusher and write whatever is still buffered."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "pending_events": self._events,
+            "pending_resources": len(self._pending),
+            "flushes": self.flushes,
+            "flushed_events": self.flushed_events,
+        }
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Flushing resource visits failed; retrying on the next tick")
+
+    @staticmethod
+    def _merge(target: dict, resource_id: int, count: int, visited_at: datetime) -> None:
+        current = target.get(resource_id)
+        if current is None:
+            target[resource_id] = (count, visited_at)
+        else:
+            target[resource_id] = (current[0] + count, max(current[1], visited_at))
+
+
+visit_buffer = VisitBuffer(settings.visit_flush_interval_ms, settings.visit_flush_max_events)
@@ -2,8 +2,35 @@ from pydantic_settings import BaseSettings
 
 
 class Settings(BaseSettings):
+    # Recreate the schema (dropping all data) on startup; turn off to serve
+    # a database that is already populated
+    init_schema: bool = True
     load_fake_data: bool = False
     database_url: str = "sqlite:///./test.db"
+    # Connection pool sizing. A request waits up to db_pool_timeout seconds
+    # for a connection before failing with 503; connections are replaced
+    # after db_pool_max_lifetime seconds, or closed after db_pool_max_idle
+    # idle seconds while the pool is above its minimum size
+    db_pool_min_size: int = 2
+    db_pool_max_size: int = 10
+    db_pool_timeout: float = 30.0
+    db_pool_max_lifetime: float = 3600.0
+    db_pool_max_idle: float = 600.0
+    # /health/ready fails while more requests than this wait for a connection
+    db_pool_ready_max_waiting: int = 10
+    # Read replicas for GET routes, as a JSON list of URLs, each health
+    # checked every replica_check_interval seconds. After a write, the
+    # client's reads stay on the primary for read_your_writes_seconds.
+    replica_urls: list[str] = []
+    replica_check_interval: float = 5.0
+    read_your_writes_seconds: float = 5.0
+    response_cache_max_bytes: int = 64 * 1024 * 1024
+    visit_flush_interval_ms: int = 250
+    visit_flush_max_events: int = 1000
+    # Send per-request database timings to clients in a Server-Timing header
+    server_timing: bool = True
+    # Warn when one statement runs more often than this in a single request
+    repeated_query_threshold: int = 5
 
     class Config:
         env_file = ".env"
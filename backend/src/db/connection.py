@@ -1,21 +1,54 @@
-from contextlib import contextmanager
+from contextlib import asynccontextmanager
 
 from psycopg.rows import dict_row
-from psycopg_pool import ConnectionPool
+from psycopg_pool import AsyncConnectionPool
 
 from src.config import settings
+from src.db.instrumentation import InstrumentedAsyncCursor, pool_wait_histogram
 
-# Create connection pool
-pool = ConnectionPool(
+# Sizing of the request path's pools: async_pool and each replica's
+POOL_OPTIONS = {
+    "min_size": settings.db_pool_min_size,
+    "max_size": settings.db_pool_max_size,
+    "timeout": settings.db_pool_timeout,
+    "max_lifetime": settings.db_pool_max_lifetime,
+    "max_idle": settings.db_pool_max_idle,
+}
+
+# Async pool used by the request path; opened and closed by the app lifespan
+# because it must be bound to the running event loop.
+async_pool = AsyncConnectionPool(
     conninfo=settings.database_url,
-    min_size=2,
-    max_size=10,
-    kwargs={"row_factory": dict_row},
+    kwargs={"row_factory": dict_row, "cursor_factory": InstrumentedAsyncCursor},
+    open=False,
+    **POOL_OPTIONS,
 )
 
 
-@contextmanager
-def get_connection():
-    """Get a database connection from the pool."""
-    with pool.connection() as conn:
+def async_pool_stats() -> dict:
+    """Live gauges and lifetime counters of the request path's pool."""
+    stats = async_pool.get_stats()
+    size, idle = stats["pool_size"], stats["pool_available"]
+    return {
+        "open": not async_pool.closed,
+        "min_size": stats["pool_min"],
+        "max_size": stats["pool_max"],
+        "size": size,
+        "idle": idle,
+        "in_use": size - idle,
+        "waiting": stats.get("requests_waiting", 0),
+        "requests": stats.get("requests_num", 0),
+        "requests_queued": stats.get("requests_queued", 0),
+        # Checkouts that failed, mostly timeouts of a saturated pool
+        "request_errors": stats.get("requests_errors", 0),
+        "connection_errors": stats.get("connections_errors", 0),
+        "connections_lost": stats.get("connections_lost", 0),
+        "wait_ms": pool_wait_histogram.snapshot(),
+    }
+
+
+@asynccontextmanager
+async def get_async_connection():
+    """Get a database connection from the async pool."""
+    async with async_pool.connection() as conn:
         yield conn
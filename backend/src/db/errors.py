@@ -1,6 +1,21 @@
 from psycopg import errors
 from fastapi import HTTPException, status
 
+# Foreign keys whose violation means an id named in the request doesn't exist,
+# so link routes can insert directly and still answer 404
+NOT_FOUND_CONSTRAINTS = {
+    "problem_resources_problem_id_fkey": "Problem not found",
+    "problem_resources_resource_id_fkey": "Resource not found",
+    "solution_resources_solution_id_fkey": "Solution not found",
+    "solution_resources_resource_id_fkey": "Resource not found",
+    "problem_relations_from_problem_id_fkey": "Problem not found",
+    "problem_relations_to_problem_id_fkey": "Problem not found",
+    "problem_tags_problem_id_fkey": "Problem not found",
+    "problem_tags_tag_id_fkey": "Tag not found",
+    "resource_tags_resource_id_fkey": "Resource not found",
+    "resource_tags_tag_id_fkey": "Tag not found",
+}
+
 
 def handle_db_error(e: Exception):
     """Convert psycopg errors to HTTP exceptions."""
@@ -12,6 +27,9 @@ def handle_db_error(e: Exception):
         )
     elif isinstance(e, errors.ForeignKeyViolation):
         # Referenced entity doesn't exist
+        detail = NOT_FOUND_CONSTRAINTS.get(e.diag.constraint_name)
+        if detail is not None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=detail)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Referenced resource not found"
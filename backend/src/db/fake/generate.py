@@ -0,0 +1,392 @@
+"""Generate a synthetic dataset shaped like the CSV fixtures, at any scale.
+
+The fixture is one small workspace: 12 users, 150 problems, 250 resources.
+The generator builds ``scale`` such blocks. Each generated problem or
+resource is modelled on a fixture row drawn at random, so the fixture's
+distributions carry over: tags per problem, solutions per problem, relation
+out-degree, links per problem, and how often a resource is reused.
+Within a block, resources are linked in proportion to their template's
+reuse. Solution version trees are grown to the fixture's depth and version
+profile. Relations may point at any problem in the dataset.
+
+The output is deterministic for a given ``--seed``. Every table is
+generated block by block from its own random stream, so tables can be
+written one at a time and memory stays at one block however large the
+scale. Rows go straight to CSV files that ``load_tables --dir`` accepts, or
+with ``--load`` straight into the database through ``COPY``:
+
+    uv run python -m src.db.fake.generate --scale 20000 --out /tmp/solvex-20k
+    uv run python -m src.db.fake.generate --init --load --scale 2000
+"""
+
+import argparse
+import csv
+import io
+import random
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple
+
+import psycopg
+
+from src.config import settings
+from src.db.fake.load_tables import COPY_CHUNK_SIZE, TABLES_DIR, _columns, _load_levels, _reset_sequences
+
+# Share of template tags swapped for a popularity-weighted draw, so that
+# generated problems don't all repeat the fixture's 150 tag sets
+TAG_MUTATION_RATE = 0.2
+
+
+def _read(tables_dir: Path, name: str) -> List[Dict[str, str]]:
+    with open(tables_dir / f"{name}.csv", newline="") as f:
+        return list(csv.DictReader(f))
+
+
+def _group(rows: List[Dict[str, str]], key: str) -> Dict[str, List[Dict[str, str]]]:
+    groups = defaultdict(list)
+    for row in rows:
+        groups[row[key]].append(row)
+    return groups
+
+
+class Profile:
+    """The fixture rows and the distributions sampled from them."""
+
+    def __init__(self, tables_dir: Path = TABLES_DIR):
+        self.users = _read(tables_dir, "users")
+        self.problems = _read(tables_dir, "problems")
+        self.resources = _read(tables_dir, "resources")
+        self.tags = _read(tables_dir, "tags")
+        solutions = _read(tables_dir, "solutions")
+        problem_links = _read(tables_dir, "problem_resources")
+        solution_links = _read(tables_dir, "solution_resources")
+
+        self.problem_tags = _group(_read(tables_dir, "problem_tags"), "problem_id")
+        self.resource_tags = _group(_read(tables_dir, "resource_tags"), "resource_id")
+        self.problem_links = _group(problem_links, "problem_id")
+        self.relations = _group(_read(tables_dir, "problem_relations"), "from_problem_id")
+        self.solution_counts = Counter(row["problem_id"] for row in solutions)
+        self.reuse = Counter(row["resource_id"] for row in problem_links)
+        links_per_solution = Counter(row["solution_id"] for row in solution_links)
+        self.solution_links = [links_per_solution[row["solution_id"]] for row in solutions]
+
+        tag_ids = [tag["tag_id"] for tag in self.tags]
+        self.tag_ids = tag_ids
+        problem_tag_use = Counter(row["tag_id"] for rows in self.problem_tags.values() for row in rows)
+        resource_tag_use = Counter(row["tag_id"] for rows in self.resource_tags.values() for row in rows)
+        # Unused tags keep a small weight so mutation can still reach them
+        self.problem_tag_weights = [problem_tag_use[t] + 1 for t in tag_ids]
+        self.resource_tag_weights = [resource_tag_use[t] + 1 for t in tag_ids]
+
+        parents = {row["solution_id"]: row["parent_solution_id"] for row in solutions}
+        self.root_solutions = [row for row in solutions if not row["parent_solution_id"]]
+        self.child_solutions = [row for row in solutions if row["parent_solution_id"]]
+        depths = Counter()
+        self.versions = defaultdict(list)
+        for row in solutions:
+            depth, parent = 0, row["parent_solution_id"]
+            while parent:
+                depth, parent = depth + 1, parents[parent]
+            depths[depth] += 1
+            self.versions[depth].append(row["version_number"])
+        # Depths of every solution after a problem's first, which is always
+        # a root; drawing those from all depths would add one root too many
+        depths[0] -= len(self.solution_counts)
+        self.later_depths = list(depths.elements())
+
+    def versions_at(self, depth: int) -> List[str]:
+        return self.versions[min(depth, max(self.versions))]
+
+
+class BlockPlan(NamedTuple):
+    index: int
+    user_base: int
+    problem_base: int
+    resource_base: int
+    first_solution_id: int
+    # Fixture rows the block's problems and resources are modelled on
+    problems: List[Dict[str, str]]
+    resources: List[Dict[str, str]]
+    total_problems: int
+
+
+def _plans(profile: Profile, scale: int, seed: int) -> Iterator[BlockPlan]:
+    """Block layouts in order; every table's generator walks the same plans."""
+    first_solution_id = 1
+    for index in range(scale):
+        rng = random.Random(f"{seed}:plan:{index}")
+        problems = rng.choices(profile.problems, k=len(profile.problems))
+        resources = rng.choices(profile.resources, k=len(profile.resources))
+        yield BlockPlan(
+            index=index,
+            user_base=index * len(profile.users),
+            problem_base=index * len(profile.problems),
+            resource_base=index * len(profile.resources),
+            first_solution_id=first_solution_id,
+            problems=problems,
+            resources=resources,
+            total_problems=scale * len(profile.problems),
+        )
+        first_solution_id += sum(profile.solution_counts[p["problem_id"]] for p in problems)
+
+
+def _mutate_tags(rng: random.Random, tag_ids: List[str], profile: Profile, weights: List[int]) -> List[str]:
+    chosen = list(tag_ids)
+    for i in range(len(chosen)):
+        if rng.random() < TAG_MUTATION_RATE:
+            candidate = rng.choices(profile.tag_ids, weights=weights)[0]
+            if candidate not in chosen:
+                chosen[i] = candidate
+    return chosen
+
+
+def _users(profile: Profile, plan: BlockPlan, rng: random.Random) -> Iterator[Dict]:
+    for i, user in enumerate(profile.users, start=1):
+        email = user["email"] if plan.index == 0 else f"c{plan.index}.{user['email']}"
+        yield {**user, "user_id": plan.user_base + i, "email": email}
+
+
+def _problems(profile: Profile, plan: BlockPlan, rng: random.Random) -> Iterator[Dict]:
+    for i, template in enumerate(plan.problems, start=1):
+        yield {
+            **template,
+            "problem_id": plan.problem_base + i,
+            "user_id": plan.user_base + int(template["user_id"]),
+        }
+
+
+def _resources(profile: Profile, plan: BlockPlan, rng: random.Random) -> Iterator[Dict]:
+    for i, template in enumerate(plan.resources, start=1):
+        resource_id = plan.resource_base + i
+        yield {
+            **template,
+            "resource_id": resource_id,
+            "user_id": plan.user_base + int(template["user_id"]),
+            # Keep URLs distinct; the fixture templates repeat across blocks
+            "url": f"{template['url']}?r={resource_id}",
+        }
+
+
+def _solutions(profile: Profile, plan: BlockPlan, rng: random.Random) -> Iterator[Dict]:
+    solution_id = plan.first_solution_id
+    for i, template in enumerate(plan.problems, start=1):
+        count = profile.solution_counts[template["problem_id"]]
+        # Shallow first, so a level is populated before the one below it
+        depths = sorted([0] + [rng.choice(profile.later_depths) for _ in range(count - 1)]) if count else []
+        # Solution ids of this problem's version tree, by depth
+        levels: List[List[int]] = []
+        for depth in depths:
+            depth = min(depth, len(levels))
+            if depth == len(levels):
+                levels.append([])
+            if depth == 0:
+                parent, source = None, rng.choice(profile.root_solutions)
+            else:
+                parent, source = rng.choice(levels[depth - 1]), rng.choice(profile.child_solutions)
+            levels[depth].append(solution_id)
+            # Parents always get lower ids, so they are inserted first as the
+            # solution path trigger requires
+            yield {
+                **source,
+                "solution_id": solution_id,
+                "problem_id": plan.problem_base + i,
+                "parent_solution_id": parent,
+                "version_number": rng.choice(profile.versions_at(depth)),
+            }
+            solution_id += 1
+
+
+def _problem_tags(profile: Profile, plan: BlockPlan, rng: random.Random) -> Iterator[Dict]:
+    for i, template in enumerate(plan.problems, start=1):
+        tag_ids = [row["tag_id"] for row in profile.problem_tags.get(template["problem_id"], [])]
+        for tag_id in _mutate_tags(rng, tag_ids, profile, profile.problem_tag_weights):
+            yield {"problem_id": plan.problem_base + i, "tag_id": tag_id}
+
+
+def _resource_tags(profile: Profile, plan: BlockPlan, rng: random.Random) -> Iterator[Dict]:
+    for i, template in enumerate(plan.resources, start=1):
+        rows = profile.resource_tags.get(template["resource_id"], [])
+        tag_ids = _mutate_tags(rng, [row["tag_id"] for row in rows], profile, profile.resource_tag_weights)
+        for row, tag_id in zip(rows, tag_ids):
+            yield {**row, "resource_id": plan.resource_base + i, "tag_id": tag_id}
+
+
+def _link_stubs(profile: Profile, plan: BlockPlan, rng: random.Random) -> Iterator[int]:
+    """The block's resource ids, each repeated as often as its template is
+    linked to problems, dealt in random order and reshuffled when used up."""
+    stubs = [
+        plan.resource_base + i
+        for i, template in enumerate(plan.resources, start=1)
+        for _ in range(profile.reuse[template["resource_id"]])
+    ]
+    while True:
+        rng.shuffle(stubs)
+        yield from stubs
+
+
+def _problem_resources(profile: Profile, plan: BlockPlan, rng: random.Random) -> Iterator[Dict]:
+    stubs = _link_stubs(profile, plan, rng)
+    for i, template in enumerate(plan.problems, start=1):
+        links = profile.problem_links.get(template["problem_id"], [])
+        # A resource dealt twice to the same problem is linked once
+        resource_ids = dict.fromkeys(next(stubs) for _ in links)
+        for link, resource_id in zip(links, resource_ids):
+            yield {**link, "problem_id": plan.problem_base + i, "resource_id": resource_id}
+
+
+def _solution_resources(profile: Profile, plan: BlockPlan, rng: random.Random) -> Iterator[Dict]:
+    stubs = _link_stubs(profile, plan, rng)
+    solutions = sum(profile.solution_counts[p["problem_id"]] for p in plan.problems)
+    for solution_id in range(plan.first_solution_id, plan.first_solution_id + solutions):
+        for resource_id in dict.fromkeys(next(stubs) for _ in range(rng.choice(profile.solution_links))):
+            yield {"solution_id": solution_id, "resource_id": resource_id}
+
+
+def _problem_relations(profile: Profile, plan: BlockPlan, rng: random.Random) -> Iterator[Dict]:
+    for i, template in enumerate(plan.problems, start=1):
+        from_id = plan.problem_base + i
+        targets = {from_id}
+        for relation in profile.relations.get(template["problem_id"], []):
+            if len(targets) == plan.total_problems:
+                break
+            to_id = from_id
+            while to_id in targets:
+                to_id = rng.randint(1, plan.total_problems)
+            targets.add(to_id)
+            yield {**relation, "from_problem_id": from_id, "to_problem_id": to_id}
+
+
+BLOCK_ROWS = {
+    "users": _users,
+    "problems": _problems,
+    "resources": _resources,
+    "solutions": _solutions,
+    "problem_tags": _problem_tags,
+    "resource_tags": _resource_tags,
+    "problem_resources": _problem_resources,
+    "solution_resources": _solution_resources,
+    "problem_relations": _problem_relations,
+}
+
+
+def generate_rows(table: Dict[str, str], profile: Profile, scale: int, seed: int) -> Iterator[List]:
+    """Rows of one table in its CSV column order."""
+    columns = _columns(table)
+    name = table["name"]
+    if name not in BLOCK_ROWS:
+        # The tag vocabulary is shared by every block
+        rows: Iterable[Dict] = profile.tags
+    else:
+        rows = (
+            row
+            for plan in _plans(profile, scale, seed)
+            for row in BLOCK_ROWS[name](profile, plan, random.Random(f"{seed}:{name}:{plan.index}"))
+        )
+    for row in rows:
+        yield [row[column] for column in columns]
+
+
+def _csv_chunks(rows: Iterable[List], header: List[str] | None = None) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    if header:
+        writer.writerow(header)
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= COPY_CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+class _Counted:
+    """Passes rows through, counting them."""
+
+    def __init__(self, rows: Iterable[List]):
+        self.rows = rows
+        self.count = 0
+
+    def __iter__(self):
+        for row in self.rows:
+            self.count += 1
+            yield row
+
+
+def write_csv(out_dir: Path, scale: int, seed: int, profile: Profile | None = None):
+    """Write every table to ``out_dir`` under the fixture's file names."""
+    profile = profile or Profile()
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for level in _load_levels():
+        for table in level:
+            started = time.perf_counter()
+            rows = _Counted(generate_rows(table, profile, scale, seed))
+            with open(out_dir / table["file"], "w", newline="") as f:
+                for chunk in _csv_chunks(rows, header=_columns(table)):
+                    f.write(chunk)
+            print(f"✓ Wrote {rows.count} records to {table['file']} in {time.perf_counter() - started:.2f}s")
+
+
+def load_generated(scale: int, seed: int, profile: Profile | None = None):
+    """COPY every table into the database as it is generated."""
+    profile = profile or Profile()
+    started = time.perf_counter()
+    total = 0
+    with psycopg.connect(settings.database_url) as conn:
+        with conn.cursor() as cur:
+            # Generated data is reproducible; don't wait for WAL flushes
+            cur.execute("SET synchronous_commit = off")
+            for level in _load_levels():
+                for table in level:
+                    table_started = time.perf_counter()
+                    rows = _Counted(generate_rows(table, profile, scale, seed))
+                    columns = ", ".join(_columns(table))
+                    with cur.copy(f"COPY {table['name']} ({columns}) FROM STDIN WITH (FORMAT csv)") as copy:
+                        for chunk in _csv_chunks(rows):
+                            copy.write(chunk)
+                    conn.commit()
+                    total += rows.count
+                    elapsed = time.perf_counter() - table_started
+                    print(f"✓ Loaded {rows.count} records into {table['name']} in {elapsed:.2f}s")
+
+        _reset_sequences(conn)
+        conn.commit()
+        conn.autocommit = True
+        conn.execute("ANALYZE")
+        built = time.perf_counter()
+        conn.execute("SELECT rebuild_related_problems()")
+        conn.execute("ANALYZE problem_related")
+        print(f"✓ Built related problems in {time.perf_counter() - built:.2f}s")
+
+    elapsed = time.perf_counter() - started
+    print(f"✓ All data loaded successfully: {total} records in {elapsed:.2f}s ({total / elapsed:,.0f} rows/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=int, default=1, help="blocks of fixture-sized data to generate")
+    parser.add_argument("--seed", type=int, default=0)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--out", type=Path, help="directory to write the CSV files to")
+    target.add_argument("--load", action="store_true", help="COPY the rows straight into the database")
+    parser.add_argument("--init", action="store_true", help="recreate the schema first (drops all data)")
+    args = parser.parse_args()
+    if args.scale < 1:
+        parser.error("--scale must be at least 1")
+    if args.init and not args.load:
+        parser.error("--init only applies with --load")
+
+    if args.out:
+        write_csv(args.out, args.scale, args.seed)
+        return
+
+    if args.init:
+        from src.db.init_db import init_db
+
+        init_db()
+    load_generated(args.scale, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,24 @@
+"""Load the CSV fixtures into the database with COPY.
+
+Each CSV is streamed to the server as-is through ``COPY ... FROM STDIN``;
+the column list comes from the CSV header, so generated columns are left to
+PostgreSQL. Tables with no foreign keys between them load concurrently on
+separate connections. ``scale`` replicates the fixture server-side with
+offset ids, so large datasets never pass through Python row by row:
+
+    uv run python -m src.db.fake.load_tables --init --scale 200
+
+``--dir`` loads the same set of files from elsewhere, such as the output of
+``src.db.fake.generate``.
+"""
+
+import argparse
+import csv
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Dict, List
 
-import pandas as pd
 import psycopg
 
 from src.config import settings
@@ -9,67 +26,138 @@ from src.config import settings
 BASE_DIR = Path(__file__).resolve().parent
 TABLES_DIR = BASE_DIR / "tables"
 
-TABLES: List[Dict[str, object]] = [
-    {"name": "users", "file": "users.csv", "datetime": ["created_at"]},
-    {
-        "name": "problems",
-        "file": "problems.csv",
-        "datetime": ["created_at"],
-        "bool": ["resolved"],
-    },
-    {"name": "solutions", "file": "solutions.csv", "datetime": ["created_at"]},
-    {
-        "name": "resources",
-        "file": "resources.csv",
-        "datetime": ["first_visited_at", "last_visited_at"],
-    },
+COPY_CHUNK_SIZE = 1 << 20
+
+TABLES: List[Dict[str, str]] = [
+    {"name": "users", "file": "users.csv"},
+    {"name": "problems", "file": "problems.csv"},
+    {"name": "solutions", "file": "solutions.csv"},
+    {"name": "resources", "file": "resources.csv"},
     {"name": "tags", "file": "tags.csv"},
-    {"name": "problem_resources", "file": "problem_resources.csv", "datetime": ["added_at"]},
+    {"name": "problem_resources", "file": "problem_resources.csv"},
     {"name": "solution_resources", "file": "solution_resources.csv"},
     {"name": "problem_relations", "file": "problem_relations.csv"},
     {"name": "problem_tags", "file": "problem_tags.csv"},
     {"name": "resource_tags", "file": "resource_tags.csv"},
 ]
 
+# Columns holding an id and the table that owns it. Drives both load order
+# and the id offsets applied when scaling.
+ID_COLUMNS = {
+    "user_id": "users",
+    "problem_id": "problems",
+    "from_problem_id": "problems",
+    "to_problem_id": "problems",
+    "solution_id": "solutions",
+    "parent_solution_id": "solutions",
+    "resource_id": "resources",
+    "tag_id": "tags",
+}
+
+# The tag vocabulary is shared by every copy instead of being replicated
+SHARED_TABLES = {"tags"}
+
+# Unique columns that must differ between copies; ``k`` is the copy number
+UNIQUE_COLUMNS = {
+    ("users", "email"): "'c' || k || '.' || email",
+}
+
+SEQUENCES = [
+    ("users", "user_id"),
+    ("problems", "problem_id"),
+    ("solutions", "solution_id"),
+    ("resources", "resource_id"),
+    ("tags", "tag_id"),
+]
 
-def _coerce_datetimes(df: pd.DataFrame, columns: List[str]):
-    for column in columns:
-        if column in df.columns:
-            df[column] = pd.to_datetime(df[column])
-
-
-def _coerce_bools(df: pd.DataFrame, columns: List[str]):
-    truthy = {"true", "1", "t", "y", "yes"}
-    falsy = {"false", "0", "f", "n", "no"}
 
-    def _convert(value):
-        if isinstance(value, bool) or pd.isna(value):
-            return value
+def _columns(table: Dict[str, str], tables_dir: Path = TABLES_DIR) -> List[str]:
+    with open(tables_dir / table["file"], newline="") as f:
+        return next(csv.reader(f))
+
+
+def _load_levels(tables_dir: Path = TABLES_DIR) -> List[List[Dict[str, str]]]:
+    """Group tables so every table loads after the tables it references."""
+    depends = {
+        table["name"]: {
+            ID_COLUMNS[column]
+            for column in _columns(table, tables_dir)
+            if column in ID_COLUMNS and ID_COLUMNS[column] != table["name"]
+        }
+        for table in TABLES
+    }
+    loaded: set = set()
+    levels = []
+    while len(loaded) < len(TABLES):
+        level = [t for t in TABLES if t["name"] not in loaded and depends[t["name"]] <= loaded]
+        if not level:
+            raise RuntimeError("Circular foreign keys between fixture tables")
+        levels.append(level)
+        loaded.update(t["name"] for t in level)
+    return levels
+
+
+def _fixture_offsets(tables_dir: Path) -> Dict[str, int]:
+    """Highest fixture id per table; copy ``k`` shifts ids by ``k`` times this."""
+    files = {table["name"]: table["file"] for table in TABLES}
+    offsets = {}
+    for table_name, id_column in SEQUENCES:
+        if table_name in SHARED_TABLES:
+            continue
+        with open(tables_dir / files[table_name], newline="") as f:
+            offsets[table_name] = max(int(row[id_column]) for row in csv.DictReader(f))
+    return offsets
+
+
+def _replicate_sql(table: Dict[str, str], offsets: Dict[str, int], tables_dir: Path) -> str:
+    name = table["name"]
+    columns = _columns(table, tables_dir)
+    select = []
+    for column in columns:
+        owner = ID_COLUMNS.get(column)
+        if (name, column) in UNIQUE_COLUMNS:
+            select.append(UNIQUE_COLUMNS[(name, column)])
+        elif owner is not None and owner not in SHARED_TABLES:
+            select.append(f"{column} + k * {offsets[owner]}")
+        else:
+            select.append(column)
+    # Insert in id order so parent solutions precede their children, which
+    # the solution path trigger requires
+    return f"""
+        INSERT INTO {name} ({", ".join(columns)})
+        SELECT {", ".join(select)}
+        FROM {name}, generate_series(1, %s - 1) AS k
+        ORDER BY k, {columns[0]}
+    """
+
+
+def _load_table(table: Dict[str, str], scale: int, offsets: Dict[str, int], tables_dir: Path) -> tuple:
+    started = time.perf_counter()
+    name = table["name"]
+    columns = ", ".join(_columns(table, tables_dir))
 
-        normalized = str(value).strip().lower()
-        if normalized in truthy:
-            return True
-        if normalized in falsy:
-            return False
-        return bool(value)
+    with psycopg.connect(settings.database_url) as conn:
+        with conn.cursor() as cur:
+            # Fixture data is reproducible; don't wait for WAL flushes
+            cur.execute("SET synchronous_commit = off")
+            with cur.copy(f"COPY {name} ({columns}) FROM STDIN WITH (FORMAT csv, HEADER true)") as copy:
+                with open(tables_dir / table["file"], "rb") as f:
+                    while chunk := f.read(COPY_CHUNK_SIZE):
+                        copy.write(chunk)
+            rows = cur.rowcount
+
+            if scale > 1 and name not in SHARED_TABLES:
+                cur.execute(_replicate_sql(table, offsets, tables_dir), (scale,))
+                rows += cur.rowcount
+        conn.commit()
 
-    for column in columns:
-        if column in df.columns:
-            df[column] = df[column].map(_convert)
+    return name, rows, time.perf_counter() - started
 
 
 def _reset_sequences(conn: psycopg.Connection):
     """Reset PostgreSQL sequences after loading data with explicit IDs."""
-    tables_with_sequences = [
-        ("users", "user_id"),
-        ("problems", "problem_id"),
-        ("solutions", "solution_id"),
-        ("resources", "resource_id"),
-        ("tags", "tag_id"),
-    ]
-
     with conn.cursor() as cur:
-        for table_name, id_column in tables_with_sequences:
+        for table_name, id_column in SEQUENCES:
             cur.execute(
                 f"""
                 SELECT setval(
@@ -82,48 +170,52 @@ def _reset_sequences(conn: psycopg.Connection):
     print("✓ PostgreSQL sequences reset successfully")
 
 
-def load_tables():
-    """Load CSV test data into the database."""
-    with psycopg.connect(settings.database_url) as conn:
-        for table in TABLES:
-            csv_path = TABLES_DIR / table["file"]
-            df = pd.read_csv(csv_path)
-
-            # Convert data types
-            _coerce_datetimes(df, table.get("datetime", []))
-            _coerce_bools(df, table.get("bool", []))
-
-            # Replace NaN with None for proper NULL handling
-            df = df.where(pd.notna(df), None)
-
-            # Convert float columns that should be integers
-            for col in df.columns:
-                if df[col].dtype == 'float64':
-                    # Check if this column only has integer values or None
-                    non_null = df[col].dropna()
-                    if len(non_null) > 0 and all(non_null == non_null.astype(int)):
-                        df[col] = df[col].astype('Int64')  # Nullable integer type
-
-            # Convert to list of tuples for bulk insert
-            # Replace pd.NA with None for proper NULL handling
-            records = [
-                tuple(None if pd.isna(val) else val for val in row)
-                for row in df.values
-            ]
-
-            # Build INSERT statement
-            placeholders = ",".join(["%s"] * len(df.columns))
-            table_name = table["name"]
-
-            with conn.cursor() as cur:
-                cur.executemany(
-                    f"INSERT INTO {table_name} VALUES ({placeholders})",
-                    records,
-                )
+def load_tables(scale: int = 1, jobs: int = 4, tables_dir: Path = TABLES_DIR):
+    """Load CSV test data into the database, ``scale`` copies of it."""
+    started = time.perf_counter()
+    offsets = _fixture_offsets(tables_dir) if scale > 1 else {}
+    total = 0
 
-            print(f"✓ Loaded {len(records)} records into {table_name}")
+    # A level commits before the next starts so its rows satisfy the
+    # foreign keys checked by the following level's connections
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        for level in _load_levels(tables_dir):
+            load = lambda t: _load_table(t, scale, offsets, tables_dir)
+            for name, rows, elapsed in executor.map(load, level):
+                total += rows
+                print(f"✓ Loaded {rows} records into {name} in {elapsed:.2f}s")
 
-        # Reset sequences after loading all data
+    with psycopg.connect(settings.database_url) as conn:
         _reset_sequences(conn)
         conn.commit()
-        print("✓ All data loaded successfully")
+        # Fresh tables have no statistics yet; plan the first queries properly
+        conn.autocommit = True
+        conn.execute("ANALYZE")
+        built = time.perf_counter()
+        conn.execute("SELECT rebuild_related_problems()")
+        conn.execute("ANALYZE problem_related")
+        print(f"✓ Built related problems in {time.perf_counter() - built:.2f}s")
+
+    elapsed = time.perf_counter() - started
+    print(f"✓ All data loaded successfully: {total} records in {elapsed:.2f}s ({total / elapsed:,.0f} rows/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=int, default=1, help="copies of the fixture to load")
+    parser.add_argument("--jobs", type=int, default=4, help="tables loaded concurrently")
+    parser.add_argument("--dir", type=Path, default=TABLES_DIR, help="directory holding the CSV files")
+    parser.add_argument("--init", action="store_true", help="recreate the schema first (drops all data)")
+    args = parser.parse_args()
+    if args.scale < 1:
+        parser.error("--scale must be at least 1")
+
+    if args.init:
+        from src.db.init_db import init_db
+
+        init_db()
+    load_tables(scale=args.scale, jobs=args.jobs, tables_dir=args.dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""Per-request accounting of database work.
+
+The async pool hands out connections whose cursors are
+``InstrumentedAsyncCursor``. While a request is being served its
+``QueryStats`` is bound to the current context, and every statement, row
+and pool checkout is added to it; outside a request (startup, background
+flushes) the cursor records nothing. Pool waits also feed a process-wide
+histogram served by ``/health/pool``.
+"""
+
+import time
+from bisect import bisect_left
+from collections import Counter
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from contextvars import ContextVar, Token
+
+from psycopg import AsyncCursor, sql
+
+_current_stats: ContextVar["QueryStats | None"] = ContextVar("query_stats", default=None)
+
+# Upper bounds, in milliseconds, of the pool wait histogram's buckets
+POOL_WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+def statement_shape(query) -> str:
+    """The statement text with whitespace collapsed; parameters are never part of it."""
+    if isinstance(query, bytes):
+        query = query.decode()
+    elif isinstance(query, sql.Composable):
+        # Identifiers composed into the statement are part of its shape
+        query = repr(query)
+    return " ".join(query.split())
+
+
+class QueryStats:
+    __slots__ = ("queries", "db_time", "rows", "pool_wait", "shapes")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.rows = 0
+        self.pool_wait = 0.0
+        self.shapes: Counter[str] = Counter()
+
+    def record_query(self, query, elapsed: float) -> None:
+        self.queries += 1
+        self.db_time += elapsed
+        self.shapes[statement_shape(query)] += 1
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        """Statements run more than ``threshold`` times, most frequent first."""
+        return [(shape, n) for shape, n in self.shapes.most_common() if n > threshold]
+
+
+class WaitHistogram:
+    """Process-wide counts of waits falling in each bucket."""
+
+    def __init__(self, bounds_ms: tuple[int, ...]):
+        self.bounds_ms = bounds_ms
+        self.counts = [0] * (len(bounds_ms) + 1)
+        self.total_ms = 0.0
+
+    def observe(self, elapsed: float) -> None:
+        elapsed_ms = elapsed * 1000
+        self.counts[bisect_left(self.bounds_ms, elapsed_ms)] += 1
+        self.total_ms += elapsed_ms
+
+    def snapshot(self) -> dict:
+        buckets = {f"le_{bound}": n for bound, n in zip(self.bounds_ms, self.counts)}
+        buckets["inf"] = self.counts[-1]
+        return {"count": sum(self.counts), "sum": round(self.total_ms, 2), "buckets": buckets}
+
+
+pool_wait_histogram = WaitHistogram(POOL_WAIT_BUCKETS_MS)
+
+
+def bind_query_stats(stats: QueryStats) -> Token:
+    return _current_stats.set(stats)
+
+
+def unbind_query_stats(token: Token) -> None:
+    _current_stats.reset(token)
+
+
+def record_pool_wait(elapsed: float) -> None:
+    pool_wait_histogram.observe(elapsed)
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.pool_wait += elapsed
+
+
+class InstrumentedAsyncCursor(AsyncCursor):
+    """Cursor that adds its statements and fetched rows to the bound ``QueryStats``."""
+
+    async def execute(self, query, params=None, **kwargs):
+        stats = _current_stats.get()
+        if stats is None:
+            return await super().execute(query, params, **kwargs)
+        started = time.perf_counter()
+        try:
+            return await super().execute(query, params, **kwargs)
+        finally:
+            stats.record_query(query, time.perf_counter() - started)
+
+    async def executemany(self, query, params_seq, **kwargs):
+        stats = _current_stats.get()
+        if stats is None:
+            return await super().executemany(query, params_seq, **kwargs)
+        started = time.perf_counter()
+        try:
+            return await super().executemany(query, params_seq, **kwargs)
+        finally:
+            stats.record_query(query, time.perf_counter() - started)
+
+    @asynccontextmanager
+    async def copy(self, statement, params=None, **kwargs) -> AsyncIterator:
+        stats = _current_stats.get()
+        started = time.perf_counter()
+        try:
+            async with super().copy(statement, params, **kwargs) as copy:
+                yield copy
+        finally:
+            if stats is not None:
+                stats.record_query(statement, time.perf_counter() - started)
+
+    async def fetchone(self):
+        row = await super().fetchone()
+        if row is not None:
+            self._count_rows(1)
+        return row
+
+    async def fetchmany(self, size: int = 0):
+        rows = await super().fetchmany(size)
+        self._count_rows(len(rows))
+        return rows
+
+    async def fetchall(self):
+        rows = await super().fetchall()
+        self._count_rows(len(rows))
+        return rows
+
+    @staticmethod
+    def _count_rows(n: int) -> None:
+        stats = _current_stats.get()
+        if stats is not None:
+            stats.rows += n
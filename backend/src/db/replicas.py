@@ -0,0 +1,154 @@
+"""Read replicas for the routes that only read.
+
+Every URL in ``settings.replica_urls`` gets its own pool. Reads rotate over
+the replicas that passed their latest health check and fall back to the
+primary when none did, or when a replica can't hand out a connection
+quickly. Replica sessions are read-only, so a route wrongly routed here
+fails instead of writing.
+"""
+
+import asyncio
+import logging
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+import psycopg
+from psycopg import AsyncConnection
+from psycopg.conninfo import conninfo_to_dict
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
+
+from src.config import settings
+from src.db.connection import POOL_OPTIONS, async_pool
+from src.db.instrumentation import InstrumentedAsyncCursor
+
+logger = logging.getLogger(__name__)
+
+# A replica that can't hand out a connection this fast is skipped for the
+# primary and left out of rotation until its next health check passes
+REPLICA_CHECKOUT_TIMEOUT = 1.0
+
+
+class Replica:
+    def __init__(self, url: str):
+        info = conninfo_to_dict(url)
+        self.name = f"{info.get('host', 'localhost')}:{info.get('port', 5432)}/{info.get('dbname', '')}"
+        self.pool = AsyncConnectionPool(
+            conninfo=url,
+            kwargs={
+                "row_factory": dict_row,
+                "cursor_factory": InstrumentedAsyncCursor,
+                "options": "-c default_transaction_read_only=on",
+            },
+            open=False,
+            **POOL_OPTIONS,
+        )
+        self.healthy = False
+        self.reads = 0
+        self.failures = 0
+
+
+class ReplicaSet:
+    """Round-robin over healthy replicas, checked every ``check_interval`` seconds."""
+
+    def __init__(self, urls: list[str], check_interval: float):
+        self.replicas = [Replica(url) for url in urls]
+        self.check_interval = check_interval
+        self.primary_reads = 0
+        self._next = 0
+        self._task: asyncio.Task | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.replicas)
+
+    async def start(self) -> None:
+        if not self.enabled:
+            return
+        for replica in self.replicas:
+            # Don't hold up startup on a replica that is down
+            await replica.pool.open(wait=False)
+        await self.check()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for replica in self.replicas:
+            await replica.pool.close()
+
+    async def check(self) -> None:
+        await asyncio.gather(*(self._check(replica) for replica in self.replicas))
+
+    @asynccontextmanager
+    async def connection(self, use_primary: bool = False) -> AsyncIterator[AsyncConnection]:
+        """A connection for reads: a replica's if one is healthy, else the primary's."""
+        replica = None if use_primary else self._pick()
+        if replica is not None:
+            try:
+                conn = await replica.pool.getconn(timeout=REPLICA_CHECKOUT_TIMEOUT)
+            except psycopg.Error:
+                self._mark_down(replica)
+            else:
+                replica.reads += 1
+                try:
+                    async with conn:
+                        yield conn
+                finally:
+                    await replica.pool.putconn(conn)
+                return
+
+        self.primary_reads += 1
+        async with async_pool.connection() as conn:
+            yield conn
+
+    def stats(self) -> dict:
+        return {
+            "primary_reads": self.primary_reads,
+            "replicas": [
+                {"name": r.name, "healthy": r.healthy, "reads": r.reads, "failures": r.failures}
+                for r in self.replicas
+            ],
+        }
+
+    def _pick(self) -> Replica | None:
+        count = len(self.replicas)
+        for step in range(count):
+            replica = self.replicas[(self._next + step) % count]
+            if replica.healthy:
+                self._next = (self._next + step + 1) % count
+                return replica
+        return None
+
+    def _mark_down(self, replica: Replica) -> None:
+        replica.failures += 1
+        if replica.healthy:
+            logger.warning("Replica %s is unavailable; reading from the primary", replica.name)
+        replica.healthy = False
+
+    async def _check(self, replica: Replica) -> None:
+        try:
+            async with replica.pool.connection(timeout=REPLICA_CHECKOUT_TIMEOUT) as conn:
+                await conn.execute("SELECT 1")
+        except psycopg.Error:
+            self._mark_down(replica)
+            return
+        if not replica.healthy:
+            logger.info("Replica %s is serving reads", replica.name)
+        replica.healthy = True
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.check_interval)
+            try:
+                await self.check()
+            except Exception:
+                logger.exception("Checking read replicas failed; retrying on the next tick")
+
+
+replica_set = ReplicaSet(settings.replica_urls, settings.replica_check_interval)
@@ -2,6 +2,12 @@
 -- PostgreSQL DDL
 
 -- Drop tables if they exist (for clean recreation)
+DROP TABLE IF EXISTS problem_related CASCADE;
+DROP FUNCTION IF EXISTS related_problem_scores(INTEGER[], INTEGER);
+DROP TABLE IF EXISTS content_versions CASCADE;
+DROP SEQUENCE IF EXISTS content_version_seq;
+DROP TABLE IF EXISTS resource_usage CASCADE;
+DROP TABLE IF EXISTS tag_usage CASCADE;
 DROP TABLE IF EXISTS resource_tags CASCADE;
 DROP TABLE IF EXISTS problem_tags CASCADE;
 DROP TABLE IF EXISTS problem_relations CASCADE;
@@ -13,6 +19,34 @@ DROP TABLE IF EXISTS solutions CASCADE;
 DROP TABLE IF EXISTS problems CASCADE;
 DROP TABLE IF EXISTS users CASCADE;
 
+-- Trigram similarity for near-duplicate detection
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Canonical form of a URL used to spot the same page saved twice: the host
+-- case-folded, without scheme, leading "www.", default port, fragment,
+-- trailing slash or tracking parameters (utm_*, click ids and the like).
+-- The path and the remaining query keep their case and order.
+CREATE OR REPLACE FUNCTION normalize_url(url TEXT) RETURNS TEXT
+LANGUAGE plpgsql IMMUTABLE STRICT PARALLEL SAFE AS $$
+DECLARE
+    -- host, path, query
+    parts TEXT[] := regexp_match(
+        btrim(url), '^(?:[A-Za-z][A-Za-z0-9+.-]*://)?([^/?#]*)([^?#]*)(?:\?([^#]*))?'
+    );
+    query TEXT;
+BEGIN
+    SELECT string_agg(param, '&' ORDER BY position) INTO query
+    FROM unnest(string_to_array(parts[3], '&')) WITH ORDINALITY AS params(param, position)
+    WHERE param <> ''
+      AND lower(split_part(param, '=', 1)) !~
+          '^(utm_.*|fbclid|gclid|dclid|gbraid|wbraid|msclkid|yclid|twclid|igshid|mc_cid|mc_eid|_ga|_gl|ref_src)$';
+
+    RETURN regexp_replace(regexp_replace(lower(parts[1]), '^www\.', ''), ':(80|443)$', '')
+        || rtrim(parts[2], '/')
+        || COALESCE('?' || query, '');
+END
+$$;
+
 -- Users table
 CREATE TABLE users (
     user_id SERIAL PRIMARY KEY,
@@ -31,7 +65,11 @@ CREATE TABLE problems (
     description TEXT,
     problem_type VARCHAR(100),
     created_at TIMESTAMP DEFAULT NOW(),
-    resolved BOOLEAN DEFAULT FALSE
+    resolved BOOLEAN DEFAULT FALSE,
+    search_vector TSVECTOR GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', COALESCE(title, '')), 'A') ||
+        setweight(to_tsvector('english', COALESCE(description, '')), 'B')
+    ) STORED
 );
 
 -- Solutions table
@@ -47,6 +85,8 @@ CREATE TABLE solutions (
     improvement_description TEXT,
     success_rate FLOAT,
     created_at TIMESTAMP DEFAULT NOW(),
+    -- Ids from the root of the version tree down to this solution; set by trigger
+    path INTEGER[] NOT NULL,
     CONSTRAINT no_self_loop CHECK (solution_id != parent_solution_id),
     CONSTRAINT solution_success_rate_range CHECK (success_rate >= 0 AND success_rate <= 100)
 );
@@ -63,6 +103,11 @@ CREATE TABLE resources (
     first_visited_at TIMESTAMP,
     last_visited_at TIMESTAMP,
     usefulness_score FLOAT,
+    normalized_url TEXT GENERATED ALWAYS AS (normalize_url(url)) STORED,
+    search_vector TSVECTOR GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', COALESCE(title, '')), 'A') ||
+        setweight(to_tsvector('english', COALESCE(content_summary, '')), 'B')
+    ) STORED,
     CONSTRAINT resource_usefulness_range CHECK (usefulness_score >= 0 AND usefulness_score <= 5)
 );
 
@@ -120,15 +165,578 @@ CREATE TABLE resource_tags (
 );
 
 -- Create indexes for better query performance
-CREATE INDEX idx_problems_user_id ON problems(user_id);
-CREATE INDEX idx_problems_created_at ON problems(created_at DESC);
-CREATE INDEX idx_solutions_problem_id ON solutions(problem_id);
-CREATE INDEX idx_solutions_parent_id ON solutions(parent_solution_id);
+-- List indexes carry the primary key as a tiebreak so keyset pagination can seek
+CREATE INDEX idx_problems_user_id ON problems(user_id, created_at DESC, problem_id DESC);
+CREATE INDEX idx_problems_created_at ON problems(created_at DESC, problem_id DESC);
+CREATE INDEX idx_solutions_problem_id ON solutions(problem_id, created_at DESC, solution_id DESC);
+CREATE INDEX idx_solutions_parent_id ON solutions(parent_solution_id, created_at DESC, solution_id DESC);
 CREATE INDEX idx_solutions_created_at ON solutions(created_at DESC);
-CREATE INDEX idx_resources_user_id ON resources(user_id);
-CREATE INDEX idx_resources_last_visited ON resources(last_visited_at DESC);
-CREATE INDEX idx_problem_resources_resource_id ON problem_resources(resource_id);
+CREATE INDEX idx_solutions_path ON solutions(path);
+CREATE INDEX idx_resources_user_id ON resources(user_id, last_visited_at DESC, resource_id DESC);
+CREATE INDEX idx_resources_last_visited ON resources(last_visited_at DESC, resource_id DESC);
+CREATE INDEX idx_problems_search ON problems USING GIN (search_vector);
+CREATE INDEX idx_resources_search ON resources USING GIN (search_vector);
+CREATE INDEX idx_problems_title_trgm ON problems USING GIN (title gin_trgm_ops);
+CREATE INDEX idx_resources_normalized_url_trgm ON resources USING GIN (normalized_url gin_trgm_ops);
+-- "Already saved?" probes: a fixed-size hash of the URL keeps the key small
+-- however long the URL is. Not unique, since a page may be saved twice
+-- (POST /resources?dedupe=true avoids it); lookups take the oldest copy.
+CREATE INDEX idx_resources_user_url_hash ON resources(user_id, (md5(normalized_url)::uuid));
+CREATE INDEX idx_problem_resources_resource_id ON problem_resources(resource_id, problem_id);
 CREATE INDEX idx_solution_resources_resource_id ON solution_resources(resource_id);
 CREATE INDEX idx_problem_relations_to ON problem_relations(to_problem_id);
-CREATE INDEX idx_problem_tags_tag_id ON problem_tags(tag_id);
+CREATE INDEX idx_problem_tags_tag_id ON problem_tags(tag_id, problem_id);
 CREATE INDEX idx_resource_tags_tag_id ON resource_tags(tag_id);
+-- Tag filters in search match LOWER(tag_name)
+CREATE INDEX idx_tags_name_lower ON tags(LOWER(tag_name));
+
+-- Usage counters backing the dashboard's top tags / top resources.
+-- Maintained by statement-level triggers on the junction tables, so a bulk
+-- insert or a cascaded delete touches each counter row once per statement.
+CREATE TABLE tag_usage (
+    tag_id INTEGER PRIMARY KEY REFERENCES tags(tag_id) ON DELETE CASCADE,
+    usage_count INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE resource_usage (
+    resource_id INTEGER PRIMARY KEY REFERENCES resources(resource_id) ON DELETE CASCADE,
+    usage_count INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE INDEX idx_tag_usage_count ON tag_usage(usage_count DESC, tag_id);
+CREATE INDEX idx_resource_usage_count ON resource_usage(usage_count DESC, resource_id);
+
+CREATE OR REPLACE FUNCTION init_tag_usage() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO tag_usage (tag_id) SELECT tag_id FROM new_rows;
+    RETURN NULL;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION init_resource_usage() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO resource_usage (resource_id) SELECT resource_id FROM new_rows;
+    RETURN NULL;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION apply_tag_usage() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE tag_usage tu SET usage_count = tu.usage_count + d.n
+        FROM (SELECT tag_id, COUNT(*) AS n FROM new_rows GROUP BY tag_id) d
+        WHERE tu.tag_id = d.tag_id;
+    ELSE
+        UPDATE tag_usage tu SET usage_count = tu.usage_count - d.n
+        FROM (SELECT tag_id, COUNT(*) AS n FROM old_rows GROUP BY tag_id) d
+        WHERE tu.tag_id = d.tag_id;
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION apply_resource_usage() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE resource_usage ru SET usage_count = ru.usage_count + d.n
+        FROM (SELECT resource_id, COUNT(*) AS n FROM new_rows GROUP BY resource_id) d
+        WHERE ru.resource_id = d.resource_id;
+    ELSE
+        UPDATE resource_usage ru SET usage_count = ru.usage_count - d.n
+        FROM (SELECT resource_id, COUNT(*) AS n FROM old_rows GROUP BY resource_id) d
+        WHERE ru.resource_id = d.resource_id;
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+CREATE TRIGGER tags_init_usage AFTER INSERT ON tags
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION init_tag_usage();
+CREATE TRIGGER resources_init_usage AFTER INSERT ON resources
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION init_resource_usage();
+
+CREATE TRIGGER problem_tags_usage_insert AFTER INSERT ON problem_tags
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION apply_tag_usage();
+CREATE TRIGGER problem_tags_usage_delete AFTER DELETE ON problem_tags
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION apply_tag_usage();
+
+CREATE TRIGGER problem_resources_usage_insert AFTER INSERT ON problem_resources
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION apply_resource_usage();
+CREATE TRIGGER problem_resources_usage_delete AFTER DELETE ON problem_resources
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION apply_resource_usage();
+CREATE TRIGGER solution_resources_usage_insert AFTER INSERT ON solution_resources
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION apply_resource_usage();
+CREATE TRIGGER solution_resources_usage_delete AFTER DELETE ON solution_resources
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION apply_resource_usage();
+
+-- Materialized paths for solution version trees. Arrays compare element by
+-- element, so a subtree is the btree range [path, path_upper_bound(path)).
+CREATE OR REPLACE FUNCTION path_upper_bound(path INTEGER[]) RETURNS INTEGER[]
+LANGUAGE SQL IMMUTABLE STRICT PARALLEL SAFE AS $$
+    SELECT path[:cardinality(path) - 1] || (path[cardinality(path)] + 1)
+$$;
+
+CREATE OR REPLACE FUNCTION set_solution_path() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+DECLARE
+    parent_path INTEGER[];
+BEGIN
+    IF NEW.parent_solution_id IS NULL THEN
+        NEW.path := ARRAY[NEW.solution_id];
+        RETURN NEW;
+    END IF;
+
+    SELECT path INTO parent_path FROM solutions WHERE solution_id = NEW.parent_solution_id;
+    IF parent_path IS NULL THEN
+        RAISE EXCEPTION 'parent solution % must exist before its children', NEW.parent_solution_id
+            USING ERRCODE = 'foreign_key_violation';
+    END IF;
+    IF NEW.solution_id = ANY(parent_path) THEN
+        RAISE EXCEPTION 'solution % cannot be its own ancestor', NEW.solution_id
+            USING ERRCODE = 'check_violation';
+    END IF;
+
+    NEW.path := parent_path || NEW.solution_id;
+    RETURN NEW;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION move_solution_subtree() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE solutions
+    SET path = NEW.path || path[cardinality(OLD.path) + 1:]
+    WHERE path > OLD.path AND path < path_upper_bound(OLD.path);
+    RETURN NULL;
+END
+$$;
+
+CREATE TRIGGER solutions_set_path BEFORE INSERT ON solutions
+    FOR EACH ROW EXECUTE FUNCTION set_solution_path();
+CREATE TRIGGER solutions_reparent BEFORE UPDATE OF parent_solution_id ON solutions
+    FOR EACH ROW WHEN (OLD.parent_solution_id IS DISTINCT FROM NEW.parent_solution_id)
+    EXECUTE FUNCTION set_solution_path();
+CREATE TRIGGER solutions_move_subtree AFTER UPDATE OF parent_solution_id ON solutions
+    FOR EACH ROW WHEN (OLD.parent_solution_id IS DISTINCT FROM NEW.parent_solution_id)
+    EXECUTE FUNCTION move_solution_subtree();
+
+-- Version counters behind the ETags of /problems/{id}/full ('problem'),
+-- /resources/{id} ('resource') and /dashboard/{user_id} ('dashboard').
+-- Statement-level triggers give every page a write touches a fresh value
+-- from one sequence, so a conditional GET needs only a primary key lookup.
+-- Each statement's rows are upserted in key order so concurrent writers
+-- take the row locks in the same order.
+CREATE SEQUENCE content_version_seq;
+
+CREATE TABLE content_versions (
+    scope VARCHAR(20) NOT NULL,
+    entity_id INTEGER NOT NULL,
+    version BIGINT NOT NULL,
+    PRIMARY KEY (scope, entity_id)
+);
+
+CREATE OR REPLACE FUNCTION users_content_changed() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO content_versions (scope, entity_id, version)
+    SELECT scope, entity_id, nextval('content_version_seq')
+    FROM (
+        SELECT DISTINCT 'problem', p.problem_id FROM problems p JOIN changed_rows c ON c.user_id = p.user_id
+    ) AS changed(scope, entity_id)
+    ORDER BY scope, entity_id
+    ON CONFLICT (scope, entity_id) DO UPDATE SET version = EXCLUDED.version;
+    RETURN NULL;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION problems_content_changed() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO content_versions (scope, entity_id, version)
+    SELECT scope, entity_id, nextval('content_version_seq')
+    FROM (
+        SELECT 'problem', problem_id FROM changed_rows
+        UNION SELECT 'dashboard', user_id FROM changed_rows
+        UNION SELECT 'resource', pr.resource_id
+            FROM problem_resources pr JOIN changed_rows c ON c.problem_id = pr.problem_id
+    ) AS changed(scope, entity_id)
+    ORDER BY scope, entity_id
+    ON CONFLICT (scope, entity_id) DO UPDATE SET version = EXCLUDED.version;
+    RETURN NULL;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION solutions_content_changed() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO content_versions (scope, entity_id, version)
+    SELECT scope, entity_id, nextval('content_version_seq')
+    FROM (
+        SELECT 'problem', problem_id FROM changed_rows
+        UNION SELECT 'dashboard', p.user_id FROM problems p JOIN changed_rows c ON c.problem_id = p.problem_id
+        UNION SELECT 'resource', sr.resource_id
+            FROM solution_resources sr JOIN changed_rows c ON c.solution_id = sr.solution_id
+    ) AS changed(scope, entity_id)
+    ORDER BY scope, entity_id
+    ON CONFLICT (scope, entity_id) DO UPDATE SET version = EXCLUDED.version;
+    RETURN NULL;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION resources_content_changed() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO content_versions (scope, entity_id, version)
+    SELECT scope, entity_id, nextval('content_version_seq')
+    FROM (
+        SELECT 'resource', resource_id FROM changed_rows
+        UNION SELECT 'problem', pr.problem_id
+            FROM problem_resources pr JOIN changed_rows c ON c.resource_id = pr.resource_id
+        UNION SELECT 'problem', s.problem_id
+            FROM solution_resources sr
+            JOIN solutions s ON s.solution_id = sr.solution_id
+            JOIN changed_rows c ON c.resource_id = sr.resource_id
+    ) AS changed(scope, entity_id)
+    ORDER BY scope, entity_id
+    ON CONFLICT (scope, entity_id) DO UPDATE SET version = EXCLUDED.version;
+    RETURN NULL;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION tags_content_changed() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO content_versions (scope, entity_id, version)
+    SELECT scope, entity_id, nextval('content_version_seq')
+    FROM (
+        SELECT 'problem', pt.problem_id FROM problem_tags pt JOIN changed_rows c ON c.tag_id = pt.tag_id
+        UNION SELECT 'resource', rt.resource_id FROM resource_tags rt JOIN changed_rows c ON c.tag_id = rt.tag_id
+    ) AS changed(scope, entity_id)
+    ORDER BY scope, entity_id
+    ON CONFLICT (scope, entity_id) DO UPDATE SET version = EXCLUDED.version;
+    RETURN NULL;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION problem_tags_content_changed() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO content_versions (scope, entity_id, version)
+    SELECT scope, entity_id, nextval('content_version_seq')
+    FROM (
+        SELECT DISTINCT 'problem', problem_id FROM changed_rows
+    ) AS changed(scope, entity_id)
+    ORDER BY scope, entity_id
+    ON CONFLICT (scope, entity_id) DO UPDATE SET version = EXCLUDED.version;
+    RETURN NULL;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION resource_tags_content_changed() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO content_versions (scope, entity_id, version)
+    SELECT scope, entity_id, nextval('content_version_seq')
+    FROM (
+        SELECT DISTINCT 'resource', resource_id FROM changed_rows
+    ) AS changed(scope, entity_id)
+    ORDER BY scope, entity_id
+    ON CONFLICT (scope, entity_id) DO UPDATE SET version = EXCLUDED.version;
+    RETURN NULL;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION problem_resources_content_changed() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO content_versions (scope, entity_id, version)
+    SELECT scope, entity_id, nextval('content_version_seq')
+    FROM (
+        SELECT 'problem', problem_id FROM changed_rows
+        UNION SELECT 'resource', resource_id FROM changed_rows
+    ) AS changed(scope, entity_id)
+    ORDER BY scope, entity_id
+    ON CONFLICT (scope, entity_id) DO UPDATE SET version = EXCLUDED.version;
+    RETURN NULL;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION solution_resources_content_changed() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO content_versions (scope, entity_id, version)
+    SELECT scope, entity_id, nextval('content_version_seq')
+    FROM (
+        SELECT 'problem', s.problem_id FROM solutions s JOIN changed_rows c ON c.solution_id = s.solution_id
+        UNION SELECT 'resource', resource_id FROM changed_rows
+    ) AS changed(scope, entity_id)
+    ORDER BY scope, entity_id
+    ON CONFLICT (scope, entity_id) DO UPDATE SET version = EXCLUDED.version;
+    RETURN NULL;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION problem_relations_content_changed() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO content_versions (scope, entity_id, version)
+    SELECT scope, entity_id, nextval('content_version_seq')
+    FROM (
+        SELECT 'problem', from_problem_id FROM changed_rows
+        UNION SELECT 'problem', to_problem_id FROM changed_rows
+    ) AS changed(scope, entity_id)
+    ORDER BY scope, entity_id
+    ON CONFLICT (scope, entity_id) DO UPDATE SET version = EXCLUDED.version;
+    RETURN NULL;
+END
+$$;
+
+-- <table>_content_changed() runs once per statement on each table, seeing
+-- the affected rows as changed_rows: new images for inserts and updates,
+-- old images for deletes
+DO $$
+DECLARE
+    t TEXT;
+BEGIN
+    FOREACH t IN ARRAY ARRAY[
+        'users', 'problems', 'solutions', 'resources', 'tags', 'problem_tags',
+        'resource_tags', 'problem_resources', 'solution_resources', 'problem_relations'
+    ] LOOP
+        EXECUTE format(
+            'CREATE TRIGGER %1$s_content_insert AFTER INSERT ON %1$I
+                 REFERENCING NEW TABLE AS changed_rows
+                 FOR EACH STATEMENT EXECUTE FUNCTION %1$s_content_changed()', t);
+        EXECUTE format(
+            'CREATE TRIGGER %1$s_content_update AFTER UPDATE ON %1$I
+                 REFERENCING NEW TABLE AS changed_rows
+                 FOR EACH STATEMENT EXECUTE FUNCTION %1$s_content_changed()', t);
+        EXECUTE format(
+            'CREATE TRIGGER %1$s_content_delete AFTER DELETE ON %1$I
+                 REFERENCING OLD TABLE AS changed_rows
+                 FOR EACH STATEMENT EXECUTE FUNCTION %1$s_content_changed()', t);
+    END LOOP;
+END
+$$;
+
+-- A solution can move to another problem; the one it left changes too
+CREATE TRIGGER solutions_content_update_old AFTER UPDATE ON solutions
+    REFERENCING OLD TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION solutions_content_changed();
+
+-- Related problems: each problem's best neighbours by tag overlap (Jaccard),
+-- shared resources (cosine) and explicit relation strength, kept as a top-k
+-- list so a problem page reads them with one index range scan
+CREATE TABLE problem_related (
+    problem_id INTEGER NOT NULL REFERENCES problems(problem_id) ON DELETE CASCADE,
+    related_problem_id INTEGER NOT NULL REFERENCES problems(problem_id) ON DELETE CASCADE,
+    score FLOAT NOT NULL,
+    shared_tags INTEGER NOT NULL,
+    shared_resources INTEGER NOT NULL,
+    relation_strength FLOAT,
+    PRIMARY KEY (problem_id, related_problem_id)
+);
+
+CREATE INDEX idx_problem_related_rank ON problem_related(problem_id, score DESC, related_problem_id);
+CREATE INDEX idx_problem_related_reverse ON problem_related(related_problem_id);
+
+-- Scores of every problem sharing a tag, a resource or a relation with a
+-- source problem. Candidates come straight from the inverted lists
+-- (problem_tags by tag, problem_resources by resource), and each pair's
+-- overlap counts everything the two share, so every candidate is scored
+-- exactly. A relation without a strength counts as 0.5.
+--
+-- The one bound: a tag carried by more than `max_tag_problems` problems (per
+-- tag_usage) would make nearly everything a candidate of everything, so it
+-- finds no candidates itself; it still counts towards the overlap of pairs
+-- found through anything else. A problem is missing from a list only when it
+-- shares nothing with it but such tags, which scores at most 0.3 x their
+-- Jaccard overlap. Lists are only approximate for pairs like that, and only
+-- until rebuild_related_problems() when a tag crosses the bound.
+CREATE OR REPLACE FUNCTION related_problem_scores(sources INTEGER[], max_tag_problems INTEGER DEFAULT 1000)
+RETURNS TABLE (
+    problem_id INTEGER,
+    related_problem_id INTEGER,
+    score FLOAT,
+    shared_tags INTEGER,
+    shared_resources INTEGER,
+    relation_strength FLOAT
+)
+LANGUAGE SQL STABLE AS $$
+    WITH candidates AS (
+        SELECT problem_id, related_problem_id,
+               SUM(tags)::INTEGER AS shared_tags,
+               SUM(resources)::INTEGER AS shared_resources,
+               MAX(strength) AS relation_strength
+        FROM (
+            SELECT a.problem_id, b.problem_id AS related_problem_id, 1 AS tags, 0 AS resources, NULL::FLOAT AS strength
+            FROM unnest(sources) src
+            JOIN problem_tags a ON a.problem_id = src
+            JOIN tag_usage tu ON tu.tag_id = a.tag_id AND tu.usage_count <= max_tag_problems
+            JOIN problem_tags b ON b.tag_id = a.tag_id AND b.problem_id <> a.problem_id
+            UNION ALL
+            SELECT a.problem_id, b.problem_id, 0, 1, NULL
+            FROM unnest(sources) src
+            JOIN problem_resources a ON a.problem_id = src
+            JOIN problem_resources b ON b.resource_id = a.resource_id AND b.problem_id <> a.problem_id
+            UNION ALL
+            SELECT from_problem_id, to_problem_id, 0, 0, COALESCE(strength, 0.5)
+            FROM unnest(sources) src
+            JOIN problem_relations ON from_problem_id = src
+            UNION ALL
+            SELECT to_problem_id, from_problem_id, 0, 0, COALESCE(strength, 0.5)
+            FROM unnest(sources) src
+            JOIN problem_relations ON to_problem_id = src
+        ) shared
+        GROUP BY problem_id, related_problem_id
+    ),
+    -- The sources' tags too common to find candidates, matched against the
+    -- candidates found otherwise
+    common_tags AS (
+        SELECT a.problem_id, a.tag_id
+        FROM unnest(sources) src
+        JOIN problem_tags a ON a.problem_id = src
+        JOIN tag_usage tu ON tu.tag_id = a.tag_id AND tu.usage_count > max_tag_problems
+    ),
+    common_shared AS (
+        SELECT c.problem_id, c.related_problem_id, COUNT(*)::INTEGER AS shared_tags
+        FROM common_tags t
+        JOIN candidates c ON c.problem_id = t.problem_id
+        JOIN problem_tags b ON b.problem_id = c.related_problem_id AND b.tag_id = t.tag_id
+        GROUP BY c.problem_id, c.related_problem_id
+    ),
+    pairs AS (
+        SELECT c.problem_id, c.related_problem_id,
+               c.shared_tags + COALESCE(s.shared_tags, 0) AS shared_tags,
+               c.shared_resources, c.relation_strength
+        FROM candidates c
+        LEFT JOIN common_shared s USING (problem_id, related_problem_id)
+    ),
+    counts AS (
+        SELECT ids.problem_id,
+               (SELECT COUNT(*) FROM problem_tags t WHERE t.problem_id = ids.problem_id) AS tags,
+               (SELECT COUNT(*) FROM problem_resources r WHERE r.problem_id = ids.problem_id) AS resources
+        FROM (SELECT problem_id FROM pairs UNION SELECT related_problem_id FROM pairs) ids
+    )
+    SELECT p.problem_id, p.related_problem_id,
+           0.3 * COALESCE(p.shared_tags / NULLIF(a.tags + b.tags - p.shared_tags, 0)::FLOAT, 0)
+           + 0.3 * COALESCE(p.shared_resources / NULLIF(sqrt(a.resources * b.resources), 0), 0)
+           + 0.4 * COALESCE(p.relation_strength, 0),
+           p.shared_tags, p.shared_resources, p.relation_strength
+    FROM pairs p
+    JOIN counts a ON a.problem_id = p.problem_id
+    JOIN counts b ON b.problem_id = p.related_problem_id
+$$;
+
+-- Top `k` of each source's scores, ready to insert into problem_related
+CREATE OR REPLACE FUNCTION top_related_problems(sources INTEGER[], k INTEGER)
+RETURNS SETOF problem_related
+LANGUAGE SQL STABLE AS $$
+    SELECT problem_id, related_problem_id, score, shared_tags, shared_resources, relation_strength
+    FROM (
+        SELECT s.*, row_number() OVER (PARTITION BY s.problem_id ORDER BY s.score DESC, s.related_problem_id) AS rank
+        FROM related_problem_scores(sources) s
+        WHERE s.score > 0
+    ) ranked
+    WHERE rank <= k
+    ORDER BY problem_id, related_problem_id
+$$;
+
+-- Recompute every list, e.g. after a bulk load
+CREATE OR REPLACE FUNCTION rebuild_related_problems(k INTEGER DEFAULT 20) RETURNS VOID
+LANGUAGE plpgsql AS $$
+BEGIN
+    TRUNCATE problem_related;
+    INSERT INTO problem_related
+    SELECT * FROM top_related_problems(ARRAY(SELECT problem_id FROM problems), k);
+END
+$$;
+
+-- Bring the lists up to date after the tags, resources or relations of the
+-- `changed` problems changed. The changed problems' own lists, and every list
+-- one of them was on (it may have to make room), are rebuilt; any other
+-- problem a changed one now outscores gets it inserted and its list trimmed.
+CREATE OR REPLACE FUNCTION refresh_related_problems(changed INTEGER[], k INTEGER DEFAULT 20) RETURNS VOID
+LANGUAGE plpgsql AS $$
+DECLARE
+    lock_class CONSTANT INTEGER := 'problem_related'::regclass::oid::INTEGER;
+    affected INTEGER[];
+    touched INTEGER[];
+    scored problem_related[];
+BEGIN
+    -- The changed problems' scores, for the locks and the inserts below
+    scored := ARRAY(SELECT ROW(s.*)::problem_related FROM related_problem_scores(changed) s);
+
+    -- Take a lock per list this refresh may write, in id order, so that
+    -- concurrent refreshes of overlapping lists queue instead of deadlocking
+    PERFORM pg_advisory_xact_lock(lock_class, list_id)
+    FROM (
+        SELECT unnest(changed) AS list_id
+        UNION
+        SELECT problem_id FROM problem_related WHERE related_problem_id = ANY(changed)
+        UNION
+        SELECT related_problem_id FROM unnest(scored)
+        ORDER BY list_id
+    ) lists;
+
+    affected := ARRAY(
+        SELECT unnest(changed)
+        UNION
+        SELECT problem_id FROM problem_related WHERE related_problem_id = ANY(changed)
+    );
+    DELETE FROM problem_related WHERE problem_id = ANY(affected);
+
+    INSERT INTO problem_related
+    SELECT * FROM top_related_problems(affected, k)
+    ON CONFLICT (problem_id, related_problem_id) DO UPDATE
+    SET score = EXCLUDED.score,
+        shared_tags = EXCLUDED.shared_tags,
+        shared_resources = EXCLUDED.shared_resources,
+        relation_strength = EXCLUDED.relation_strength;
+
+    WITH inserted AS (
+        INSERT INTO problem_related
+        SELECT s.related_problem_id, s.problem_id, s.score, s.shared_tags, s.shared_resources, s.relation_strength
+        FROM unnest(scored) s
+        LEFT JOIN LATERAL (
+            SELECT r.score, r.related_problem_id
+            FROM problem_related r
+            WHERE r.problem_id = s.related_problem_id
+            ORDER BY r.score DESC, r.related_problem_id
+            OFFSET k - 1 LIMIT 1
+        ) last ON true
+        WHERE s.score > 0
+          AND s.related_problem_id <> ALL(affected)
+          -- Beats the list's k-th entry in the order lists are ranked by
+          AND (last.score IS NULL
+               OR s.score > last.score
+               OR (s.score = last.score AND s.problem_id < last.related_problem_id))
+        ORDER BY s.related_problem_id, s.problem_id
+        ON CONFLICT (problem_id, related_problem_id) DO NOTHING
+        RETURNING problem_id
+    )
+    SELECT array_agg(DISTINCT problem_id) INTO touched FROM inserted;
+
+    DELETE FROM problem_related r
+    USING (
+        SELECT problem_id, related_problem_id,
+               row_number() OVER (PARTITION BY problem_id ORDER BY score DESC, related_problem_id) AS rank
+        FROM problem_related
+        WHERE problem_id = ANY(touched)
+    ) ranked
+    WHERE r.problem_id = ranked.problem_id
+      AND r.related_problem_id = ranked.related_problem_id
+      AND ranked.rank > k;
+END
+$$;
@@ -1,25 +1,48 @@
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from psycopg_pool import PoolTimeout
 
+from .api.pagination import NEXT_CURSOR_HEADER
+from .api.graph import relation_graph
+from .api.middleware import QueryStatsMiddleware, ReadYourWritesMiddleware
 from .api.routes import router as api_router
+from .api.tag_index import tag_index
+from .api.tag_recommender import tag_recommender
+from .api.visits import visit_buffer
 from .config import settings
+from .db.connection import async_pool
 from .db.init_db import init_db
+from .db.replicas import replica_set
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    init_db()
-    if settings.load_fake_data:
-        print("loading fake data")
-        from .db.fake.load_tables import load_tables
+    if settings.init_schema:
+        init_db()
+        if settings.load_fake_data:
+            print("loading fake data")
+            from .db.fake.load_tables import load_tables
 
-        load_tables()
+            load_tables()
+    await async_pool.open()
+    async with async_pool.connection() as conn:
+        await relation_graph.load(conn)
+        await tag_index.load(conn)
+        await tag_recommender.load(conn)
+    await replica_set.start()
+    visit_buffer.start()
     yield
+    await visit_buffer.stop()
+    await replica_set.stop()
+    await async_pool.close()
 
 app = FastAPI(lifespan=lifespan)
 
+app.add_middleware(ReadYourWritesMiddleware)
+app.add_middleware(QueryStatsMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[
@@ -29,6 +52,17 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag"],
 )
 
 app.include_router(api_router)
+
+
+@app.exception_handler(PoolTimeout)
+async def pool_timeout_handler(request: Request, exc: PoolTimeout):
+    # Every connection stayed busy for DB_POOL_TIMEOUT; ask clients to back off
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Database is busy"},
+        headers={"Retry-After": "1"},
+    )
@@ -1,14 +1,17 @@
 const API_BASE_URL = process.env.NEXT_PUBLIC_API_URL || '/api';
 
-export async function apiClient<T>(
-  endpoint: string,
-  options?: RequestInit
-): Promise<T> {
+// Largest page the list endpoints serve, so following a list takes the fewest requests
+const MAX_PAGE_SIZE = 500;
+const NEXT_CURSOR_HEADER = 'X-Next-Cursor';
+
+async function request(endpoint: string, options?: RequestInit): Promise<Response> {
   const normalizedEndpoint = endpoint.startsWith('/') ? endpoint : `/${endpoint}`;
   const baseUrl = API_BASE_URL.endsWith('/')
     ? API_BASE_URL.slice(0, -1)
     : API_BASE_URL;
   const response = await fetch(`${baseUrl}${normalizedEndpoint}`, {
+    // Carries the read-your-writes cookie when the API is on another origin
+    credentials: 'include',
     headers: {
       'Content-Type': 'application/json',
       ...options?.headers,
@@ -26,5 +29,30 @@ export async function apiClient<T>(
     throw new Error(error.detail || 'API request failed');
   }
 
+  return response;
+}
+
+export async function apiClient<T>(
+  endpoint: string,
+  options?: RequestInit
+): Promise<T> {
+  const response = await request(endpoint, options);
   return response.json();
 }
+
+// Fetches every row of a paginated list endpoint, following X-Next-Cursor
+// until the last page
+export async function apiClientAll<T>(endpoint: string): Promise<T[]> {
+  const separator = endpoint.includes('?') ? '&' : '?';
+  const rows: T[] = [];
+  let cursor: string | null = null;
+  do {
+    const page = `${endpoint}${separator}limit=${MAX_PAGE_SIZE}`;
+    const response = await request(
+      cursor ? `${page}&after=${encodeURIComponent(cursor)}` : page
+    );
+    rows.push(...((await response.json()) as T[]));
+    cursor = response.headers.get(NEXT_CURSOR_HEADER);
+  } while (cursor);
+  return rows;
+}
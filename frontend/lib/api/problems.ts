@@ -1,4 +1,4 @@
-import { apiClient } from './client';
+import { apiClient, apiClientAll } from './client';
 import type { Problem, ProblemFull } from '@/types/models';
 
 export const problemsApi = {
@@ -10,7 +10,7 @@ export const problemsApi = {
     const query = new URLSearchParams(
       Object.entries(params || {}).filter(([_, v]) => v !== undefined) as [string, string][]
     ).toString();
-    return apiClient(`/problems${query ? `?${query}` : ''}`);
+    return apiClientAll(`/problems${query ? `?${query}` : ''}`);
   },
 
   async getProblem(problemId: number): Promise<Problem> {
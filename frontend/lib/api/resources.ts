@@ -1,4 +1,4 @@
-import { apiClient } from './client';
+import { apiClient, apiClientAll } from './client';
 import type { ResourceSummary } from '@/types/models';
 
 export const resourcesApi = {
@@ -22,6 +22,6 @@ export const resourcesApi = {
     }
 
     const query = searchParams.toString();
-    return apiClient(`/resources${query ? `?${query}` : ''}`);
+    return apiClientAll(`/resources${query ? `?${query}` : ''}`);
   },
 };
@@ -1,4 +1,4 @@
-import { apiClient } from './client';
+import { apiClient, apiClientAll } from './client';
 import type { Solution } from '@/types/models';
 
 export const solutionsApi = {
@@ -42,10 +42,10 @@ export const solutionsApi = {
   },
 
   async listProblemSolutions(problemId: number): Promise<Solution[]> {
-    return apiClient(`/problems/${problemId}/solutions`);
+    return apiClientAll(`/problems/${problemId}/solutions`);
   },
 
   async getSolutionChildren(solutionId: number): Promise<Solution[]> {
-    return apiClient(`/solutions/${solutionId}/children`);
+    return apiClientAll(`/solutions/${solutionId}/children`);
   },
 };
@@ -1,8 +1,8 @@
-import { apiClient } from './client';
+import { apiClientAll } from './client';
 import type { Tag } from '@/types/models';
 
 export const tagsApi = {
   async getTags(): Promise<Tag[]> {
-    return apiClient('/tags');
+    return apiClientAll('/tags');
   },
 };
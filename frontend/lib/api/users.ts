@@ -1,4 +1,4 @@
-import { apiClient } from './client';
+import { apiClient, apiClientAll } from './client';
 import type { Problem, User } from '@/types/models';
 
 export const usersApi = {
@@ -41,6 +41,6 @@ export const usersApi = {
   },
 
   async getUserProblems(userId: number): Promise<Problem[]> {
-    return apiClient(`/users/${userId}/problems`);
+    return apiClientAll(`/users/${userId}/problems`);
   },
 };